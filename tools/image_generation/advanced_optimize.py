@@ -2,13 +2,35 @@
 """
 Advanced WebP Image Optimizer
 Applies aggressive optimization while maintaining visual quality
+
+Files are encoded on a worker pool (all cores by default, largest files
+first); console output stays in density/file order.
+
+With --target-ssim, lossy profiles search quality per file (up to the
+profile's quality) for the smallest encode meeting the SSIM target against
+the backed-up original; choices are cached in .quality_cache.json.
+
+--apply-plan writes the per-file settings chosen by budget_solver.py.
+
+Each file is decoded once; the re-encode (or quality search) and the LQIP
+both read that buffer (see decode_pipeline.py).
 """
 
 import os
-import subprocess
+import json
 import shutil
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image
+
+from decode_pipeline import DECODE_STATS, FanOut, decode_source, render_lqip
+from webp_codec import encode_webp, encode_webp_file, map_largest_first
+
+try:
+    from quality_search import QUALITY_CACHE_FILENAME, QualityCache, search_quality
+except ImportError:  # NumPy missing - --target-ssim unavailable
+    QualityCache = None
 
 # Base paths
 BASE_RES_PATH = Path("/Users/jonathanmallinger/Workspace/SpiritAtlas/app/src/main/res")
@@ -17,6 +39,10 @@ BACKUP_PATH = Path("/Users/jonathanmallinger/Workspace/SpiritAtlas/tools/image_g
 # Densities to optimize
 DENSITIES = ['mdpi', 'hdpi', 'xhdpi', 'xxhdpi', 'xxxhdpi']
 
+# Per-job encode timeouts (seconds)
+ENCODE_TIMEOUT = 30
+LQIP_TIMEOUT = 10
+
 # Optimization profiles based on image type
 OPTIMIZATION_PROFILES = {
     'icon_lossless': {
@@ -105,106 +131,210 @@ def get_profile_for_image(filename: str) -> Dict:
     }
 
 
-def backup_original(filepath: Path) -> None:
+def backup_original(filepath: Path) -> Path:
     """Backup original file before optimization."""
     backup_file = BACKUP_PATH / filepath.relative_to(BASE_RES_PATH.parent)
     backup_file.parent.mkdir(parents=True, exist_ok=True)
 
     if not backup_file.exists():
         shutil.copy2(filepath, backup_file)
+    return backup_file
 
 
-def optimize_webp(input_path: Path, profile: Dict) -> Tuple[bool, int, int]:
-    """
-    Optimize a WebP image with advanced settings.
-    Returns: (success, original_size, new_size)
-    """
-    if not input_path.exists():
-        return False, 0, 0
+def get_profile_name(filename: str) -> str:
+    """Name of the optimization profile used for an image."""
+    return next(
+        (name for name, p in OPTIMIZATION_PROFILES.items()
+         if any(filename.startswith(pat) for pat in p['patterns'])),
+        'default'
+    )
 
-    original_size = input_path.stat().st_size
-    temp_output = input_path.with_suffix('.webp.tmp')
 
-    # Build cwebp command with advanced options
-    cmd = [
-        'cwebp',
-        '-q', str(profile['quality']),
-        '-m', str(profile['method']),  # Maximum compression effort
-        '-af',  # Auto-adjust filter strength
-        '-mt',  # Multi-threading
-    ]
+def original_path(webp_file: Path) -> Path:
+    """Backed-up original of a drawable, or the drawable itself if never optimized."""
+    backup_file = BACKUP_PATH / webp_file.relative_to(BASE_RES_PATH.parent)
+    return backup_file if backup_file.exists() else webp_file
 
-    # Add optional parameters
-    if 'near_lossless' in profile:
-        cmd.extend(['-near_lossless', str(profile['near_lossless'])])
 
-    if 'alpha_quality' in profile:
-        cmd.extend(['-alpha_q', str(profile['alpha_quality'])])
+def optimize_webp(input_path: Path, profile: Dict,
+                  timeout: Optional[float] = ENCODE_TIMEOUT,
+                  search: Optional[Dict] = None,
+                  image: Optional[Image.Image] = None) -> Tuple[bool, int, int, Optional[str]]:
+    """
+    Optimize a WebP image with advanced settings.
 
-    if 'preprocessing' in profile:
-        cmd.extend(['-pre', str(profile['preprocessing'])])
+    Args:
+        search: Quality search settings - {'target': SSIM, 'source': reference
+            image path, 'cache': QualityCache, 'key': cache key}
+        image: Already decoded pixels to encode (search['source'] when
+            searching, else input_path); decoded here if None
 
-    # Sharp YUV for better color
-    cmd.append('-sharp_yuv')
+    Returns: (success, original_size, new_size, error)
+    """
+    if not input_path.exists():
+        return False, 0, 0, None
 
-    cmd.extend([str(input_path), '-o', str(temp_output)])
+    original_size = input_path.stat().st_size
+    temp_output = input_path.with_suffix('.webp.tmp')
 
     try:
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
-
-        if result.returncode != 0:
-            print(f"  Error: {result.stderr}")
-            if temp_output.exists():
-                temp_output.unlink()
-            return False, original_size, original_size
-
-        new_size = temp_output.stat().st_size
+        if search and profile.get('near_lossless') is None:
+            return _optimize_searched(input_path, profile, timeout, search, image)
+
+        if image is None:
+            image = decode_source(input_path).image
+
+        # In-process libwebp encode with the cwebp-equivalent advanced options
+        data = encode_webp(
+            image,
+            quality=profile['quality'],
+            method=profile['method'],  # Maximum compression effort
+            autofilter=True,  # Auto-adjust filter strength
+            multithread=True,
+            near_lossless=profile.get('near_lossless'),
+            alpha_quality=profile.get('alpha_quality'),
+            preprocessing=profile.get('preprocessing'),
+            sharp_yuv=True,  # Sharp YUV for better color
+            timeout=timeout
+        )
 
         # Only replace if we achieved meaningful reduction (>5%)
-        if new_size < original_size * 0.95:
+        if len(data) < original_size * 0.95:
+            temp_output.write_bytes(data)
             shutil.move(temp_output, input_path)
-            return True, original_size, new_size
+            return True, original_size, len(data), None
         else:
-            temp_output.unlink()
-            return False, original_size, original_size
+            return False, original_size, original_size, None
 
     except Exception as e:
-        print(f"  Exception: {e}")
         if temp_output.exists():
             temp_output.unlink()
-        return False, original_size, original_size
+        return False, original_size, original_size, str(e)
+
 
+def _optimize_searched(input_path: Path, profile: Dict, timeout: Optional[float],
+                      search: Dict, image: Optional[Image.Image] = None
+                      ) -> Tuple[bool, int, int, Optional[str]]:
+    """Re-encode from the untouched original at the lowest quality meeting the SSIM target."""
+    original_size = input_path.stat().st_size
 
-def create_lqip(input_path: Path) -> Path:
+    # Searching against the original keeps repeated runs from compounding loss
+    img = image if image is not None else decode_source(search['source']).image
+    img = img.convert('RGBA' if 'A' in img.getbands() else 'RGB')
+    choice, data = search_quality(
+        img,
+        target=search['target'],
+        max_quality=profile['quality'],
+        cache=search.get('cache'),
+        cache_key=search.get('key'),
+        method=profile['method'],
+        autofilter=True,
+        multithread=True,
+        alpha_quality=profile.get('alpha_quality'),
+        preprocessing=profile.get('preprocessing'),
+        sharp_yuv=True,
+        timeout=timeout
+    )
+
+    # Only replace if we achieved meaningful reduction (>5%)
+    if len(data) < original_size * 0.95:
+        temp_output = input_path.with_suffix('.webp.tmp')
+        temp_output.write_bytes(data)
+        shutil.move(temp_output, input_path)
+        return True, original_size, len(data), None
+    return False, original_size, original_size, None
+
+
+def create_lqip(input_path: Path, timeout: Optional[float] = LQIP_TIMEOUT,
+                image: Optional[Image.Image] = None) -> Path:
     """
     Create Low-Quality Image Placeholder (LQIP) for progressive loading.
     Creates a 32x32 preview at very low quality.
+
+    Args:
+        image: Already decoded pixels of input_path (decoded here if None)
+
+    Raises:
+        Exception: If the preview could not be encoded
     """
     lqip_dir = input_path.parent.parent / "drawable-lqip"
     lqip_dir.mkdir(exist_ok=True)
 
     lqip_path = lqip_dir / input_path.name
 
-    # Create tiny preview
-    cmd = [
-        'cwebp',
-        '-resize', '32', '32',  # Tiny size
-        '-q', '50',  # Low quality
-        '-m', '0',  # Fast method
-        str(input_path),
-        '-o', str(lqip_path)
-    ]
+    if image is None:
+        image = decode_source(input_path).image
+    lqip_path.write_bytes(render_lqip(image, timeout=timeout))
+    return lqip_path
+
+
+def _optimize_file(job: Tuple[str, Path, bool],
+                   search: Optional[Dict] = None) -> Tuple[bool, int, int, List[str]]:
+    """
+    Worker job: backup, optimize and (optionally) build the LQIP for one file.
+
+    Output lines are returned rather than printed so the caller can report
+    results in order.
 
+    Returns:
+        (success, original_size, new_size, output_lines)
+    """
+    density, webp_file, make_lqip = job
+    profile = get_profile_for_image(webp_file.name)
+    profile_name = get_profile_name(webp_file.name)
+    lines = []
+
+    # Backup original
+    backup_file = backup_original(webp_file)
+
+    # One decode feeds the encode and the LQIP: the original when searching
+    # (the search reference), else the current file
+    if search:
+        search = dict(search, source=backup_file, key=f"{density}/{webp_file.name}")
+    fanout = FanOut().add('optimize', lambda source: optimize_webp(
+        webp_file, profile, search=search, image=source.image))
+    if make_lqip:
+        fanout.add('lqip', lambda source: create_lqip(webp_file, image=source.image))
     try:
-        subprocess.run(cmd, capture_output=True, check=True, timeout=10)
-        return lqip_path
+        results = fanout.run(backup_file if search else webp_file)
     except Exception as e:
-        print(f"  LQIP creation failed: {e}")
-        return None
+        size = webp_file.stat().st_size
+        return False, size, size, [f"  ✗ {webp_file.name:50s} | {profile_name:15s} | Decode failed: {e}"]
+    success, orig_size, new_size, error = results['optimize']
+
+    if error:
+        lines.append(f"  Exception: {error}")
+    if success:
+        reduction = ((orig_size - new_size) / orig_size) * 100
+        lines.append(f"  ✓ {webp_file.name:50s} | {profile_name:15s} | "
+                     f"{orig_size/1024:6.1f}KB → {new_size/1024:6.1f}KB | "
+                     f"-{reduction:5.1f}%")
+    else:
+        lines.append(f"  → {webp_file.name:50s} | {profile_name:15s} | "
+                     f"{orig_size/1024:6.1f}KB | No change")
+
+    if make_lqip:
+        lqip = results['lqip']
+        if isinstance(lqip, Exception):
+            lines.append(f"  LQIP creation failed: {lqip}")
+        else:
+            lines.append(f"    → LQIP created: {lqip.stat().st_size/1024:.1f}KB")
 
+    return success, orig_size, new_size, lines
 
-def optimize_all_images(create_lqips: bool = True, skip_xxxhdpi: bool = False):
-    """Optimize all images with advanced compression."""
+
+def optimize_all_images(create_lqips: bool = True, skip_xxxhdpi: bool = False,
+                        jobs: Optional[int] = None, target_ssim: Optional[float] = None):
+    """
+    Optimize all images with advanced compression.
+
+    Args:
+        create_lqips: Build 32x32 placeholders from the xhdpi files
+        skip_xxxhdpi: Leave the xxxhdpi directory untouched
+        jobs: Parallel encode workers (default: all CPU cores)
+        target_ssim: Search quality per file for this SSIM instead of using
+            the profile quality (near-lossless profiles are unaffected)
+    """
 
     print("🎨 ADVANCED IMAGE OPTIMIZATION")
     print("=" * 80)
@@ -212,10 +342,20 @@ def optimize_all_images(create_lqips: bool = True, skip_xxxhdpi: bool = False):
     print(f"Backup path: {BACKUP_PATH}")
     print(f"Create LQIPs: {create_lqips}")
     print(f"Skip xxxhdpi: {skip_xxxhdpi}")
+    print(f"Workers: {jobs or os.cpu_count() or 1}")
+    if target_ssim is not None:
+        print(f"Target SSIM: {target_ssim}")
     print()
 
     BACKUP_PATH.mkdir(parents=True, exist_ok=True)
 
+    search = None
+    if target_ssim is not None:
+        if QualityCache is None:
+            raise RuntimeError("--target-ssim needs NumPy. Install with: pip install numpy")
+        search = {'target': target_ssim,
+                  'cache': QualityCache(BACKUP_PATH.parent / QUALITY_CACHE_FILENAME)}
+
     total_original = 0
     total_optimized = 0
     files_processed = 0
@@ -223,51 +363,53 @@ def optimize_all_images(create_lqips: bool = True, skip_xxxhdpi: bool = False):
 
     densities_to_process = [d for d in DENSITIES if not (skip_xxxhdpi and d == 'xxxhdpi')]
 
+    # Collect every file up front so the pool can schedule across densities
+    work = []
     for density in densities_to_process:
         drawable_dir = BASE_RES_PATH / f"drawable-{density}"
 
         if not drawable_dir.exists():
-            print(f"⚠️  {density}: Directory not found")
+            work.append((density, None))
             continue
 
-        print(f"\n📁 Processing {density}...")
-        print("-" * 80)
+        for webp_file in sorted(drawable_dir.glob("*.webp")):
+            # Create LQIP for xhdpi only (one version is enough)
+            work.append((density, (density, webp_file, create_lqips and density == 'xhdpi')))
+
+    def run(item):
+        return _optimize_file(item[1], search) if item[1] else None
 
-        webp_files = sorted(drawable_dir.glob("*.webp"))
+    def size_of(item):
+        return item[1][1].stat().st_size if item[1] else 0
 
-        for webp_file in webp_files:
-            profile = get_profile_for_image(webp_file.name)
-            profile_name = next(
-                (name for name, p in OPTIMIZATION_PROFILES.items()
-                 if any(webp_file.name.startswith(pat) for pat in p['patterns'])),
-                'default'
-            )
+    current_density = None
+    for (density, job), result in map_largest_first(run, work, size_of, max_workers=jobs):
+        if job is None:
+            print(f"⚠️  {density}: Directory not found")
+            continue
 
-            # Backup original
-            backup_original(webp_file)
+        if density != current_density:
+            current_density = density
+            print(f"\n📁 Processing {density}...")
+            print("-" * 80)
 
-            # Optimize
-            success, orig_size, new_size = optimize_webp(webp_file, profile)
+        if isinstance(result, Exception):
+            print(f"  ✗ {job[1].name:50s} | {result}")
+            continue
 
-            total_original += orig_size
-            total_optimized += new_size
-            files_processed += 1
+        success, orig_size, new_size, lines = result
+        total_original += orig_size
+        total_optimized += new_size
+        files_processed += 1
+        if success:
+            files_reduced += 1
 
-            if success:
-                files_reduced += 1
-                reduction = ((orig_size - new_size) / orig_size) * 100
-                print(f"  ✓ {webp_file.name:50s} | {profile_name:15s} | "
-                      f"{orig_size/1024:6.1f}KB → {new_size/1024:6.1f}KB | "
-                      f"-{reduction:5.1f}%")
-            else:
-                print(f"  → {webp_file.name:50s} | {profile_name:15s} | "
-                      f"{orig_size/1024:6.1f}KB | No change")
+        for line in lines:
+            print(line)
 
-            # Create LQIP for xhdpi only (one version is enough)
-            if create_lqips and density == 'xhdpi':
-                lqip = create_lqip(webp_file)
-                if lqip:
-                    print(f"    → LQIP created: {lqip.stat().st_size/1024:.1f}KB")
+    if search:
+        search['cache'].compact()
+        search['cache'].close()
 
     # Summary
     print("\n" + "=" * 80)
@@ -283,11 +425,85 @@ def optimize_all_images(create_lqips: bool = True, skip_xxxhdpi: bool = False):
         savings = (total_original - total_optimized) / (1024*1024)
         print(f"Total reduction: {reduction:.1f}% ({savings:.2f} MB saved)")
 
+    print(f"Decode work: {DECODE_STATS.summary()}")
+
     print()
     print(f"✓ Optimization complete!")
     print(f"✓ Original files backed up to: {BACKUP_PATH}")
 
 
+def _apply_plan_entry(entry: Dict) -> Tuple[int, int]:
+    """
+    Worker job: encode one drawable as planned.
+
+    Returns:
+        (size before, size after)
+    """
+    target = Path(entry['path'])
+    before = target.stat().st_size
+    if entry['quality'] is None:
+        return before, before
+
+    backup_original(target)
+    after = encode_webp_file(entry['source'], target, quality=entry['quality'],
+                             timeout=ENCODE_TIMEOUT, **entry['options'])
+    return before, after
+
+
+def apply_plan(plan_file: Path, jobs: Optional[int] = None):
+    """
+    Apply a budget_solver.py plan: re-encode every drawable at its planned quality.
+
+    Args:
+        plan_file: Plan JSON written by budget_solver.py
+        jobs: Parallel encode workers (default: all CPU cores)
+    """
+    with open(plan_file, 'r') as f:
+        plan = json.load(f)
+
+    print("🎯 APPLYING BUDGET PLAN")
+    print("=" * 80)
+    print(f"Plan: {plan_file}")
+    print(f"Budget: {plan['budget'] / (1024*1024):.2f} MB")
+    print()
+
+    BACKUP_PATH.mkdir(parents=True, exist_ok=True)
+
+    total_before = 0
+    total_after = 0
+    failed = 0
+
+    current_density = None
+    for entry, result in map_largest_first(_apply_plan_entry, plan['entries'],
+                                           lambda e: e['size'], max_workers=jobs):
+        target = Path(entry['path'])
+        if target.parent.name != current_density:
+            current_density = target.parent.name
+            print(f"\n📁 {current_density}...")
+
+        if isinstance(result, Exception):
+            failed += 1
+            print(f"  ✗ {target.name:50s} | {result}")
+            continue
+
+        before, after = result
+        total_before += before
+        total_after += after
+        setting = "kept" if entry['quality'] is None else f"q={entry['quality']}"
+        print(f"  ✓ {target.name:50s} | {setting:7s} | "
+              f"{before/1024:6.1f}KB → {after/1024:6.1f}KB | ssim {entry['ssim']:.4f}")
+
+    print("\n" + "=" * 80)
+    print("📊 PLAN SUMMARY")
+    print("=" * 80)
+    print(f"Files: {len(plan['entries'])} ({failed} failed)")
+    print(f"Before: {total_before / (1024*1024):.2f} MB")
+    print(f"After: {total_after / (1024*1024):.2f} MB")
+    print(f"Budget: {plan['budget'] / (1024*1024):.2f} MB "
+          f"({'within' if total_after <= plan['budget'] else 'OVER'} budget)")
+    print(f"✓ Original files backed up to: {BACKUP_PATH}")
+
+
 def analyze_density_distribution():
     """Analyze which densities are actually needed."""
     print("\n📊 DENSITY DISTRIBUTION ANALYSIS")
@@ -310,6 +526,7 @@ def analyze_density_distribution():
     print("  • mdpi: Keep for low-end devices")
     print("  • hdpi/xhdpi: Primary target for most phones")
     print("  • xxhdpi: For high-end phones")
+    print("  • Hard size target: python budget_solver.py --budget <size>, then --apply-plan")
 
 
 if __name__ == "__main__":
@@ -322,13 +539,24 @@ if __name__ == "__main__":
                        help='Skip xxxhdpi optimization (largest files)')
     parser.add_argument('--analyze-only', action='store_true',
                        help='Only analyze distribution, do not optimize')
+    parser.add_argument('--jobs', '-j', type=int, default=None,
+                       help='Parallel encode workers (default: all CPU cores)')
+    parser.add_argument('--apply-plan', type=Path, default=None,
+                       help='Apply a per-file quality plan from budget_solver.py')
+    parser.add_argument('--target-ssim', type=float, default=None,
+                       help='Search quality per file for the smallest encode with at least '
+                            'this SSIM (e.g. 0.985), capped at the profile quality')
 
     args = parser.parse_args()
 
     if args.analyze_only:
         analyze_density_distribution()
+    elif args.apply_plan:
+        apply_plan(args.apply_plan, jobs=args.jobs)
     else:
         optimize_all_images(
             create_lqips=not args.skip_lqip,
-            skip_xxxhdpi=args.skip_xxxhdpi
+            skip_xxxhdpi=args.skip_xxxhdpi,
+            jobs=args.jobs,
+            target_ssim=args.target_ssim
         )
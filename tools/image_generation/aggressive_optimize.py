@@ -2,15 +2,24 @@
 """
 Aggressive WebP Optimizer - Second pass with more aggressive settings
 Targets files that didn't optimize in first pass
+
+Files with a current decision in encoder_decisions.json (see
+encoder_tuner.py) are encoded once with their tuned setting instead of
+going through the size heuristics below.
 """
 
 import os
-import subprocess
 import shutil
 from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from encoder_tuner import DECISIONS_FILE, DecisionStore, apply_decision
+from image_probe import probe
+from webp_codec import encode_webp_file, map_largest_first
 
 BASE_RES_PATH = Path("/Users/jonathanmallinger/Workspace/SpiritAtlas/app/src/main/res")
 DENSITIES = ['mdpi', 'hdpi', 'xhdpi', 'xxhdpi', 'xxxhdpi']
+ENCODE_TIMEOUT = 30  # Per-job timeout (seconds)
 
 # More aggressive profiles
 AGGRESSIVE_PROFILES = {
@@ -45,45 +54,27 @@ AGGRESSIVE_PROFILES = {
 }
 
 
-def is_lossless(filepath: Path) -> bool:
-    """Check if WebP is lossless."""
-    result = subprocess.run(['webpinfo', str(filepath)], capture_output=True, text=True)
-    return 'Lossless' in result.stdout
-
-
 def optimize_aggressive(input_path: Path, quality: int, **kwargs):
     """Apply aggressive optimization."""
     original_size = input_path.stat().st_size
     temp_output = input_path.with_suffix('.webp.tmp')
 
-    cmd = [
-        'cwebp',
-        '-q', str(quality),
-        '-m', str(kwargs.get('method', 6)),
-        '-af',
-        '-mt',
-    ]
-
-    if kwargs.get('sharp_yuv'):
-        cmd.append('-sharp_yuv')
-
-    if 'alpha_quality' in kwargs:
-        cmd.extend(['-alpha_q', str(kwargs['alpha_quality'])])
-
-    if 'preprocessing' in kwargs:
-        cmd.extend(['-pre', str(kwargs['preprocessing'])])
-
-    cmd.extend([str(input_path), '-o', str(temp_output)])
-
     try:
-        result = subprocess.run(cmd, capture_output=True, timeout=30)
-
-        if result.returncode == 0 and temp_output.exists():
-            new_size = temp_output.stat().st_size
-
-            if new_size < original_size * 0.92:  # At least 8% reduction
-                shutil.move(temp_output, input_path)
-                return True, original_size, new_size
+        new_size = encode_webp_file(
+            input_path, temp_output,
+            quality=quality,
+            method=kwargs.get('method', 6),
+            autofilter=True,
+            multithread=True,
+            sharp_yuv=kwargs.get('sharp_yuv', False),
+            alpha_quality=kwargs.get('alpha_quality'),
+            preprocessing=kwargs.get('preprocessing'),
+            timeout=kwargs.get('timeout', ENCODE_TIMEOUT)
+        )
+
+        if new_size < original_size * 0.92:  # At least 8% reduction
+            shutil.move(temp_output, input_path)
+            return True, original_size, new_size
 
         if temp_output.exists():
             temp_output.unlink()
@@ -95,8 +86,55 @@ def optimize_aggressive(input_path: Path, quality: int, **kwargs):
     return False, original_size, original_size
 
 
-def aggressive_pass():
-    """Second optimization pass with aggressive settings."""
+def _aggressive_file(webp_file: Path,
+                     decision: Optional[Dict[str, Any]] = None) -> Optional[Tuple[str, int, int]]:
+    """
+    Worker job: pick a profile for one file and re-encode it.
+
+    Args:
+        webp_file: Drawable to re-encode
+        decision: Tuned setting for the file (skips the heuristics)
+
+    Returns:
+        (label, original_size, new_size) if the file shrank, else None
+    """
+    if decision is not None:
+        result = apply_decision(webp_file, decision)
+        if result is None:
+            return None
+        return ("Tuned        ",) + result
+
+    size_kb = webp_file.stat().st_size / 1024
+
+    # Check if lossless
+    if probe(webp_file).lossless:
+        if size_kb > 100:
+            profile = AGGRESSIVE_PROFILES['large_lossless']
+        else:
+            profile = AGGRESSIVE_PROFILES['medium_lossless']
+
+        success, orig, new = optimize_aggressive(webp_file, **profile)
+        if success:
+            return "Lossless→Lossy", orig, new
+
+    # Large files (even if lossy)
+    if size_kb > 200:
+        profile = AGGRESSIVE_PROFILES['large_illustrations']
+        success, orig, new = optimize_aggressive(webp_file, **profile)
+        if success:
+            return "Large file   ", orig, new
+
+    return None
+
+
+def aggressive_pass(jobs: Optional[int] = None, decisions_file: Optional[Path] = DECISIONS_FILE):
+    """
+    Second optimization pass with aggressive settings.
+
+    Args:
+        jobs: Parallel encode workers (default: all CPU cores)
+        decisions_file: encoder_tuner.py decisions (None = heuristics only)
+    """
 
     print("💪 AGGRESSIVE OPTIMIZATION PASS")
     print("=" * 80)
@@ -105,52 +143,46 @@ def aggressive_pass():
     total_new = 0
     files_optimized = 0
 
+    decisions = None
+    if decisions_file is not None and Path(decisions_file).exists():
+        decisions = DecisionStore(decisions_file)
+        print(f"Using {len(decisions)} tuned decisions from {Path(decisions_file).name}")
+
+    # Collect every candidate up front so the pool can schedule across densities
+    work = []
     for density in DENSITIES:
         drawable_dir = BASE_RES_PATH / f"drawable-{density}"
         if not drawable_dir.exists():
             continue
 
-        print(f"\n📁 {density}...")
-
         for webp_file in sorted(drawable_dir.glob("*.webp")):
-            size_kb = webp_file.stat().st_size / 1024
-
-            # Skip files already well optimized
-            if size_kb < 20:
+            decision = decisions.get(webp_file) if decisions else None
+            # Skip files already well optimized (unless tuned)
+            if decision is None and webp_file.stat().st_size / 1024 < 20:
                 continue
+            work.append((density, webp_file, decision))
+
+    current_density = None
+    for (density, webp_file, _), result in map_largest_first(
+            lambda item: _aggressive_file(item[1], item[2]), work,
+            lambda item: item[1].stat().st_size, max_workers=jobs):
+        if density != current_density:
+            current_density = density
+            print(f"\n📁 {density}...")
+
+        if isinstance(result, Exception):
+            print(f"  ✗ {webp_file.name:50s} | {result}")
+            continue
+        if result is None:
+            continue
 
-            optimized = False
-
-            # Check if lossless
-            if is_lossless(webp_file):
-                if size_kb > 100:
-                    profile = AGGRESSIVE_PROFILES['large_lossless']
-                else:
-                    profile = AGGRESSIVE_PROFILES['medium_lossless']
-
-                success, orig, new = optimize_aggressive(webp_file, **profile)
-
-                if success:
-                    reduction = ((orig - new) / orig) * 100
-                    print(f"  ✓ {webp_file.name:50s} | Lossless→Lossy | "
-                          f"{orig/1024:6.1f}KB → {new/1024:6.1f}KB | -{reduction:5.1f}%")
-                    total_orig += orig
-                    total_new += new
-                    files_optimized += 1
-                    optimized = True
-
-            # Large files (even if lossy)
-            if not optimized and size_kb > 200:
-                profile = AGGRESSIVE_PROFILES['large_illustrations']
-                success, orig, new = optimize_aggressive(webp_file, **profile)
-
-                if success:
-                    reduction = ((orig - new) / orig) * 100
-                    print(f"  ✓ {webp_file.name:50s} | Large file   | "
-                          f"{orig/1024:6.1f}KB → {new/1024:6.1f}KB | -{reduction:5.1f}%")
-                    total_orig += orig
-                    total_new += new
-                    files_optimized += 1
+        label, orig, new = result
+        reduction = ((orig - new) / orig) * 100
+        print(f"  ✓ {webp_file.name:50s} | {label} | "
+              f"{orig/1024:6.1f}KB → {new/1024:6.1f}KB | -{reduction:5.1f}%")
+        total_orig += orig
+        total_new += new
+        files_optimized += 1
 
     print("\n" + "=" * 80)
     print("📊 AGGRESSIVE PASS SUMMARY")
@@ -168,4 +200,15 @@ def aggressive_pass():
 
 
 if __name__ == "__main__":
-    aggressive_pass()
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Aggressive WebP second pass')
+    parser.add_argument('--jobs', '-j', type=int, default=None,
+                       help='Parallel encode workers (default: all CPU cores)')
+    parser.add_argument('--decisions', type=Path, default=DECISIONS_FILE,
+                       help=f'encoder_tuner.py decisions file (default: {DECISIONS_FILE.name})')
+    parser.add_argument('--no-decisions', action='store_true',
+                       help='Ignore tuned decisions and use the size heuristics only')
+    args = parser.parse_args()
+
+    aggressive_pass(jobs=args.jobs, decisions_file=None if args.no_decisions else args.decisions)
@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+"""
+Declarative batch runner for SpiritAtlas FLUX generation scripts
+
+Every batch script describes *what* to generate - a prompt source, the model,
+sizes/seeds and how output files are named - as a BatchSpec, and this module
+runs it through one shared concurrent scheduler (FalImageGenerator's async
+engine) with adaptive rate backoff instead of fixed sleeps. Downloads stream
+to disk while the remaining prompts are still generating, and prompts whose
+exact request was generated before are restored from the generation cache
+without an API call. With queue mode on, request IDs are persisted (see
+request_store.py) so an interrupted batch resumes without paying twice.
+
+Usage (from a script):
+    from batch_runner import BatchSpec, run_batch
+
+    spec = BatchSpec(
+        name="Hero backgrounds",
+        model="fal-ai/flux-pro/v1.1",
+        output_dir=Path("generated_images/hero_backgrounds"),
+        prompts=HERO_PROMPTS,
+        output_name="{id}.png",
+        settings={"guidance_scale": 3.5, "num_inference_steps": 28},
+    )
+    report = run_batch(spec)
+
+Usage (from a JSON job spec):
+    python batch_runner.py my_batch.json
+
+    {
+      "name": "Chakra refresh",
+      "model": "fal-ai/flux-pro/v1.1",
+      "output_dir": "generated_images/chakras_v2",
+      "prompts": "chakra_prompts.json",
+      "output_name": "{index:03d}_{slug}.png",
+      "settings": {"guidance_scale": 3.5, "num_inference_steps": 28},
+      "max_concurrency": 6,
+      "queue": true
+    }
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import asyncio
+import argparse
+from pathlib import Path
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from fal_generator import FalImageGenerator
+from downloads import DownloadPool
+from generation_cache import GenerationCache
+from request_store import RequestStore
+
+
+PromptSource = Union[List[Dict[str, Any]], Callable[[], List[Dict[str, Any]]]]
+OutputName = Union[str, Callable[[Dict[str, Any], int], str]]
+
+
+@dataclass
+class BatchSpec:
+    """
+    Declarative description of a generation batch.
+
+    Each prompt record is a dict with at least "prompt"; "width"/"height" or
+    "image_size", "seed" and "index" are picked up when present. Any other keys
+    (id, title, ...) are kept on the record for naming and manifests.
+    """
+    name: str
+    model: str
+    output_dir: Path
+    prompts: PromptSource
+    output_name: OutputName = "{index:03d}_{slug}.png"
+    settings: Dict[str, Any] = field(default_factory=dict)
+    cost_per_image: float = 0.0
+    max_concurrency: int = 6
+    rate_limit: float = 2.0
+    timeout: float = 300.0
+    use_cache: bool = True
+    queue: bool = False
+
+    def load_prompts(self) -> List[Dict[str, Any]]:
+        return self.prompts() if callable(self.prompts) else list(self.prompts)
+
+    def filename_for(self, record: Dict[str, Any], index: int) -> str:
+        if callable(self.output_name):
+            return self.output_name(record, index)
+        fields = dict(record, index=index, slug=slugify(record.get("title", "")))
+        return self.output_name.format(**fields)
+
+
+@dataclass
+class JobResult:
+    """Outcome of one prompt record in a batch."""
+    index: int
+    record: Dict[str, Any]
+    filename: str
+    filepath: Path
+    elapsed: float = 0.0
+    file_size: int = 0
+    image_url: Optional[str] = None
+    error: Optional[str] = None
+    cached: bool = False
+    resumed: bool = False
+
+    @property
+    def success(self) -> bool:
+        return self.error is None
+
+
+@dataclass
+class BatchReport:
+    """Summary of a finished batch (results are in prompt order)."""
+    results: List[JobResult]
+    elapsed: float
+    cost_per_image: float
+
+    @property
+    def succeeded(self) -> List[JobResult]:
+        return [r for r in self.results if r.success]
+
+    @property
+    def failed(self) -> List[JobResult]:
+        return [r for r in self.results if not r.success]
+
+    @property
+    def cached(self) -> List[JobResult]:
+        return [r for r in self.results if r.cached]
+
+    @property
+    def cost(self) -> float:
+        """Spend for this run; cache hits are free."""
+        return len([r for r in self.succeeded if not r.cached]) * self.cost_per_image
+
+
+def slugify(title: str, max_length: int = 50) -> str:
+    """Lowercase, underscore-separated filename stem from a prompt title."""
+    slug = re.sub(r'[^a-z0-9]+', '_', title.lower()).strip('_')
+    return slug[:max_length]
+
+
+def _job_arguments(record: Dict[str, Any], settings: Dict[str, Any]) -> Dict[str, Any]:
+    """Map a prompt record onto generate_many_async() job keyword arguments."""
+    job = dict(settings)
+    job["prompt"] = record["prompt"]
+    if record.get("width") and record.get("height"):
+        job["width"] = record["width"]
+        job["height"] = record["height"]
+    elif record.get("image_size"):
+        job["image_size"] = record["image_size"]
+    if record.get("seed") is not None:
+        job["seed"] = record["seed"]
+    return job
+
+
+async def _run_batch_async(
+    spec: BatchSpec,
+    records: List[Dict[str, Any]],
+    generator: FalImageGenerator,
+    on_result: Optional[Callable[[JobResult], None]],
+    cache: Optional[GenerationCache],
+    request_store: Optional[RequestStore] = None
+) -> List[JobResult]:
+    spec.output_dir.mkdir(parents=True, exist_ok=True)
+
+    jobs = []
+    hits = []
+    results: Dict[str, JobResult] = {}
+    cache_keys: Dict[str, str] = {}
+    for position, record in enumerate(records, 1):
+        index = record.get("index", position)
+        filename = spec.filename_for(record, index)
+        job_id = str(position)
+        job_result = JobResult(index, record, filename, spec.output_dir / filename)
+        results[job_id] = job_result
+        arguments = _job_arguments(record, spec.settings)
+
+        if cache is not None:
+            params = {k: v for k, v in arguments.items() if k != "prompt"}
+            cache_keys[job_id] = cache.make_key(record["prompt"], spec.model, **params)
+            if cache.restore(cache_keys[job_id], job_result.filepath):
+                job_result.cached = True
+                job_result.file_size = job_result.filepath.stat().st_size
+                hits.append(job_result)
+                continue
+
+        jobs.append(dict(arguments, id=job_id))
+
+    total = len(records)
+    finished = 0
+
+    def report(job_result: JobResult):
+        nonlocal finished
+        finished += 1
+        title = job_result.record.get("title", job_result.filename)
+        if job_result.cached:
+            print(f"  [{finished}/{total}] ↺ {title} → {job_result.filename} (cached)")
+        elif job_result.success:
+            resumed = ", resumed" if job_result.resumed else ""
+            print(f"  [{finished}/{total}] ✅ {title} → {job_result.filename} "
+                  f"({job_result.file_size / 1024:.1f} KB, {job_result.elapsed:.1f}s{resumed})")
+        else:
+            print(f"  [{finished}/{total}] ❌ {title}: {job_result.error}")
+        if on_result:
+            on_result(job_result)
+
+    async def downloaded(job_id: str, future: "asyncio.Future[int]"):
+        job_result = results[job_id]
+        try:
+            job_result.file_size = await future
+            if cache is not None:
+                # Hashing and copying a multi-MB PNG would stall polling on the loop
+                await asyncio.to_thread(cache.put, cache_keys[job_id], job_result.filepath,
+                                        prompt=job_result.record["prompt"], model=spec.model)
+        except Exception as e:
+            job_result.error = f"Download failed - {e}"
+        report(job_result)
+
+    for job_result in hits:
+        report(job_result)
+
+    pending = []
+    loop = asyncio.get_running_loop()
+
+    with DownloadPool(max_workers=max(1, spec.max_concurrency), retry=generator.retry) as pool:
+        async for outcome in generator.generate_many_async(
+            jobs,
+            model=spec.model,
+            max_concurrency=spec.max_concurrency,
+            rate_limit=spec.rate_limit,
+            timeout=spec.timeout,
+            request_store=request_store,
+        ):
+            job_result = results[outcome.job_id]
+            job_result.elapsed = outcome.elapsed
+            job_result.resumed = outcome.resumed
+            images = (outcome.result or {}).get("images") or []
+
+            if not outcome.success or not images:
+                job_result.error = str(outcome.error) if outcome.error else "No image returned"
+                report(job_result)
+                continue
+
+            # Hand the download to the pool and keep consuming generations
+            job_result.image_url = images[0]["url"]
+            future = asyncio.wrap_future(pool.submit(job_result.image_url, job_result.filepath),
+                                         loop=loop)
+            pending.append(asyncio.ensure_future(downloaded(outcome.job_id, future)))
+
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    return sorted(results.values(), key=lambda r: r.index)
+
+
+def run_batch(
+    spec: BatchSpec,
+    records: Optional[List[Dict[str, Any]]] = None,
+    on_result: Optional[Callable[[JobResult], None]] = None,
+    api_key: Optional[str] = None
+) -> BatchReport:
+    """
+    Run a batch spec to completion.
+
+    Args:
+        spec: Batch description
+        records: Prompt records to run (default: spec.load_prompts())
+        on_result: Called in the main thread as each image finishes (e.g. to
+            append a manifest entry)
+        api_key: fal.ai key (default: FAL_KEY environment variable)
+
+    Returns:
+        BatchReport with per-image results in prompt order
+    """
+    if records is None:
+        records = spec.load_prompts()
+
+    generator = FalImageGenerator(api_key or os.environ.get("FAL_KEY"))
+    cache = GenerationCache() if spec.use_cache else None
+
+    print(f"\n🚀 {spec.name}: {len(records)} image(s) with {spec.model}")
+    print(f"   Concurrency: {spec.max_concurrency} | Rate limit: {spec.rate_limit}/s "
+          f"| Timeout: {spec.timeout:.0f}s")
+
+    start_time = time.time()
+    try:
+        if spec.queue:
+            with RequestStore() as request_store:
+                if request_store.pending():
+                    print(f"   Queue mode: reattaching to {len(request_store.pending())} "
+                          f"request(s) from an earlier run")
+                results = asyncio.run(_run_batch_async(spec, records, generator, on_result, cache,
+                                                       request_store))
+        else:
+            results = asyncio.run(_run_batch_async(spec, records, generator, on_result, cache))
+    finally:
+        if cache is not None:
+            cache.compact()  # Fold the journaled index updates into index.json
+            cache.close()
+    return BatchReport(results, time.time() - start_time, spec.cost_per_image)
+
+
+def load_spec(spec_path: Path) -> BatchSpec:
+    """Load a BatchSpec from a JSON job spec file (see module docstring)."""
+    with open(spec_path, 'r') as f:
+        data = json.load(f)
+
+    prompts = data["prompts"]
+    if isinstance(prompts, str):
+        prompts_file = (spec_path.parent / prompts).resolve()
+
+        def prompts() -> List[Dict[str, Any]]:
+            with open(prompts_file, 'r') as pf:
+                return json.load(pf)
+
+    return BatchSpec(
+        name=data.get("name", spec_path.stem),
+        model=data.get("model", FalImageGenerator.MODEL_FLUX_PRO),
+        output_dir=Path(data["output_dir"]),
+        prompts=prompts,
+        output_name=data.get("output_name", "{index:03d}_{slug}.png"),
+        settings=data.get("settings", {}),
+        cost_per_image=data.get("cost_per_image", 0.0),
+        max_concurrency=data.get("max_concurrency", 6),
+        rate_limit=data.get("rate_limit", 2.0),
+        timeout=data.get("timeout", 300.0),
+        use_cache=data.get("cache", True),
+        queue=data.get("queue", False),
+    )
+
+
+def print_report(report: BatchReport, total: int):
+    """Print the standard end-of-batch summary."""
+    print(f"✅ Successfully generated: {len(report.succeeded)}/{total}")
+    if report.cached:
+        print(f"↺ Reused from cache: {len(report.cached)}")
+    if report.failed:
+        print(f"❌ Failed: {len(report.failed)}")
+    print(f"⏱️  Total time: {report.elapsed / 60:.1f} minutes")
+    print(f"💰 Total cost: ${report.cost:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a declarative FLUX batch job spec')
+    parser.add_argument('spec', type=Path, help='JSON job spec file')
+    parser.add_argument('--max-concurrency', type=int,
+                        help='Override the spec concurrency limit')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Regenerate every prompt instead of reusing cached results')
+    parser.add_argument('--queue', action='store_true',
+                        help='Submit through the fal queue and persist request IDs so an '
+                             'interrupted run resumes without re-paying')
+    args = parser.parse_args()
+
+    if not os.environ.get('FAL_KEY'):
+        print("❌ FAL_KEY environment variable not set")
+        sys.exit(1)
+
+    spec = load_spec(args.spec)
+    if args.max_concurrency:
+        spec.max_concurrency = args.max_concurrency
+    if args.no_cache:
+        spec.use_cache = False
+    if args.queue:
+        spec.queue = True
+
+    records = spec.load_prompts()
+    report = run_batch(spec, records)
+
+    print("\n" + "=" * 60)
+    print(f"{spec.name.upper()} COMPLETE")
+    print("=" * 60)
+    print_report(report, len(records))
+    print(f"📁 Output directory: {spec.output_dir}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+APK image byte-budget solver for SpiritAtlas
+
+Instead of tuning qualities by hand across repeated aggressive passes, this
+measures a rate/quality curve for every drawable-*/*.webp and picks one
+encoder setting per image and density so that the total fits a byte budget
+with the highest total quality (sum of per-file SSIM vs. the original).
+
+- Curves: each file is re-encoded from its backed-up original (see
+  advanced_optimize.backup_original) at CURVE_QUALITIES with its optimization
+  profile, and scored with quality_search.ssim(). Keeping the current file is
+  always a candidate too, so lossless icons are only touched when the budget
+  needs it.
+- Solver: a multiple-choice knapsack solved by Lagrangian relaxation on each
+  curve's convex hull (bisecting the bytes-vs-quality trade-off), then
+  greedily spending any leftover bytes on the best remaining upgrades.
+- The plan (image_budget_plan.json) lists the chosen setting per file and
+  carries the measured curves, so re-solving for another budget with
+  --curves-from is instant. Apply it with:
+
+    python advanced_optimize.py --apply-plan image_budget_plan.json
+
+Usage:
+    python budget_solver.py --budget 12MB [--skip-xxxhdpi] [--jobs N]
+    python budget_solver.py --budget 10MB --curves-from image_budget_plan.json
+"""
+
+import os
+import re
+import sys
+import json
+import heapq
+import argparse
+from pathlib import Path
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image
+
+from advanced_optimize import (BASE_RES_PATH, DENSITIES, ENCODE_TIMEOUT, get_profile_for_image,
+                               original_path)
+from quality_search import encoded_ssim, ssim
+from webp_codec import encode_webp, map_largest_first
+
+PLAN_VERSION = 1
+DEFAULT_PLAN_FILE = Path(__file__).parent / "image_budget_plan.json"
+
+# Qualities measured per file (plus "keep the current file")
+CURVE_QUALITIES = [40, 50, 60, 70, 80, 85, 90, 95]
+
+
+@dataclass
+class RatePoint:
+    """One candidate setting for a file"""
+    quality: Optional[int]  # None = keep the current file as is
+    size: int
+    score: float
+
+
+@dataclass
+class AssetCurve:
+    """Measured rate/quality curve of one drawable"""
+    path: str                # drawable to write
+    source: str              # original the candidates were encoded from
+    options: Dict            # encode_webp() options other than quality
+    points: List[RatePoint] = field(default_factory=list)
+
+
+def parse_size(text: str) -> int:
+    """'12MB', '750KB', '9.5M' or plain bytes -> bytes (binary units)"""
+    match = re.fullmatch(r'\s*([\d.]+)\s*([kmg]?)i?b?\s*', text.lower())
+    if not match:
+        raise ValueError(f"Invalid size: {text}")
+    scale = {'': 1, 'k': 1024, 'm': 1024 ** 2, 'g': 1024 ** 3}[match.group(2)]
+    return int(float(match.group(1)) * scale)
+
+
+def encode_options_for(filename: str) -> Dict:
+    """encode_webp() options (besides quality) the optimizer uses for a file"""
+    profile = get_profile_for_image(filename)
+    return {
+        'method': profile['method'],
+        'alpha_quality': profile.get('alpha_quality'),
+        'preprocessing': profile.get('preprocessing'),
+        'autofilter': True,
+        'sharp_yuv': True,
+    }
+
+
+def measure_curve(webp_file: Path, qualities: List[int] = CURVE_QUALITIES) -> AssetCurve:
+    """Encode one file at every candidate quality and score each against its original."""
+    source = original_path(webp_file)
+    options = encode_options_for(webp_file.name)
+    curve = AssetCurve(path=str(webp_file), source=str(source), options=options)
+
+    with Image.open(source) as img:
+        img = img.convert('RGBA' if 'A' in img.getbands() else 'RGB')
+
+    if source == webp_file:
+        keep_score = 1.0
+    else:
+        with Image.open(webp_file) as current:
+            keep_score = ssim(img, current.convert(img.mode))
+    curve.points.append(RatePoint(None, webp_file.stat().st_size, keep_score))
+
+    for quality in qualities:
+        data = encode_webp(img, quality=quality, timeout=ENCODE_TIMEOUT, **options)
+        curve.points.append(RatePoint(quality, len(data), encoded_ssim(img, data)))
+    return curve
+
+
+def measure_all(densities: List[str], qualities: List[int] = CURVE_QUALITIES,
+                jobs: Optional[int] = None) -> List[AssetCurve]:
+    """Measure curves for every drawable (largest first on a worker pool)."""
+    files = []
+    for density in densities:
+        drawable_dir = BASE_RES_PATH / f"drawable-{density}"
+        if drawable_dir.exists():
+            files.extend(sorted(drawable_dir.glob("*.webp")))
+
+    curves = []
+    for i, (webp_file, result) in enumerate(
+            map_largest_first(lambda f: measure_curve(f, qualities), files,
+                              lambda f: f.stat().st_size, max_workers=jobs), 1):
+        label = f"{webp_file.parent.name}/{webp_file.name}"
+        if isinstance(result, Exception):
+            # Still counts against the budget, at its current size
+            print(f"  ✗ [{i}/{len(files)}] {label}: {result} (kept as is)")
+            curves.append(AssetCurve(path=str(webp_file), source=str(webp_file), options={},
+                                     points=[RatePoint(None, webp_file.stat().st_size, 1.0)]))
+            continue
+        best = max(result.points, key=lambda p: p.score)
+        print(f"  ✓ [{i}/{len(files)}] {label:60s} "
+              f"{min(p.size for p in result.points)/1024:7.1f}-{max(p.size for p in result.points)/1024:7.1f}KB "
+              f"ssim ≤ {best.score:.4f}")
+        curves.append(result)
+    return curves
+
+
+def _hull(points: List[RatePoint]) -> List[RatePoint]:
+    """
+    Upper convex hull of (size, score), by increasing size.
+
+    Only hull points can be optimal for some trade-off; dominated and
+    concave-in points are dropped, so upgrades along the hull have decreasing
+    score gain per byte.
+    """
+    hull: List[RatePoint] = []
+    for point in sorted(points, key=lambda p: (p.size, -p.score)):
+        if hull and point.score <= hull[-1].score:
+            continue  # Bigger but not better
+        while len(hull) >= 2:
+            a, b = hull[-2], hull[-1]
+            # Drop b if it lies on or below the segment a -> point
+            if (b.score - a.score) * (point.size - a.size) <= (point.score - a.score) * (b.size - a.size):
+                hull.pop()
+            else:
+                break
+        hull.append(point)
+    return hull
+
+
+def _pick(hull: List[RatePoint], tradeoff: float) -> int:
+    """Index of the hull point maximizing score - tradeoff * size"""
+    return max(range(len(hull)), key=lambda i: hull[i].score - tradeoff * hull[i].size)
+
+
+def solve(curves: List[AssetCurve], budget: int) -> Tuple[List[RatePoint], bool]:
+    """
+    Choose one point per curve maximizing total score within the budget.
+
+    Args:
+        curves: Measured curves
+        budget: Total bytes allowed
+
+    Returns:
+        (chosen point per curve, whether the budget could be met)
+    """
+    hulls = [_hull(curve.points) for curve in curves]
+
+    def total(choice: List[int]) -> int:
+        return sum(hull[i].size for hull, i in zip(hulls, choice))
+
+    smallest = [0] * len(hulls)
+    if total(smallest) > budget:
+        return [hull[0] for hull in hulls], False
+
+    best = [len(hull) - 1 for hull in hulls]
+    if total(best) <= budget:
+        return [hull[-1] for hull in hulls], True
+
+    # Bisect the Lagrange multiplier (score per byte) for the cheapest
+    # trade-off that still fits
+    low, high = 0.0, 1.0
+    while total([_pick(hull, high) for hull in hulls]) > budget:
+        high *= 2
+    for _ in range(64):
+        mid = (low + high) / 2
+        if total([_pick(hull, mid) for hull in hulls]) > budget:
+            low = mid
+        else:
+            high = mid
+    choice = [_pick(hull, high) for hull in hulls]
+
+    # Spend the leftover bytes on upgrades, best score gain per byte first
+    remaining = budget - total(choice)
+    upgrades = []
+    for k, (hull, i) in enumerate(zip(hulls, choice)):
+        if i + 1 < len(hull):
+            gain = (hull[i + 1].score - hull[i].score) / max(1, hull[i + 1].size - hull[i].size)
+            heapq.heappush(upgrades, (-gain, k))
+    while upgrades:
+        _, k = heapq.heappop(upgrades)
+        hull, i = hulls[k], choice[k]
+        cost = hull[i + 1].size - hull[i].size
+        if cost > remaining:
+            continue
+        choice[k] = i + 1
+        remaining -= cost
+        if i + 2 < len(hull):
+            gain = (hull[i + 2].score - hull[i + 1].score) / max(1, hull[i + 2].size - hull[i + 1].size)
+            heapq.heappush(upgrades, (-gain, k))
+
+    return [hull[i] for hull, i in zip(hulls, choice)], True
+
+
+def build_plan(curves: List[AssetCurve], budget: int) -> Dict:
+    """Solve and package the result as a plan for advanced_optimize.apply_plan()"""
+    chosen, feasible = solve(curves, budget)
+    entries = []
+    for curve, point in zip(curves, chosen):
+        entries.append({
+            'path': curve.path,
+            'source': curve.source,
+            'quality': point.quality,
+            'size': point.size,
+            'ssim': round(point.score, 5),
+            'options': curve.options,
+            'curve': [[p.quality, p.size, round(p.score, 5)] for p in curve.points],
+        })
+
+    total_size = sum(entry['size'] for entry in entries)
+    return {
+        'version': PLAN_VERSION,
+        'budget': budget,
+        'total_size': total_size,
+        'feasible': feasible,
+        'mean_ssim': round(sum(e['ssim'] for e in entries) / len(entries), 5) if entries else None,
+        'entries': entries,
+    }
+
+
+def load_curves(plan_file: Path) -> List[AssetCurve]:
+    """Curves stored in an earlier plan (skips re-measuring)"""
+    with open(plan_file, 'r') as f:
+        plan = json.load(f)
+    if plan.get('version') != PLAN_VERSION:
+        raise ValueError(f"Unsupported plan version in {plan_file}: {plan.get('version')}")
+    return [
+        AssetCurve(path=e['path'], source=e['source'], options=e['options'],
+                   points=[RatePoint(q, size, score) for q, size, score in e['curve']])
+        for e in plan['entries']
+    ]
+
+
+def print_plan(plan: Dict):
+    """Per-density totals and quality of a plan"""
+    print("\n" + "=" * 80)
+    print("📊 BUDGET PLAN")
+    print("=" * 80)
+
+    by_density: Dict[str, List[Dict]] = {}
+    for entry in plan['entries']:
+        by_density.setdefault(Path(entry['path']).parent.name, []).append(entry)
+    for density, entries in sorted(by_density.items()):
+        kept = sum(1 for e in entries if e['quality'] is None)
+        print(f"{density:18s}: {len(entries):3d} files | "
+              f"{sum(e['size'] for e in entries)/(1024*1024):6.2f} MB | "
+              f"min SSIM {min(e['ssim'] for e in entries):.4f} | {kept} kept as is")
+
+    print()
+    print(f"Budget:     {plan['budget']/(1024*1024):.2f} MB")
+    print(f"Planned:    {plan['total_size']/(1024*1024):.2f} MB")
+    if plan['mean_ssim'] is not None:
+        print(f"Mean SSIM:  {plan['mean_ssim']:.4f}")
+    if not plan['feasible']:
+        print("⚠️  Budget cannot be met even at the lowest measured quality - "
+              "plan uses the smallest setting for every file")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fit drawable-* WebPs into a total byte budget')
+    parser.add_argument('--budget', required=True,
+                        help='Total bytes for all drawables, e.g. 12MB or 800KB')
+    parser.add_argument('--plan', type=Path, default=DEFAULT_PLAN_FILE,
+                        help=f'Plan file to write (default: {DEFAULT_PLAN_FILE.name})')
+    parser.add_argument('--curves-from', type=Path,
+                        help='Re-solve using the curves stored in an earlier plan')
+    parser.add_argument('--skip-xxxhdpi', action='store_true',
+                        help='Leave xxxhdpi out of the budget')
+    parser.add_argument('--qualities', type=lambda s: [int(q) for q in s.split(',')],
+                        default=CURVE_QUALITIES,
+                        help=f"Qualities to measure (default: {','.join(map(str, CURVE_QUALITIES))})")
+    parser.add_argument('--jobs', '-j', type=int, default=None,
+                        help='Parallel encode workers (default: all CPU cores)')
+    args = parser.parse_args()
+
+    try:
+        budget = parse_size(args.budget)
+    except ValueError as e:
+        print(f"ERROR: {e}")
+        sys.exit(1)
+
+    print("🎯 IMAGE BYTE-BUDGET SOLVER")
+    print("=" * 80)
+
+    if args.curves_from:
+        curves = load_curves(args.curves_from)
+        print(f"Loaded {len(curves)} curves from {args.curves_from}")
+    else:
+        densities = [d for d in DENSITIES if not (args.skip_xxxhdpi and d == 'xxxhdpi')]
+        print(f"Measuring rate/quality curves in {BASE_RES_PATH} ({', '.join(densities)})...")
+        curves = measure_all(densities, args.qualities, jobs=args.jobs)
+
+    if not curves:
+        print("No drawables found")
+        sys.exit(1)
+
+    plan = build_plan(curves, budget)
+    print_plan(plan)
+
+    tmp_file = args.plan.with_suffix('.json.tmp')
+    with open(tmp_file, 'w') as f:
+        json.dump(plan, f, indent=2)
+    os.replace(tmp_file, args.plan)
+
+    print(f"\n✓ Plan written to {args.plan}")
+    print(f"  Apply with: python advanced_optimize.py --apply-plan {args.plan}")
+
+
+if __name__ == "__main__":
+    main()
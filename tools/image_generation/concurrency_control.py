@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Adaptive (AIMD) concurrency control for SpiritAtlas generators
+
+generate_images.py ran a fixed --batch-size of requests at once and
+FalImageGenerator a fixed max_concurrency: too low wastes the provider's
+throughput, too high just queues requests on the provider side (or gets them
+rejected with HTTP 429). AIMDController finds the ceiling the way TCP does:
+
+- Additive increase: every window of healthy completions (latency and queue
+  time near the best seen so far) while the window is actually in use
+  widens the limit by one.
+- Multiplicative decrease: HTTP 429, 5xx, timeouts, or a smoothed queue time
+  (or latency, when the provider reports no queue updates) beyond
+  latency_tolerance x its baseline halve the limit - once per round: only
+  requests started after the last cut can trigger the next one, so a burst
+  of failures under the old limit counts as one signal.
+
+Every change of the limit is kept in `history` (and passed to on_change), and
+summary() reports the concurrency chosen over the run.
+
+Usage (threads):
+    controller = AIMDController(initial=5, max_limit=16)
+    with ThreadPoolExecutor(max_workers=controller.max_limit) as executor:
+        ...
+        with controller.slot() as sample:          # in each worker
+            result = fal_client.subscribe(model, arguments=args,
+                                          on_queue_update=sample.on_queue_update)
+
+Usage (asyncio):
+    async with controller.async_slot() as sample:
+        ...
+"""
+
+import re
+import time
+import asyncio
+import threading
+from contextlib import contextmanager, asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+# Seconds between limit checks while an asyncio caller waits for a slot
+ASYNC_POLL_INTERVAL = 0.05
+
+_STATUS_IN_MESSAGE = re.compile(r'\b(429|5\d\d)\b|too many requests', re.IGNORECASE)
+
+
+def http_status(error: BaseException) -> Optional[int]:
+    """HTTP status carried by a provider/HTTP-library exception, if any"""
+    # fal_client / httpx / requests / replicate spell the status differently
+    response = getattr(error, 'response', None)
+    for status in (getattr(error, 'status_code', None), getattr(error, 'status', None),
+                   getattr(response, 'status_code', None)):
+        if isinstance(status, int):
+            return status
+    return None
+
+
+def congestion_signal(error: Optional[BaseException]) -> Optional[str]:
+    """
+    Classify a failed request.
+
+    Returns:
+        '429', '5xx' or 'timeout' for overload signals, None for anything else
+        (bad prompts, auth errors, ... say nothing about capacity)
+    """
+    if error is None:
+        return None
+    if isinstance(error, (TimeoutError, asyncio.TimeoutError)):
+        return 'timeout'
+
+    status = http_status(error)
+    if status is not None:
+        if status == 429:
+            return '429'
+        if 500 <= status < 600:
+            return '5xx'
+        return None
+
+    match = _STATUS_IN_MESSAGE.search(str(error))
+    if match:
+        return '5xx' if match.group(1) and match.group(1) != '429' else '429'
+    return None
+
+
+@dataclass
+class Sample:
+    """Timing of one request holding a slot"""
+    started: float = field(default_factory=time.monotonic)
+    queue_time: Optional[float] = None   # Set on the first in-progress status update
+    error: Optional[BaseException] = None  # Failures handled inside the slot
+
+    def mark_running(self):
+        """The provider started working on the request (ends its queue time)."""
+        if self.queue_time is None:
+            self.queue_time = time.monotonic() - self.started
+
+    def on_queue_update(self, status):
+        """fal_client on_queue_update callback"""
+        if type(status).__name__ in ('InProgress', 'Completed'):
+            self.mark_running()
+
+
+class AIMDController:
+    """
+    Concurrency limit that grows additively while requests stay healthy and
+    shrinks multiplicatively on 429s, 5xx errors, timeouts or rising queue time.
+
+    Thread-safe; asyncio callers use acquire_async()/async_slot() from one loop.
+    """
+
+    def __init__(
+        self,
+        initial: int = 4,
+        min_limit: int = 1,
+        max_limit: int = 32,
+        decrease: float = 0.5,
+        latency_tolerance: float = 2.0,
+        smoothing: float = 0.2,
+        baseline_drift: float = 0.01,
+        noise_floor: float = 0.5,
+        on_change: Optional[Callable[[int, int, str], None]] = None
+    ):
+        """
+        Args:
+            initial: Starting limit
+            min_limit: Never go below this many requests in flight
+            max_limit: Never go above this many (size thread pools to this)
+            decrease: Factor applied to the limit on an overload signal
+            latency_tolerance: Smoothed queue time/latency above this multiple of
+                the baseline counts as overload
+            smoothing: EWMA weight of each new sample
+            baseline_drift: Fraction per sample by which the baseline may rise
+                towards the current value, so a provider that got permanently
+                slower is not mistaken for overload forever
+            noise_floor: Baselines below this many seconds are treated as this
+                (queue times near zero are noise, not a trend)
+            on_change: Called with (old limit, new limit, reason) on every change
+        """
+        if not 1 <= min_limit <= max_limit:
+            raise ValueError("need 1 <= min_limit <= max_limit")
+
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease = decrease
+        self.latency_tolerance = latency_tolerance
+        self.smoothing = smoothing
+        self.baseline_drift = baseline_drift
+        self.noise_floor = noise_floor
+        self.on_change = on_change
+
+        self._limit = float(min(max(initial, min_limit), max_limit))
+        self._in_flight = 0
+        self._ewma: Optional[float] = None
+        self._baseline: Optional[float] = None
+        self._last_cut = float('-inf')
+        self._condition = threading.Condition()
+
+        self._start = time.monotonic()
+        self.history: List[Tuple[float, int, str]] = [(0.0, self.limit, "initial")]
+        self.completed = 0
+        self.cuts: Dict[str, int] = {}
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def _try_acquire(self) -> bool:
+        with self._condition:
+            if self._in_flight < self.limit:
+                self._in_flight += 1
+                return True
+            return False
+
+    def acquire(self):
+        """Block until a slot is free under the current limit."""
+        with self._condition:
+            while self._in_flight >= self.limit:
+                self._condition.wait()
+            self._in_flight += 1
+
+    async def acquire_async(self):
+        """Wait (without blocking the event loop) until a slot is free."""
+        while not self._try_acquire():
+            await asyncio.sleep(ASYNC_POLL_INTERVAL)
+
+    def _set_limit(self, value: float, reason: str):
+        old = self.limit
+        self._limit = min(max(value, self.min_limit), self.max_limit)
+        if self.limit != old:
+            self.history.append((time.monotonic() - self._start, self.limit, reason))
+            if self.on_change:
+                self.on_change(old, self.limit, reason)
+
+    def release(self, latency: float, error: Optional[BaseException] = None,
+                queue_time: Optional[float] = None):
+        """
+        Free a slot and feed the outcome of its request into the limit.
+
+        Args:
+            latency: Seconds the request held the slot
+            error: The request's exception, if it failed
+            queue_time: Seconds it waited in the provider queue, if known
+        """
+        with self._condition:
+            window_full = self._in_flight >= self.limit
+            self._in_flight -= 1
+            now = time.monotonic()
+            # Requests started before the last cut ran under the old limit
+            fresh = now - latency >= self._last_cut
+            signal = congestion_signal(error) if fresh else None
+
+            if error is None:
+                self.completed += 1
+            if error is None and fresh:
+                value = queue_time if queue_time is not None else latency
+                self._ewma = value if self._ewma is None else \
+                    self._ewma + self.smoothing * (value - self._ewma)
+                if self._baseline is None:
+                    self._baseline = self._ewma
+                else:
+                    self._baseline = min(self._ewma, self._baseline * (1 + self.baseline_drift))
+                if self._ewma > self.latency_tolerance * max(self._baseline, self.noise_floor):
+                    signal = 'latency'
+
+            if signal is not None:
+                self._last_cut = now
+                self.cuts[signal] = self.cuts.get(signal, 0) + 1
+                self._set_limit(self._limit * self.decrease, signal)
+                self._ewma = self._baseline  # Judge the new limit on its own samples
+            elif error is None and window_full:
+                # +1 per full window of healthy completions
+                self._set_limit(self._limit + 1.0 / max(self._limit, 1.0), "healthy")
+
+            self._condition.notify_all()
+
+    @contextmanager
+    def slot(self) -> Iterator[Sample]:
+        """Hold one slot for a blocking request; exceptions are recorded and re-raised."""
+        self.acquire()
+        sample = Sample()
+        try:
+            yield sample
+        except BaseException as e:
+            sample.error = e
+            raise
+        finally:
+            self.release(time.monotonic() - sample.started, sample.error, sample.queue_time)
+
+    @asynccontextmanager
+    async def async_slot(self) -> AsyncIterator[Sample]:
+        """asyncio version of slot()"""
+        await self.acquire_async()
+        sample = Sample()
+        try:
+            yield sample
+        except BaseException as e:
+            sample.error = e
+            raise
+        finally:
+            self.release(time.monotonic() - sample.started, sample.error, sample.queue_time)
+
+    def mean_limit(self) -> float:
+        """Time-weighted mean limit since the controller was created."""
+        now = time.monotonic() - self._start
+        points = self.history + [(now, self.limit, "now")]
+        elapsed = points[-1][0] - points[0][0]
+        if elapsed <= 0:
+            return float(self.limit)
+        return sum((t1 - t0) * limit for (t0, limit, _), (t1, _, _) in zip(points, points[1:])) / elapsed
+
+    def summary(self) -> str:
+        limits = [limit for _, limit, _ in self.history]
+        cuts = ", ".join(f"{count}x {reason}" for reason, count in sorted(self.cuts.items()))
+        return (f"{limits[0]} → {self.limit} (range {min(limits)}-{max(limits)}, "
+                f"mean {self.mean_limit():.1f}); cuts: {cuts or 'none'}")
@@ -1,12 +1,19 @@
 #!/usr/bin/env python3
 """
 Create Low-Quality Image Placeholders (LQIP) for progressive loading
+
+Standalone pass over existing drawables. optimize_for_android.py --lqip and
+advanced_optimize.py build the same placeholders from the pixels they have
+already decoded, without this extra pass.
+
+placeholder_index.py replaces these files with BlurHash strings compiled into
+the app (no resource, zip entry or decode per placeholder).
 """
 
-import os
-import subprocess
 from pathlib import Path
 
+from decode_pipeline import DECODE_STATS, decode_source, render_lqip
+
 BASE_RES_PATH = Path("/Users/jonathanmallinger/Workspace/SpiritAtlas/app/src/main/res")
 
 
@@ -42,31 +49,20 @@ def create_lqip_set():
         lqip_path = lqip_dir / webp_file.name
         original_size = webp_file.stat().st_size
 
-        # Create tiny 32x32 preview at low quality
-        cmd = [
-            'cwebp',
-            '-resize', '32', '32',  # Tiny placeholder
-            '-q', '40',  # Low quality
-            '-m', '0',  # Fast method
-            str(webp_file),
-            '-o', str(lqip_path)
-        ]
-
         try:
-            result = subprocess.run(cmd, capture_output=True, timeout=10)
+            # Create tiny 32x32 preview at low quality (in-process, one decode)
+            source = decode_source(webp_file)
+            lqip_path.write_bytes(render_lqip(source.image, quality=40, timeout=10))
 
-            if result.returncode == 0:
-                lqip_size = lqip_path.stat().st_size
-                total_original += original_size
-                total_lqip += lqip_size
-                created += 1
+            lqip_size = lqip_path.stat().st_size
+            total_original += original_size
+            total_lqip += lqip_size
+            created += 1
 
-                compression = (1 - lqip_size/original_size) * 100
-                print(f"  ✓ {webp_file.name:50s} | "
-                      f"{original_size/1024:6.1f}KB → {lqip_size/1024:5.1f}KB | "
-                      f"{compression:5.1f}% smaller")
-            else:
-                print(f"  ✗ {webp_file.name:50s} | Error: {result.stderr[:50]}")
+            compression = (1 - lqip_size/original_size) * 100
+            print(f"  ✓ {webp_file.name:50s} | "
+                  f"{original_size/1024:6.1f}KB → {lqip_size/1024:5.1f}KB | "
+                  f"{compression:5.1f}% smaller")
 
         except Exception as e:
             print(f"  ✗ {webp_file.name:50s} | Exception: {e}")
@@ -82,6 +78,7 @@ def create_lqip_set():
         compression = (1 - total_lqip/total_original) * 100
         print(f"Compression: {compression:.1f}%")
         print(f"Average LQIP size: {total_lqip/created/1024:.2f} KB" if created > 0 else "")
+    print(f"Decode work: {DECODE_STATS.summary()}")
 
 
 if __name__ == "__main__":
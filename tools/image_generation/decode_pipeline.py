@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Decode-once fan-out for SpiritAtlas image tools
+
+The same source used to be decoded several times: once per density work unit
+in optimize_for_android.py, again for its LQIP (create_lqip.py even re-decoded
+the xhdpi WebP through cwebp), again in advanced_optimize.create_lqip() after
+the re-encode, and once per icon variant in optimize_app_icons.py.
+
+- decode_source() decodes a file once into memory.
+- FanOut hands that one buffer to every registered consumer (density
+  variants, LQIP, round/adaptive icon variants, quality metrics) in order; a
+  failing consumer does not stop the others.
+- render_lqip() builds a placeholder from an in-memory image.
+- DECODE_STATS counts decodes and source bytes read in this process, so tools
+  can report decode work.
+
+Consumers share the decoded image and must not modify it in place (resize(),
+convert(), crop() and copy() all return new images).
+
+Usage:
+    from decode_pipeline import FanOut, render_lqip
+
+    fanout = FanOut()
+    fanout.add('webp', lambda source: encode_webp(source.image, quality=85))
+    fanout.add('lqip', lambda source: render_lqip(source.image))
+    results = fanout.run(path)   # {'webp': bytes, 'lqip': bytes or the exception}
+"""
+
+import threading
+from pathlib import Path
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from PIL import Image
+
+from webp_codec import encode_webp
+
+# 32x32 low-quality placeholders (see create_lqip.py)
+LQIP_SIZE = (32, 32)
+LQIP_QUALITY = 50
+
+
+@dataclass
+class DecodedSource:
+    """A source file decoded once and shared by every consumer"""
+    path: Path
+    image: Image.Image
+    file_size: int
+
+
+@dataclass
+class DecodeStats:
+    """Decode work done in this process"""
+    decodes: int = 0
+    bytes_read: int = 0
+    pixels: int = 0
+
+    def __post_init__(self):
+        self._lock = threading.Lock()
+
+    def record(self, file_size: int, img: Image.Image):
+        with self._lock:
+            self.decodes += 1
+            self.bytes_read += file_size
+            self.pixels += img.size[0] * img.size[1]
+
+    def summary(self) -> str:
+        return (f"{self.decodes} decodes, {self.bytes_read / (1024*1024):.1f} MB read, "
+                f"{self.pixels / 1e6:.1f} MP")
+
+
+DECODE_STATS = DecodeStats()
+
+
+def decode_source(path: Union[str, Path], mode: Optional[str] = None) -> DecodedSource:
+    """
+    Decode an image file fully into memory.
+
+    Args:
+        path: Source image (PNG, WebP, ...)
+        mode: Convert to this mode (default: keep the decoded mode)
+
+    Returns:
+        DecodedSource whose image no longer references the file
+    """
+    path = Path(path)
+    file_size = path.stat().st_size
+    with Image.open(path) as img:
+        img.load()
+        if mode and img.mode != mode:
+            decoded = img.convert(mode)
+        else:
+            decoded = img.copy()
+    DECODE_STATS.record(file_size, decoded)
+    return DecodedSource(path, decoded, file_size)
+
+
+def render_lqip(img: Image.Image, size: Tuple[int, int] = LQIP_SIZE, quality: int = LQIP_QUALITY,
+                timeout: Optional[float] = None) -> bytes:
+    """
+    Low-quality placeholder WebP of an in-memory image.
+
+    Args:
+        img: Decoded source (any size; reduced by integer factors first)
+        size: Placeholder size
+        quality: WebP quality
+        timeout: Encode timeout in seconds
+
+    Returns:
+        Encoded WebP bytes
+    """
+    # reducing_gap shrinks by box-filtered integer steps before the Lanczos pass
+    preview = img.resize(size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+    return encode_webp(preview, quality=quality, method=0, timeout=timeout)  # Fast method
+
+
+class FanOut:
+    """Decode a source once and pass it to each registered consumer in order"""
+
+    def __init__(self, mode: Optional[str] = None):
+        """
+        Args:
+            mode: Mode every consumer receives (default: as decoded)
+        """
+        self.mode = mode
+        self._consumers: List[Tuple[str, Callable[[DecodedSource], Any]]] = []
+
+    def add(self, name: str, consumer: Callable[[DecodedSource], Any]) -> 'FanOut':
+        if any(existing == name for existing, _ in self._consumers):
+            raise ValueError(f"duplicate consumer: {name}")
+        self._consumers.append((name, consumer))
+        return self
+
+    def run(self, source: Union[str, Path, DecodedSource]) -> Dict[str, Any]:
+        """
+        Run every consumer on one decode of `source`.
+
+        Returns:
+            Consumer name -> its result, or the exception it raised
+        """
+        if not isinstance(source, DecodedSource):
+            source = decode_source(source, self.mode)
+
+        results: Dict[str, Any] = {}
+        for name, consumer in self._consumers:
+            try:
+                results[name] = consumer(source)
+            except Exception as e:
+                results[name] = e
+        return results
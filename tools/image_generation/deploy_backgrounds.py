@@ -8,6 +8,8 @@ import os
 import subprocess
 from pathlib import Path
 
+from image_probe import probe
+
 # Source directory
 SOURCE_DIR = Path(__file__).parent / "generated_images/optimized_flux_pro"
 DEST_BASE = Path(__file__).parent.parent.parent / "app/src/main/res"
@@ -33,17 +35,8 @@ DENSITIES = {
 }
 
 def get_image_dimensions(image_path: Path) -> tuple[int, int]:
-    """Get image dimensions using sips."""
-    result = subprocess.run(
-        ["sips", "-g", "pixelWidth", "-g", "pixelHeight", str(image_path)],
-        capture_output=True,
-        text=True,
-        check=True
-    )
-    lines = result.stdout.strip().split('\n')
-    width = int([l for l in lines if 'pixelWidth' in l][0].split(':')[1].strip())
-    height = int([l for l in lines if 'pixelHeight' in l][0].split(':')[1].strip())
-    return width, height
+    """Get image dimensions from the file header (no decode, no subprocess)."""
+    return probe(image_path).size
 
 def optimize_and_deploy(source_file: Path, dest_name: str):
     """Optimize and deploy a background image to all densities."""
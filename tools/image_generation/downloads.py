@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Pooled, streaming image downloads for SpiritAtlas generators
+
+All generator scripts fetch multi-MB PNGs from the provider CDN. This module
+keeps one keep-alive HTTP session (so TLS handshakes are paid once per host,
+not once per image) and streams each response to a temp file in chunks before
+atomically renaming it into place, so a crash never leaves a truncated PNG at
+the final path and RSS stays flat regardless of image size.
+
+Usage:
+    from downloads import download_file, DownloadPool
+
+    download_file(url, Path("out/image.png"))
+
+    with DownloadPool(max_workers=8) as pool:
+        future = pool.submit(url, Path("out/image.png"))
+        size_bytes = future.result()
+"""
+
+import os
+import tempfile
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+except ImportError:
+    raise ImportError("requests not installed. Run: pip3 install requests")
+
+from retry_policy import RetryPolicy, NO_RETRY
+
+
+# Connection pool sizing: one pool per CDN host, enough sockets for a wide batch
+POOL_CONNECTIONS = 8
+POOL_MAXSIZE = 32
+CHUNK_SIZE = 256 * 1024
+DEFAULT_TIMEOUT = 60
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """Return the process-wide keep-alive session, creating it on first use."""
+    global _session
+
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+
+def download_file(
+    url: str,
+    output_path: Path,
+    session: Optional[requests.Session] = None,
+    timeout: float = DEFAULT_TIMEOUT,
+    chunk_size: int = CHUNK_SIZE
+) -> int:
+    """
+    Stream a URL to disk through a temp file and an atomic rename.
+
+    Args:
+        url: Source URL
+        output_path: Final file path (parent directories are created)
+        session: Session to use (default: shared pooled session)
+        timeout: Connect/read timeout in seconds
+        chunk_size: Bytes per streamed chunk
+
+    Returns:
+        Number of bytes written
+
+    Raises:
+        requests.RequestException: On HTTP or connection errors (no file is left behind)
+    """
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    session = session or get_session()
+
+    fd, temp_name = tempfile.mkstemp(
+        dir=output_path.parent, prefix=f".{output_path.name}.", suffix=".part"
+    )
+    written = 0
+
+    try:
+        # mkstemp creates 0600; give the final image normal file permissions
+        os.chmod(temp_name, 0o644)
+        with os.fdopen(fd, "wb") as f:
+            with session.get(url, stream=True, timeout=timeout) as response:
+                response.raise_for_status()
+                for chunk in response.iter_content(chunk_size=chunk_size):
+                    if chunk:
+                        f.write(chunk)
+                        written += len(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+
+        os.replace(temp_name, output_path)
+        return written
+
+    except BaseException:
+        if os.path.exists(temp_name):
+            os.unlink(temp_name)
+        raise
+
+
+class DownloadPool:
+    """
+    Thread pool for running downloads alongside generation.
+
+    Submitting returns a Future immediately, so a generator can hand off the
+    download of a finished image and go straight back to requesting the next one.
+    With a retry policy, transient failures are retried inside the worker (each
+    attempt writes a fresh temp file, so retries never leave partial images).
+    """
+
+    def __init__(self, max_workers: int = 8, timeout: float = DEFAULT_TIMEOUT,
+                 retry: Optional[RetryPolicy] = None):
+        self.timeout = timeout
+        self.retry = retry or NO_RETRY
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix="download")
+
+    def submit(self, url: str, output_path: Path):
+        """Queue a download; the future resolves to the number of bytes written."""
+        output_path = Path(output_path)
+        return self._executor.submit(
+            self.retry.call, lambda: download_file(url, output_path, None, self.timeout),
+            f"download {output_path.name}"
+        )
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+
+    def __enter__(self) -> "DownloadPool":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.shutdown(wait=True)
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Encoder-parameter auto-tuner for SpiritAtlas drawables
+
+aggressive_optimize.py used hard-coded thresholds (min_size_kb, the 8%
+reduction rule) and redid its trial encodes on every run. This tuner tries a
+grid of encoder settings per asset instead - quality, method, preprocessing,
+sharp YUV, near-lossless and alpha quality - scores every trial with SSIM
+against the backed-up original, and keeps the Pareto front of (bytes,
+quality). The smallest front setting at or above the quality floor is
+written to encoder_decisions.json together with a fingerprint of the
+original, so later aggressive_optimize.py runs apply it directly in one
+encode (and skip files that already match it).
+
+Assets are tuned largest first on a worker pool; assets whose original is
+unchanged since the last tuning are skipped unless --retune is given.
+
+Usage:
+    python encoder_tuner.py [--floor 0.985] [--quick] [--jobs N] [--skip-xxxhdpi] [--retune]
+"""
+
+import os
+import json
+import hashlib
+import argparse
+import itertools
+from pathlib import Path
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from PIL import Image
+
+from advanced_optimize import BASE_RES_PATH, DENSITIES, ENCODE_TIMEOUT, backup_original
+from generation_cache import file_sha256
+from quality_search import DEFAULT_TARGET_SSIM, encoded_ssim
+from webp_codec import encode_webp, map_largest_first
+
+DECISIONS_VERSION = 1
+DECISIONS_FILE = Path(__file__).parent / "encoder_decisions.json"
+
+
+@dataclass(frozen=True)
+class EncoderSetting:
+    """One point of the tuning grid (the cwebp flag each field maps to)"""
+    quality: int = 90                    # -q
+    method: int = 6                      # -m
+    preprocessing: Optional[int] = None  # -pre
+    sharp_yuv: bool = False              # -sharp_yuv
+    near_lossless: Optional[int] = None  # -near_lossless (implies lossless)
+    alpha_quality: Optional[int] = None  # -alpha_q
+
+    def options(self) -> Dict[str, Any]:
+        """encode_webp() keyword arguments"""
+        return dict(asdict(self), autofilter=True)
+
+    def label(self) -> str:
+        if self.near_lossless is not None:
+            parts = [f"near_lossless={self.near_lossless}"]
+        else:
+            parts = [f"q={self.quality}"]
+            if self.preprocessing:
+                parts.append(f"pre={self.preprocessing}")
+            if self.sharp_yuv:
+                parts.append("sharp_yuv")
+        parts.append(f"m={self.method}")
+        if self.alpha_quality is not None:
+            parts.append(f"alpha_q={self.alpha_quality}")
+        return " ".join(parts)
+
+
+@dataclass
+class Trial:
+    """Result of encoding one asset with one setting"""
+    setting: EncoderSetting
+    size: int
+    score: float
+    sha256: str  # Of the encoded bytes, which are not kept
+
+
+def settings_grid(has_alpha: bool, quick: bool = False) -> List[EncoderSetting]:
+    """
+    Grid of settings to try for one asset.
+
+    Args:
+        has_alpha: Include alpha_q variants
+        quick: Smaller grid (method 4 only, fewer qualities)
+    """
+    qualities = [75, 85, 92] if quick else [70, 78, 85, 90, 94]
+    methods = [4] if quick else [4, 6]
+    preprocessing = [None, 4]
+    sharp_yuv = [False, True]
+    alpha_qualities = [None, 80] if has_alpha else [None]
+
+    grid = [
+        EncoderSetting(quality=q, method=m, preprocessing=pre, sharp_yuv=sharp, alpha_quality=aq)
+        for q, m, pre, sharp, aq in itertools.product(qualities, methods, preprocessing,
+                                                       sharp_yuv, alpha_qualities)
+    ]
+    grid += [
+        EncoderSetting(near_lossless=level, method=m)
+        for level, m in itertools.product([40, 60, 80], methods)
+    ]
+    return grid
+
+
+def pareto_front(trials: List[Trial]) -> List[Trial]:
+    """Trials no other trial beats on both size and score, by increasing size"""
+    front: List[Trial] = []
+    for trial in sorted(trials, key=lambda t: (t.size, -t.score)):
+        if not front or trial.score > front[-1].score:
+            front.append(trial)
+    return front
+
+
+def _data_sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def decision_key(webp_file: Path) -> str:
+    """Decisions are keyed by res-relative path, e.g. drawable-xhdpi/img_012.webp"""
+    return str(Path(webp_file).relative_to(BASE_RES_PATH))
+
+
+def tune_asset(webp_file: Path, floor: float = DEFAULT_TARGET_SSIM,
+               quick: bool = False) -> Dict[str, Any]:
+    """
+    Encode one asset with every grid setting and pick the winner.
+
+    Args:
+        webp_file: Drawable to tune
+        floor: Minimum SSIM against the original
+        quick: Use the smaller grid
+
+    Returns:
+        Decision record (setting None = keep the current file)
+    """
+    # Back up first so the reference survives the tuned encode replacing the file
+    source = backup_original(webp_file)
+    with Image.open(source) as img:
+        img = img.convert('RGBA' if 'A' in img.getbands() else 'RGB')
+
+    trials = []
+    for setting in settings_grid(img.mode == 'RGBA', quick):
+        data = encode_webp(img, timeout=ENCODE_TIMEOUT, **setting.options())
+        trials.append(Trial(setting, len(data), encoded_ssim(img, data), _data_sha256(data)))
+
+    front = pareto_front(trials)
+    current_size = webp_file.stat().st_size
+    winner = next((t for t in front if t.score >= floor), None)
+    if winner is not None and winner.size >= current_size:
+        winner = None  # The current file is already smaller
+
+    return {
+        'source': str(source),
+        'source_sha256': file_sha256(source),
+        'floor': floor,
+        'setting': asdict(winner.setting) if winner else None,
+        'label': winner.setting.label() if winner else "keep current",
+        'size': winner.size if winner else current_size,
+        'ssim': round(winner.score, 5) if winner else None,
+        'output_sha256': winner.sha256 if winner else None,
+        'baseline_size': current_size,
+        'trials': len(trials),
+        'front': [[t.setting.label(), t.size, round(t.score, 5)] for t in front],
+    }
+
+
+class DecisionStore:
+    """encoder_decisions.json: winning setting per drawable"""
+
+    def __init__(self, path: Path = DECISIONS_FILE):
+        self.path = Path(path)
+        self.decisions: Dict[str, Dict[str, Any]] = {}
+        if self.path.exists():
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            if data.get('version') == DECISIONS_VERSION:
+                self.decisions = data.get('decisions', {})
+
+    def get(self, webp_file: Path) -> Optional[Dict[str, Any]]:
+        """Decision for a drawable, if its original has not changed since tuning"""
+        decision = self.decisions.get(decision_key(webp_file))
+        if not decision:
+            return None
+        source = Path(decision['source'])
+        if not source.exists() or file_sha256(source) != decision['source_sha256']:
+            return None
+        return decision
+
+    def put(self, webp_file: Path, decision: Dict[str, Any]):
+        self.decisions[decision_key(webp_file)] = decision
+
+    def __len__(self) -> int:
+        return len(self.decisions)
+
+    def save(self):
+        temp_file = self.path.with_suffix('.json.tmp')
+        with open(temp_file, 'w') as f:
+            json.dump({'version': DECISIONS_VERSION, 'decisions': self.decisions}, f,
+                      indent=2, sort_keys=True)
+        os.replace(temp_file, self.path)
+
+
+def apply_decision(webp_file: Path, decision: Dict[str, Any]) -> Optional[Tuple[int, int]]:
+    """
+    Encode a drawable with its tuned setting (one encode, no search).
+
+    Returns:
+        (size before, size after), or None if there was nothing to do
+        (keep-current decision, or the file already is the tuned encode)
+    """
+    if decision['setting'] is None:
+        return None
+    if file_sha256(webp_file) == decision['output_sha256']:
+        return None
+
+    with Image.open(decision['source']) as img:
+        img = img.convert('RGBA' if 'A' in img.getbands() else 'RGB')
+    data = encode_webp(img, timeout=ENCODE_TIMEOUT, **EncoderSetting(**decision['setting']).options())
+
+    original_size = webp_file.stat().st_size
+    temp_output = webp_file.with_suffix('.webp.tmp')
+    temp_output.write_bytes(data)
+    os.replace(temp_output, webp_file)
+    return original_size, len(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tune WebP encoder settings per drawable')
+    parser.add_argument('--floor', type=float, default=DEFAULT_TARGET_SSIM,
+                        help=f'Minimum SSIM against the original (default: {DEFAULT_TARGET_SSIM})')
+    parser.add_argument('--decisions', type=Path, default=DECISIONS_FILE,
+                        help=f'Decisions file (default: {DECISIONS_FILE.name})')
+    parser.add_argument('--quick', action='store_true',
+                        help='Smaller grid (method 4, three qualities)')
+    parser.add_argument('--retune', action='store_true',
+                        help='Re-tune assets that already have a current decision')
+    parser.add_argument('--skip-xxxhdpi', action='store_true',
+                        help='Leave xxxhdpi out')
+    parser.add_argument('--jobs', '-j', type=int, default=None,
+                        help='Parallel workers (default: all CPU cores)')
+    args = parser.parse_args()
+
+    print("🎛️  ENCODER AUTO-TUNER")
+    print("=" * 80)
+
+    store = DecisionStore(args.decisions)
+    files = []
+    for density in DENSITIES:
+        if args.skip_xxxhdpi and density == 'xxxhdpi':
+            continue
+        drawable_dir = BASE_RES_PATH / f"drawable-{density}"
+        if drawable_dir.exists():
+            files.extend(sorted(drawable_dir.glob("*.webp")))
+
+    todo = [f for f in files if args.retune or store.get(f) is None]
+    print(f"Assets: {len(files)} ({len(files) - len(todo)} already tuned)")
+    print(f"Quality floor: SSIM >= {args.floor}")
+    if not todo:
+        print("Nothing to tune")
+        return
+
+    baseline_total = 0
+    tuned_total = 0
+    tuned = 0
+    try:
+        for i, (webp_file, result) in enumerate(
+                map_largest_first(lambda f: tune_asset(f, args.floor, args.quick), todo,
+                                  lambda f: f.stat().st_size, max_workers=args.jobs), 1):
+            label = f"{webp_file.parent.name}/{webp_file.name}"
+            if isinstance(result, Exception):
+                print(f"  ✗ [{i}/{len(todo)}] {label}: {result}")
+                continue
+
+            store.put(webp_file, result)
+            baseline_total += result['baseline_size']
+            tuned_total += result['size']
+            if result['setting']:
+                tuned += 1
+            print(f"  ✓ [{i}/{len(todo)}] {label:55s} | {result['label']:38s} | "
+                  f"{result['baseline_size']/1024:6.1f}KB → {result['size']/1024:6.1f}KB | "
+                  f"front {len(result['front'])}/{result['trials']}")
+    finally:
+        store.save()
+
+    print("\n" + "=" * 80)
+    print("📊 TUNING SUMMARY")
+    print("=" * 80)
+    print(f"Tuned: {tuned} assets (others keep their current file)")
+    if baseline_total:
+        print(f"Current: {baseline_total / (1024*1024):.2f} MB")
+        print(f"Tuned:   {tuned_total / (1024*1024):.2f} MB "
+              f"(-{(1 - tuned_total / baseline_total) * 100:.1f}%)")
+    print(f"✓ Decisions written to {args.decisions}")
+    print("  Apply with: python aggressive_optimize.py")
+
+
+if __name__ == "__main__":
+    main()
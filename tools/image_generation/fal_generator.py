@@ -11,10 +11,14 @@ API Provider: fal.ai
 
 import os
 import sys
+import json
+import time
+import asyncio
 import argparse
-import requests
+import contextlib
 from pathlib import Path
-from typing import Optional, Dict, Any, List
+from dataclasses import dataclass, field
+from typing import Optional, Dict, Any, List, Iterable, AsyncIterator, Callable, Tuple
 from datetime import datetime
 
 try:
@@ -23,6 +27,170 @@ except ImportError:
     print("Error: fal_client package not installed. Run: pip install fal-client")
     sys.exit(1)
 
+from downloads import DownloadPool
+from concurrency_control import AIMDController, Sample
+from retry_policy import RetryPolicy, CircuitBreaker, is_retryable
+from generation_cache import GenerationCache
+from manifest_journal import ManifestJournal
+from request_store import RequestStore, SUBMITTED, COMPLETED, DOWNLOADED, FAILED
+
+
+class TokenBucket:
+    """
+    Asyncio token-bucket rate limiter with adaptive backoff.
+
+    Tokens refill continuously at `rate` per second up to `capacity`; each
+    request consumes one token and waits when the bucket is empty. This keeps
+    bursts bounded while still letting a large batch run at the sustained rate.
+    backoff() halves the refill rate after a failure and recover() creeps it
+    back up after successes, replacing fixed sleeps between requests.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None, min_rate: float = 0.1):
+        """
+        Args:
+            rate: Tokens added per second (requests per second)
+            capacity: Maximum burst size (default: max(1, rate))
+            min_rate: Floor for the refill rate under backoff
+        """
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+
+        self.base_rate = rate
+        self.rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        """Wait until a token is available and consume it."""
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def backoff(self):
+        """Halve the refill rate and drain the burst after a failed request."""
+        self._refill()
+        self.rate = max(self.min_rate, self.rate / 2)
+        self._tokens = min(self._tokens, 0.0)
+
+    def recover(self):
+        """Step the refill rate back towards the configured rate after a success."""
+        self.rate = min(self.base_rate, self.rate * 1.25)
+
+
+@dataclass
+class GenerationOutcome:
+    """Result of one job submitted through FalImageGenerator.generate_many_async()."""
+    job_id: str
+    job: Dict[str, Any]
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[BaseException] = None
+    elapsed: float = 0.0
+    files: List[str] = field(default_factory=list)
+    request_id: Optional[str] = None     # fal queue request (queue mode only)
+    resumed: bool = False                # Reattached to a request from an earlier run
+
+    @property
+    def success(self) -> bool:
+        return self.error is None and self.result is not None
+
+
+@dataclass
+class VariantRequest:
+    """
+    Several variants of one prompt, one output filename per variant.
+
+    Requests with the same prompt, model and parameters are packed into shared
+    calls. With a seed, the variants form a reproducible series: call k of the
+    series uses seed + k, and each image is identified by (seed, image_index).
+    Seeded requests only share calls with requests for the same seed.
+    """
+    prompt: str
+    names: List[str]
+    seed: Optional[int] = None
+    params: Dict[str, Any] = field(default_factory=dict)  # generate() keyword arguments
+    model: Optional[str] = None                            # Default: the batch model
+
+    @classmethod
+    def numbered(cls, prompt: str, stem: str, count: int, ext: str = "png",
+                 **kwargs: Any) -> "VariantRequest":
+        """`count` variants named <stem>_v01.<ext>, <stem>_v02.<ext>, ..."""
+        return cls(prompt, [f"{stem}_v{i:02d}.{ext}" for i in range(1, count + 1)], **kwargs)
+
+
+@dataclass
+class VariantResult:
+    """One variant image split out of a multi-image call."""
+    request: VariantRequest
+    name: str
+    path: Optional[Path] = None
+    seed: Optional[int] = None
+    image_index: int = 0
+    request_id: Optional[str] = None
+    file_size: int = 0
+    elapsed: float = 0.0
+    error: Optional[str] = None
+
+    @property
+    def success(self) -> bool:
+        return self.error is None
+
+    def manifest_entry(self, model: str) -> Dict[str, Any]:
+        return {
+            "filename": self.name,
+            "filepath": str(self.path),
+            "prompt": self.request.prompt,
+            "model": self.request.model or model,
+            "seed": self.seed,
+            "image_index": self.image_index,
+            "request_id": self.request_id,
+            "file_size": self.file_size,
+            "generated_at": datetime.now().isoformat(),
+        }
+
+
+def pack_variants(
+    requests: Iterable[VariantRequest],
+    max_per_call: int = 4
+) -> List[Tuple[Dict[str, Any], List[Tuple[VariantRequest, str]]]]:
+    """
+    Pack variant requests into as few generation calls as possible.
+
+    Returns:
+        (job, slots) per call: a generate_many_async() job with num_images set,
+        and the (request, output name) each returned image belongs to, in order
+    """
+    groups: Dict[Tuple, List[Tuple[VariantRequest, str]]] = {}
+    for request in requests:
+        key = (request.model, request.prompt, json.dumps(request.params, sort_keys=True),
+               request.seed)
+        groups.setdefault(key, []).extend((request, name) for name in request.names)
+
+    calls = []
+    for (model, prompt, _, seed), slots in groups.items():
+        params = slots[0][0].params
+        for k, start in enumerate(range(0, len(slots), max_per_call)):
+            chunk = slots[start:start + max_per_call]
+            job = dict(params, prompt=prompt, num_images=len(chunk), id=f"variants-{len(calls)}")
+            if seed is not None:
+                job["seed"] = seed + k
+            if model:
+                job["model"] = model
+            calls.append((job, chunk))
+    return calls
+
 
 class FalImageGenerator:
     """
@@ -34,8 +202,18 @@ class FalImageGenerator:
     - Customizable image sizes and parameters
     - Automatic file downloads and management
     - Progress tracking and error handling
+    - Concurrent batch generation with rate limiting (generate_many_async)
+    - Optional adaptive (AIMD) concurrency instead of a fixed limit
+    - Retries with jittered backoff, and a circuit breaker that pauses batches
+      while the provider is failing
+    - Variant generation packed up to four images per call (generate_variants)
+    - Pooled, streaming downloads that overlap with generation
+    - Queue mode: persisted request IDs so interrupted batches resume without re-paying
     """
 
+    # Images per call accepted by the Flux endpoints (num_images)
+    MAX_IMAGES_PER_CALL = 4
+
     # Available Flux models
     MODEL_FLUX_PRO = "fal-ai/flux-pro/v1.1"     # Commercial license, 6x faster (RECOMMENDED)
     MODEL_FLUX_DEV = "fal-ai/flux/dev"          # Non-commercial only
@@ -51,18 +229,21 @@ class FalImageGenerator:
         "landscape_16_9": "landscape_16_9",   # 1280x720
     }
 
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, retry: Optional[RetryPolicy] = None):
         """
         Initialize the generator with API key.
 
         Args:
             api_key: Your fal.ai API key
+            retry: Retry policy for requests and downloads (default: 3 retries
+                with a circuit breaker shared by every request of this generator)
         """
         if not api_key:
             raise ValueError("API key is required")
 
         os.environ["FAL_KEY"] = api_key
         self.api_key = api_key
+        self.retry = retry if retry is not None else RetryPolicy(breaker=CircuitBreaker())
 
     def generate(
         self,
@@ -99,7 +280,60 @@ class FalImageGenerator:
         Returns:
             Dict containing image URLs, metadata, and generation info
         """
-        # Build input parameters
+        input_params = self._build_arguments(
+            prompt=prompt,
+            image_size=image_size,
+            width=width,
+            height=height,
+            num_images=num_images,
+            num_inference_steps=num_inference_steps,
+            guidance_scale=guidance_scale,
+            seed=seed,
+            output_format=output_format,
+            enable_safety_checker=enable_safety_checker,
+        )
+
+        print(f"\n{'='*70}")
+        print(f"Generating with {model}")
+        print(f"{'='*70}")
+        print(f"Prompt: {prompt}")
+        print(f"Size: {input_params['image_size']}")
+        print(f"Images: {num_images}")
+        print(f"Steps: {num_inference_steps}")
+        print(f"Guidance: {guidance_scale}")
+        if seed:
+            print(f"Seed: {seed}")
+        print(f"{'='*70}\n")
+
+        try:
+            # Subscribe to the model endpoint (transient failures are retried)
+            result = self.retry.call(
+                lambda: fal_client.subscribe(model, arguments=input_params),
+                "generation"
+            )
+
+            print("\n✓ Generation completed successfully!")
+            return result
+
+        except Exception as e:
+            print(f"\n✗ Error during generation: {str(e)}")
+            raise
+
+    @staticmethod
+    def _build_arguments(
+        prompt: str,
+        image_size: str = "landscape_4_3",
+        width: Optional[int] = None,
+        height: Optional[int] = None,
+        num_images: int = 1,
+        num_inference_steps: int = 28,
+        guidance_scale: float = 3.5,
+        seed: Optional[int] = None,
+        output_format: str = "png",
+        enable_safety_checker: bool = True,
+        **extra: Any
+    ) -> Dict[str, Any]:
+        """Build the fal.ai argument payload shared by generate() and generate_many_async()."""
         input_params = {
             "prompt": prompt,
             "num_images": num_images,
@@ -119,45 +353,389 @@ class FalImageGenerator:
         if seed is not None:
             input_params["seed"] = seed
 
-        print(f"\n{'='*70}")
-        print(f"Generating with {model}")
-        print(f"{'='*70}")
-        print(f"Prompt: {prompt}")
-        print(f"Size: {input_params['image_size']}")
-        print(f"Images: {num_images}")
-        print(f"Steps: {num_inference_steps}")
-        print(f"Guidance: {guidance_scale}")
-        if seed:
-            print(f"Seed: {seed}")
-        print(f"{'='*70}\n")
+        # Model-specific extras (e.g. safety_tolerance for FLUX Pro)
+        input_params.update(extra)
+
+        return input_params
+
+    async def generate_many_async(
+        self,
+        jobs: Iterable[Dict[str, Any]],
+        model: str = MODEL_FLUX_PRO,
+        max_concurrency: int = 8,
+        rate_limit: float = 4.0,
+        burst: Optional[float] = None,
+        timeout: Optional[float] = 300.0,
+        download_dir: Optional[str] = None,
+        request_store: Optional[RequestStore] = None,
+        poll_interval: float = 2.0,
+        concurrency: Optional[AIMDController] = None,
+    ) -> AsyncIterator[GenerationOutcome]:
+        """
+        Generate many images concurrently, yielding outcomes as they finish.
+
+        Each job is a dict of generate() keyword arguments ("prompt" is required).
+        An optional "id" key names the job in the outcome; "model" overrides the
+        batch model for that job. Jobs never raise out of the iterator - failures
+        and timeouts are reported through GenerationOutcome.error.
 
+        Args:
+            jobs: Job dictionaries (see above)
+            model: Default model for jobs that don't set one
+            max_concurrency: Maximum requests in flight at once
+            rate_limit: Sustained request submissions per second (halved on each
+                failure, then recovered gradually on success)
+            burst: Token-bucket capacity (default: rate_limit)
+            timeout: Per-request timeout in seconds (None to disable)
+            download_dir: If set, download each result here (prefixed with the job id)
+                as soon as it finishes, while other requests keep generating
+            request_store: Enables queue mode. Jobs are submitted to the fal queue
+                and their request IDs recorded under the prompt hash before the
+                result is polled, so a restarted run reattaches to requests that
+                are still queued, reuses finished results and only submits jobs
+                it has never paid for. A timed-out request stays recorded and is
+                picked up again by the next run.
+            poll_interval: Seconds between status polls in queue mode
+            concurrency: Adaptive controller that replaces the fixed max_concurrency:
+                it widens the limit while queue time stays low and cuts it on
+                429s, 5xx errors, timeouts or rising queue time
+
+        Yields:
+            GenerationOutcome for each job, in completion order
+        """
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        bucket = TokenBucket(rate_limit, burst)
+
+        @contextlib.asynccontextmanager
+        async def slot() -> AsyncIterator[Sample]:
+            if concurrency is not None:
+                async with concurrency.async_slot() as sample:
+                    yield sample
+            else:
+                async with semaphore:
+                    yield Sample()
+
+        async def run(index: int, job: Dict[str, Any]) -> GenerationOutcome:
+            job_id = str(job.get("id", index))
+            params = {k: v for k, v in job.items() if k not in ("id", "model", "show_logs")}
+            try:
+                arguments = self._build_arguments(**params)
+            except Exception as e:  # Malformed job (e.g. no prompt) fails alone
+                return GenerationOutcome(job_id, job, error=e)
+            job_model = job.get("model", model)
+            if request_store is not None:
+                return await run_queued(job_id, job, job_model, params, arguments)
+
+            async with slot() as sample:
+                async def attempt():
+                    await bucket.acquire()
+                    # The timeout bounds each request; retry backoff is not counted
+                    return await asyncio.wait_for(
+                        fal_client.subscribe_async(job_model, arguments=arguments,
+                                                   on_queue_update=sample.on_queue_update),
+                        timeout=timeout
+                    )
+
+                start_time = time.monotonic()
+                try:
+                    result = await self.retry.call_async(attempt, f"job {job_id}")
+                except asyncio.TimeoutError:
+                    bucket.backoff()
+                    error = TimeoutError(f"Request timed out after {timeout:.0f}s")
+                    sample.error = error
+                    return GenerationOutcome(job_id, job, error=error,
+                                             elapsed=time.monotonic() - start_time)
+                except Exception as e:
+                    bucket.backoff()
+                    sample.error = e
+                    return GenerationOutcome(job_id, job, error=e,
+                                             elapsed=time.monotonic() - start_time)
+                bucket.recover()
+
+            # Download outside the slot so the slot goes to the next request
+            outcome = GenerationOutcome(job_id, job, result=result,
+                                        elapsed=time.monotonic() - start_time)
+            if download_dir:
+                try:
+                    outcome.files = await asyncio.to_thread(
+                        self.download_images, result, download_dir, job_id
+                    )
+                except Exception as e:
+                    outcome.error = e
+            return outcome
+
+        async def poll(job_model: str, request_id: str, sample: Sample) -> Dict[str, Any]:
+            while True:
+                status = await self.retry.call_async(
+                    lambda: fal_client.status_async(job_model, request_id), f"poll {request_id}")
+                sample.on_queue_update(status)
+                if isinstance(status, fal_client.Completed):
+                    return await self.retry.call_async(
+                        lambda: fal_client.result_async(job_model, request_id), f"fetch {request_id}")
+                await asyncio.sleep(poll_interval)
+
+        async def run_queued(job_id: str, job: Dict[str, Any], job_model: str,
+                             params: Dict[str, Any], arguments: Dict[str, Any]) -> GenerationOutcome:
+            outcome = GenerationOutcome(job_id, job)
+            try:
+                key = GenerationCache.make_key(
+                    params["prompt"], job_model, **{k: v for k, v in params.items() if k != "prompt"}
+                )
+            except Exception as e:  # e.g. a non-string prompt
+                outcome.error = e
+                return outcome
+            record = request_store.get(key)
+            start_time = time.monotonic()
+
+            if record and record["state"] == DOWNLOADED and record.get("files") and \
+                    all(os.path.exists(f) for f in record["files"]):
+                outcome.result, outcome.files = record["result"], record["files"]
+                outcome.request_id, outcome.resumed = record["request_id"], True
+                return outcome
+
+            if record and record["state"] in (COMPLETED, DOWNLOADED):
+                # Paid for by an earlier run - only the download is missing
+                outcome.result = record["result"]
+                outcome.request_id, outcome.resumed = record["request_id"], True
+            else:
+                request_id = None
+                if record and record["state"] == SUBMITTED and record.get("model") == job_model:
+                    request_id = record["request_id"]
+                    outcome.resumed = True
+                    try:
+                        await self.retry.call_async(
+                            lambda: fal_client.status_async(job_model, request_id),
+                            f"reattach {request_id}")
+                    except Exception as e:
+                        if not (isinstance(e, fal_client.FalClientHTTPError)
+                                and e.status_code in (404, 410)):
+                            # Offline or provider down: keep it submitted for the next run
+                            outcome.error = e
+                            return outcome
+                        # The queue no longer knows the request - submit it again
+                        request_id, outcome.resumed = None, False
+
+                async with slot() as sample:
+                    if request_id is None:
+                        async def submit():
+                            await bucket.acquire()
+                            return await fal_client.submit_async(job_model, arguments=arguments)
+
+                        try:
+                            # Only retried when submit raised, i.e. no request ID came back
+                            handle = await self.retry.call_async(submit, f"job {job_id}")
+                        except Exception as e:
+                            bucket.backoff()
+                            sample.error = e
+                            outcome.error, outcome.elapsed = e, time.monotonic() - start_time
+                            return outcome
+                        request_id = handle.request_id
+                        request_store.record(key, SUBMITTED, request_id=request_id,
+                                             model=job_model, job_id=job_id)
+                    outcome.request_id = request_id
+
+                    try:
+                        outcome.result = await asyncio.wait_for(
+                            poll(job_model, request_id, sample), timeout=timeout)
+                    except asyncio.TimeoutError:
+                        # Left as submitted: the next run reattaches instead of paying again
+                        bucket.backoff()
+                        outcome.error = TimeoutError(
+                            f"Request {request_id} still running after {timeout:.0f}s "
+                            f"(re-run to reattach)")
+                        sample.error = outcome.error
+                        outcome.elapsed = time.monotonic() - start_time
+                        return outcome
+                    except Exception as e:
+                        bucket.backoff()
+                        if not is_retryable(e):
+                            # The request itself failed; a transient polling error
+                            # leaves it submitted so the next run reattaches
+                            request_store.record(key, FAILED, error=str(e))
+                        sample.error = e
+                        outcome.error, outcome.elapsed = e, time.monotonic() - start_time
+                        return outcome
+                    bucket.recover()
+                request_store.record(key, COMPLETED, result=outcome.result)
+
+            outcome.elapsed = time.monotonic() - start_time
+            if download_dir:
+                try:
+                    outcome.files = await asyncio.to_thread(
+                        self.download_images, outcome.result, download_dir, job_id
+                    )
+                    if len(outcome.files) == len(outcome.result.get("images", [])):
+                        request_store.record(key, DOWNLOADED, files=outcome.files)
+                except Exception as e:
+                    outcome.error = e
+            return outcome
+
+        tasks = [asyncio.ensure_future(run(i, job)) for i, job in enumerate(jobs)]
         try:
-            # Subscribe to the model endpoint
-            result = fal_client.subscribe(
-                model,
-                arguments=input_params
-            )
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
 
-            print("\n✓ Generation completed successfully!")
-            return result
+    def generate_many(
+        self,
+        jobs: Iterable[Dict[str, Any]],
+        on_result: Optional[Callable[[GenerationOutcome], None]] = None,
+        **kwargs: Any
+    ) -> List[GenerationOutcome]:
+        """
+        Blocking wrapper around generate_many_async() for synchronous scripts.
 
-        except Exception as e:
-            print(f"\n✗ Error during generation: {str(e)}")
-            raise
+        Args:
+            jobs: Job dictionaries (see generate_many_async)
+            on_result: Called with each outcome as soon as it completes
+            **kwargs: Passed through to generate_many_async (model, max_concurrency, ...)
+
+        Returns:
+            List of outcomes in completion order
+        """
+        jobs = list(jobs)
+
+        async def collect() -> List[GenerationOutcome]:
+            outcomes = []
+            async for outcome in self.generate_many_async(jobs, **kwargs):
+                outcomes.append(outcome)
+                if on_result:
+                    on_result(outcome)
+                else:
+                    status = f"✓ ({outcome.elapsed:.1f}s)" if outcome.success else f"✗ {outcome.error}"
+                    print(f"[{len(outcomes):3d}/{len(jobs)}] {outcome.job_id:40s} {status}")
+            return outcomes
+
+        return asyncio.run(collect())
+
+    async def generate_variants_async(
+        self,
+        requests: Iterable[VariantRequest],
+        output_dir: Path,
+        model: str = MODEL_FLUX_PRO,
+        manifest: Optional[ManifestJournal] = None,
+        max_per_call: int = MAX_IMAGES_PER_CALL,
+        **kwargs: Any
+    ) -> AsyncIterator[VariantResult]:
+        """
+        Generate prompt variants with up to `max_per_call` images per request.
+
+        Variants of the same prompt share calls (num_images), so per-request
+        queueing and cold-start overhead is paid once per call rather than once
+        per image. Returned images are split back out to their own output
+        names, downloaded in parallel, and (with a manifest) recorded one entry
+        per image.
+
+        Args:
+            requests: Variant requests (see VariantRequest)
+            output_dir: Directory for the named output files
+            model: Default model for requests that don't set one
+            manifest: Journal to append one entry per saved variant
+            max_per_call: Images per call (at most MAX_IMAGES_PER_CALL)
+            **kwargs: Passed through to generate_many_async (max_concurrency,
+                request_store, concurrency, ...)
+
+        Yields:
+            VariantResult per requested name, a call's images together as its
+            downloads finish
+        """
+        output_dir = Path(output_dir)
+        calls = pack_variants(requests, min(max_per_call, self.MAX_IMAGES_PER_CALL))
+        slots_by_job = {job["id"]: slots for job, slots in calls}
+
+        with DownloadPool(max_workers=self.MAX_IMAGES_PER_CALL, retry=self.retry) as pool:
+            async for outcome in self.generate_many_async([job for job, _ in calls], model=model,
+                                                          **kwargs):
+                result = outcome.result or {}
+                images = result.get("images") or []
+                seed = result.get("seed", outcome.job.get("seed"))
+                request_id = outcome.request_id or result.get("request_id")
+
+                variants = []
+                pending = []
+                for index, (request, name) in enumerate(slots_by_job[outcome.job_id]):
+                    variant = VariantResult(request, name, output_dir / name, seed, index,
+                                            request_id, elapsed=outcome.elapsed)
+                    variants.append(variant)
+                    if not outcome.success:
+                        variant.error = str(outcome.error)
+                    elif index >= len(images) or not images[index].get("url"):
+                        variant.error = f"Call returned {len(images)} of {outcome.job['num_images']} images"
+                    else:
+                        pending.append((variant, asyncio.wrap_future(
+                            pool.submit(images[index]["url"], variant.path))))
+
+                for variant, future in pending:
+                    try:
+                        variant.file_size = await future
+                        if manifest is not None:
+                            manifest.append(variant.manifest_entry(model))
+                    except Exception as e:
+                        variant.error = f"Download failed - {e}"
+
+                for variant in variants:
+                    yield variant
+
+    def generate_variants(
+        self,
+        requests: Iterable[VariantRequest],
+        output_dir: Path,
+        on_result: Optional[Callable[[VariantResult], None]] = None,
+        **kwargs: Any
+    ) -> List[VariantResult]:
+        """
+        Blocking wrapper around generate_variants_async().
+
+        Args:
+            requests: Variant requests
+            output_dir: Directory for the named output files
+            on_result: Called with each variant as soon as it is saved (or failed)
+            **kwargs: Passed through to generate_variants_async
+
+        Returns:
+            Variant results in completion order
+        """
+        requests = list(requests)
+        max_per_call = min(kwargs.pop("max_per_call", self.MAX_IMAGES_PER_CALL),
+                           self.MAX_IMAGES_PER_CALL)
+        total = sum(len(request.names) for request in requests)
+        print(f"🎲 {total} variant(s) in {len(pack_variants(requests, max_per_call))} call(s)")
+
+        async def collect() -> List[VariantResult]:
+            results = []
+            async for variant in self.generate_variants_async(requests, output_dir,
+                                                              max_per_call=max_per_call, **kwargs):
+                results.append(variant)
+                if on_result:
+                    on_result(variant)
+                else:
+                    status = (f"✓ seed {variant.seed} #{variant.image_index + 1}"
+                              if variant.success else f"✗ {variant.error}")
+                    print(f"[{len(results):3d}/{total}] {variant.name:40s} {status}")
+            return results
+
+        return asyncio.run(collect())
 
     def download_images(
         self,
         result: Dict[str, Any],
         output_dir: str = "generated_images",
-        prefix: str = "image"
+        prefix: str = "image",
+        max_workers: int = 4
     ) -> List[str]:
         """
         Download generated images to local directory.
 
+        Images are streamed over a shared keep-alive session and written
+        atomically, several at a time when the result holds more than one.
+
         Args:
             result: Result dictionary from generate()
             output_dir: Directory to save images
             prefix: Filename prefix
+            max_workers: Parallel downloads for multi-image results
 
         Returns:
             List of saved file paths
@@ -174,35 +752,34 @@ class FalImageGenerator:
 
         print(f"\nDownloading {len(images)} image(s)...")
 
-        for idx, image_data in enumerate(images):
-            url = image_data.get("url")
-            if not url:
-                print(f"  ✗ Image {idx + 1}: No URL found")
-                continue
-
-            # Determine file extension
-            content_type = image_data.get("content_type", "image/png")
-            ext = "png" if "png" in content_type else "jpg"
+        pending = []
+        with DownloadPool(max_workers=max(1, min(max_workers, len(images))),
+                          retry=self.retry) as pool:
+            for idx, image_data in enumerate(images):
+                url = image_data.get("url")
+                if not url:
+                    print(f"  ✗ Image {idx + 1}: No URL found")
+                    continue
 
-            # Generate filename with timestamp
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"{prefix}_{timestamp}_{idx + 1}.{ext}"
-            filepath = output_path / filename
+                # Determine file extension
+                content_type = image_data.get("content_type", "image/png")
+                ext = "png" if "png" in content_type else "jpg"
 
-            try:
-                # Download image
-                response = requests.get(url, timeout=30)
-                response.raise_for_status()
+                # Generate filename with timestamp
+                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                filename = f"{prefix}_{timestamp}_{idx + 1}.{ext}"
+                filepath = output_path / filename
 
-                # Save to file
-                with open(filepath, "wb") as f:
-                    f.write(response.content)
+                pending.append((idx, filepath, pool.submit(url, filepath)))
 
-                saved_files.append(str(filepath))
-                print(f"  ✓ Image {idx + 1}: {filepath}")
+            for idx, filepath, future in pending:
+                try:
+                    future.result()
+                    saved_files.append(str(filepath))
+                    print(f"  ✓ Image {idx + 1}: {filepath}")
 
-            except Exception as e:
-                print(f"  ✗ Image {idx + 1}: Download failed - {str(e)}")
+                except Exception as e:
+                    print(f"  ✗ Image {idx + 1}: Download failed - {str(e)}")
 
         return saved_files
 
@@ -275,6 +852,9 @@ Examples:
   # Save to specific directory
   python fal_generator.py "spiritual chakra visualization" \\
     --output-dir ./spiritual_assets --prefix chakra
+
+  # Ten named variants in three calls (up to 4 images per call)
+  python fal_generator.py "sacred lotus mandala" --variants 10 --seed 7 --prefix lotus
         """
     )
 
@@ -371,6 +951,13 @@ Examples:
         help="Filename prefix (default: image)"
     )
 
+    parser.add_argument(
+        "--variants",
+        type=int,
+        help="Generate this many variants named <prefix>_vNN, packed up to 4 per call "
+             "and recorded in <output-dir>/variants_manifest.json"
+    )
+
     parser.add_argument(
         "--no-download",
         action="store_true",
@@ -413,6 +1000,31 @@ Examples:
         # Initialize generator
         generator = FalImageGenerator(args.api_key)
 
+        if args.variants:
+            request = VariantRequest.numbered(
+                args.prompt, args.prefix, args.variants,
+                ext="png" if args.format == "png" else "jpg",
+                seed=args.seed,
+                params=dict(
+                    image_size=args.size,
+                    width=args.width,
+                    height=args.height,
+                    num_inference_steps=args.steps,
+                    guidance_scale=args.guidance,
+                    output_format=args.format,
+                    enable_safety_checker=not args.no_safety,
+                ),
+            )
+            output_dir = Path(args.output_dir)
+            with ManifestJournal(output_dir / "variants_manifest.json") as manifest:
+                variants = generator.generate_variants([request], output_dir, model=model,
+                                                       manifest=manifest)
+            saved = [v for v in variants if v.success]
+            print(f"\n✓ Saved {len(saved)}/{len(variants)} variant(s) to {output_dir}/")
+            if len(saved) < len(variants):
+                sys.exit(1)
+            return
+
         # Generate images
         result = generator.generate(
             prompt=args.prompt,
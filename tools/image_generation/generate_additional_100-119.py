@@ -4,23 +4,11 @@ Generate additional 20 premium spiritual images (100-119) for SpiritAtlas
 Focus: Tantric imagery, relationship dynamics, energy flows, meditation, spiritual practices
 """
 
-import os
-import json
-import time
 from pathlib import Path
 from datetime import datetime
 
-try:
-    import fal_client
-except ImportError:
-    print("❌ fal_client not installed. Install with: pip install fal-client")
-    exit(1)
-
-try:
-    import requests
-except ImportError:
-    print("❌ requests not installed. Install with: pip install requests")
-    exit(1)
+from batch_runner import BatchSpec, run_batch
+from manifest_journal import ManifestJournal
 
 # Configuration
 MODEL = "fal-ai/flux-pro/v1.1"
@@ -202,75 +190,42 @@ PROMPTS = [
 ]
 
 
-def generate_image(prompt_data, index, total):
-    """Generate single image with FLUX 1.1 Pro"""
-    print(f"\n[{index}/{total}] Image {prompt_data['id']:03d}: {prompt_data['title']}")
-    print(f"  Size: {prompt_data['width']}x{prompt_data['height']}")
-    print(f"  Seed: {prompt_data['seed']}")
-
-    try:
-        start_time = time.time()
-
-        result = fal_client.subscribe(
-            MODEL,
-            arguments={
-                "prompt": prompt_data['prompt'],
-                "image_size": {
-                    "width": prompt_data['width'],
-                    "height": prompt_data['height']
-                },
-                "num_inference_steps": SETTINGS["num_inference_steps"],
-                "guidance_scale": SETTINGS["guidance_scale"],
-                "num_images": 1,
-                "enable_safety_checker": True,
-                "safety_tolerance": SETTINGS["safety_tolerance"],
-                "output_format": "png",
-                "seed": prompt_data['seed']
-            }
-        )
-
-        elapsed = time.time() - start_time
-
-        if result and 'images' in result and result['images']:
-            image_url = result['images'][0]['url']
-
-            # Download image
-            response = requests.get(image_url)
-
-            # Save with descriptive filename
-            filename = f"{prompt_data['id']:03d}_{prompt_data['title'].lower().replace(' ', '_').replace('-', '_')[:50]}.png"
-            filepath = OUTPUT_DIR / filename
-
-            with open(filepath, 'wb') as f:
-                f.write(response.content)
-
-            file_size = len(response.content)
-
-            print(f"  ✅ Generated in {elapsed:.1f}s")
-            print(f"  💾 Saved: {filename} ({file_size/1024:.1f} KB)")
+def output_filename(prompt_data, index):
+    """Descriptive filename"""
+    return f"{prompt_data['id']:03d}_{prompt_data['title'].lower().replace(' ', '_').replace('-', '_')[:50]}.png"
+
+
+def manifest_entry(job):
+    """Manifest record for a finished batch job"""
+    prompt_data = job.record
+    return {
+        'id': prompt_data['id'],
+        'index': job.index,
+        'title': prompt_data['title'],
+        'filename': job.filename,
+        'filepath': str(job.filepath),
+        'size': f"{prompt_data['width']}x{prompt_data['height']}",
+        'file_size_bytes': job.file_size,
+        'seed': prompt_data['seed'],
+        'generation_time_seconds': job.elapsed,
+        # Conservative estimate; cache restores are free
+        'estimated_cost_usd': 0.0 if job.cached else COST_PER_IMAGE_MIN,
+        'cached': job.cached,
+        'timestamp': datetime.now().isoformat(),
+        'model': MODEL,
+        'settings': SETTINGS
+    }
 
-            return {
-                'id': prompt_data['id'],
-                'index': index,
-                'title': prompt_data['title'],
-                'filename': filename,
-                'filepath': str(filepath),
-                'size': f"{prompt_data['width']}x{prompt_data['height']}",
-                'file_size_bytes': file_size,
-                'seed': prompt_data['seed'],
-                'generation_time_seconds': elapsed,
-                'estimated_cost_usd': COST_PER_IMAGE_MIN,  # Conservative estimate
-                'timestamp': datetime.now().isoformat(),
-                'model': MODEL,
-                'settings': SETTINGS
-            }
-        else:
-            print(f"  ❌ No image returned")
-            return None
 
-    except Exception as e:
-        print(f"  ❌ Error: {e}")
-        return None
+BATCH = BatchSpec(
+    name="Additional images 100-119",
+    model=MODEL,
+    output_dir=OUTPUT_DIR,
+    prompts=PROMPTS,
+    output_name=output_filename,
+    settings=SETTINGS,
+    cost_per_image=COST_PER_IMAGE_MIN
+)
 
 
 def main():
@@ -308,53 +263,39 @@ def main():
         print("❌ Generation cancelled")
         return
 
-    # Load existing manifest
-    manifest = []
-    if MANIFEST_FILE.exists():
-        with open(MANIFEST_FILE, 'r') as f:
-            manifest = json.load(f)
-        print(f"\n📄 Loaded existing manifest ({len(manifest)} images)")
-
-    # Generate images
-    print(f"\n🎨 Starting generation with FLUX 1.1 Pro...")
-    print(f"   Model: {MODEL}")
-    print(f"   Settings: {SETTINGS}")
+    # Journal entries as they finish; the manifest file is written once at the end
+    journal = ManifestJournal(MANIFEST_FILE)
+    existing = len(journal)
+    if existing:
+        print(f"\n📄 Loaded existing manifest ({existing} images)")
 
-    start_time = time.time()
-    generated = 0
-    failed = 0
     total_cost = 0.0
 
-    for i, prompt_data in enumerate(PROMPTS, 1):
-        result = generate_image(prompt_data, i, len(PROMPTS))
-
-        if result:
-            manifest.append(result)
-            generated += 1
-            total_cost += result['estimated_cost_usd']
-
-            # Save manifest after each image
-            with open(MANIFEST_FILE, 'w') as f:
-                json.dump(manifest, f, indent=2)
+    def save_result(job):
+        nonlocal total_cost
+        if job.success:
+            entry = manifest_entry(job)
+            journal.append(entry)
+            total_cost += entry['estimated_cost_usd']
 
             print(f"   Running total: ${total_cost:.2f} / ${BUDGET:.2f} budget")
-        else:
-            failed += 1
 
-        # Small delay to avoid rate limiting
-        time.sleep(0.5)
+    # Generate images
+    print(f"\n⚙️  Settings: {SETTINGS}")
+    with journal:
+        report = run_batch(BATCH, on_result=save_result)
+    generated = len(report.succeeded)
 
     # Summary
-    total_time = time.time() - start_time
-
     print("\n" + "=" * 70)
     print("GENERATION COMPLETE!")
     print("=" * 70)
     print(f"✅ Successfully generated: {generated}/{len(PROMPTS)}")
-    if failed > 0:
-        print(f"❌ Failed: {failed}")
-    print(f"⏱️  Total time: {total_time/60:.1f} minutes")
-    print(f"   Average: {total_time/generated:.1f} seconds per image")
+    if report.failed:
+        print(f"❌ Failed: {len(report.failed)}")
+    print(f"⏱️  Total time: {report.elapsed/60:.1f} minutes")
+    if generated:
+        print(f"   Average: {report.elapsed/generated:.1f} seconds per image (wall clock)")
     print(f"💰 Estimated total cost: ${total_cost:.2f}")
     print(f"   Under budget: ${BUDGET - total_cost:.2f}")
     print(f"📁 Output directory: {OUTPUT_DIR}")
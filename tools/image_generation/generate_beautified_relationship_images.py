@@ -9,21 +9,10 @@ Budget: $0.15 (3 images × $0.05)
 
 import os
 import json
-import time
 from pathlib import Path
 from datetime import datetime
 
-try:
-    import fal_client
-except ImportError:
-    print("❌ fal_client not installed. Install with: pip install fal-client")
-    exit(1)
-
-try:
-    import requests
-except ImportError:
-    print("❌ requests not installed. Install with: pip install requests")
-    exit(1)
+from batch_runner import BatchSpec, run_batch
 
 # Configuration
 MODEL = "fal-ai/flux-pro/v1.1"
@@ -78,70 +67,32 @@ Style: Scientific visualization meets romantic art, bioluminescent glow effects,
     }
 ]
 
-def generate_image(image_data):
-    """Generate a single image with FLUX 1.1 Pro"""
-
-    print(f"\n{'='*60}")
-    print(f"🎨 Generating Image {image_data['id']}: {image_data['title']}")
-    print(f"{'='*60}")
-    print(f"📐 Size: {image_data['width']}×{image_data['height']}")
-    print(f"🌱 Seed: {image_data['seed']}")
-    print(f"💬 Prompt length: {len(image_data['prompt'])} characters")
-
-    start_time = time.time()
-
-    try:
-        result = fal_client.subscribe(
-            MODEL,
-            arguments={
-                "prompt": image_data['prompt'],
-                "image_size": {
-                    "width": image_data['width'],
-                    "height": image_data['height']
-                },
-                "seed": image_data['seed'],
-                **SETTINGS
-            }
-        )
-
-        generation_time = time.time() - start_time
-
-        if not result or 'images' not in result or not result['images']:
-            print(f"❌ No image returned from API")
-            return None
-
-        image_url = result['images'][0]['url']
-        print(f"✅ Generated in {generation_time:.1f}s")
-        print(f"🔗 URL: {image_url[:60]}...")
-
-        # Download image
-        print(f"📥 Downloading image...")
-        response = requests.get(image_url)
-        response.raise_for_status()
-
-        # Save with descriptive filename
-        filename = f"img_{image_data['id']:03d}_{image_data['title'].lower().replace(' ', '_').replace('-', '_')}_beautified.png"
-        filepath = OUTPUT_DIR / filename
-
-        with open(filepath, 'wb') as f:
-            f.write(response.content)
-
-        file_size_kb = len(response.content) / 1024
-        print(f"💾 Saved: {filename} ({file_size_kb:.1f} KB)")
-
-        return {
-            'id': image_data['id'],
-            'title': image_data['title'],
-            'filename': filename,
-            'filepath': str(filepath),
-            'size_kb': file_size_kb,
-            'generation_time': generation_time,
-            'dimensions': f"{image_data['width']}×{image_data['height']}"
-        }
-
-    except Exception as e:
-        print(f"❌ Generation failed: {str(e)}")
-        return None
+def output_filename(image_data, index):
+    """Descriptive filename"""
+    return f"img_{image_data['id']:03d}_{image_data['title'].lower().replace(' ', '_').replace('-', '_')}_beautified.png"
+
+def result_entry(job):
+    """Manifest record for a finished batch job"""
+    image_data = job.record
+    return {
+        'id': image_data['id'],
+        'title': image_data['title'],
+        'filename': job.filename,
+        'filepath': str(job.filepath),
+        'size_kb': job.file_size / 1024,
+        'generation_time': job.elapsed,
+        'dimensions': f"{image_data['width']}×{image_data['height']}"
+    }
+
+BATCH = BatchSpec(
+    name="Beautified relationship images",
+    model=MODEL,
+    output_dir=OUTPUT_DIR,
+    prompts=IMAGES,
+    output_name=output_filename,
+    settings=SETTINGS,
+    cost_per_image=COST_PER_IMAGE
+)
 
 def main():
     """Main generation workflow"""
@@ -173,29 +124,13 @@ def main():
         return
 
     # Generate images
-    print("\n🚀 Starting generation...\n")
-    start_time = time.time()
-
-    results = []
-    total_cost = 0
-
-    for i, image_data in enumerate(IMAGES, 1):
-        print(f"\n[{i}/{len(IMAGES)}]")
-        result = generate_image(image_data)
-
-        if result:
-            results.append(result)
-            total_cost += COST_PER_IMAGE
-            print(f"💵 Running total: ${total_cost:.2f} / ${TOTAL_BUDGET:.2f}")
-        else:
-            print(f"⚠️  Skipping image {image_data['id']} due to error")
-
-        # Small delay between requests to be respectful
-        if i < len(IMAGES):
-            time.sleep(1)
+    report = run_batch(BATCH)
+    results = [result_entry(job) for job in report.succeeded]
+    total_cost = report.cost
+    total_time = report.elapsed
 
-    # Summary
-    total_time = time.time() - start_time
+    for job in report.failed:
+        print(f"⚠️  Skipped image {job.record['id']} due to error")
 
     print("\n" + "="*60)
     print("📊 GENERATION SUMMARY")
@@ -6,19 +6,11 @@ Agent 13-15: Generate 3 improved energy flow images with dynamic, flowing aesthe
 Budget: $0.15 (3 images @ $0.05 each)
 """
 
-import os
 import json
-import time
 from pathlib import Path
 from datetime import datetime
 
-try:
-    import fal_client
-    import requests
-except ImportError:
-    print("❌ Required packages not installed.")
-    print("Install with: pip install fal-client requests")
-    exit(1)
+from batch_runner import BatchSpec, run_batch
 
 # Configuration
 MODEL = "fal-ai/flux-pro/v1.1"
@@ -62,81 +54,33 @@ ENERGY_IMAGES = [
     }
 ]
 
-def generate_image(image_data, index, total):
-    """Generate single image with FLUX 1.1 Pro"""
-    print(f"\n{'='*70}")
-    print(f"[{index}/{total}] {image_data['title']}")
-    print(f"{'='*70}")
-    print(f"  Size: {image_data['width']}x{image_data['height']}")
-    print(f"  Seed: {image_data['seed']}")
-    print(f"  Cost: ${COST_PER_IMAGE}")
-
-    try:
-        start_time = time.time()
-
-        print("\n  Generating with FLUX 1.1 Pro...")
-        result = fal_client.subscribe(
-            MODEL,
-            arguments={
-                "prompt": image_data['prompt'],
-                "image_size": {
-                    "width": image_data['width'],
-                    "height": image_data['height']
-                },
-                "num_inference_steps": SETTINGS["num_inference_steps"],
-                "guidance_scale": SETTINGS["guidance_scale"],
-                "num_images": 1,
-                "enable_safety_checker": SETTINGS["enable_safety_checker"],
-                "safety_tolerance": SETTINGS["safety_tolerance"],
-                "output_format": SETTINGS["output_format"],
-                "seed": image_data['seed']
-            }
-        )
-
-        elapsed = time.time() - start_time
-
-        if result and 'images' in result and result['images']:
-            image_url = result['images'][0]['url']
-
-            # Download image
-            print("  Downloading...")
-            response = requests.get(image_url)
-
-            # Save with descriptive filename
-            filepath = OUTPUT_DIR / image_data['filename']
-
-            with open(filepath, 'wb') as f:
-                f.write(response.content)
-
-            file_size_mb = len(response.content) / (1024 * 1024)
-
-            print(f"\n  ✅ SUCCESS!")
-            print(f"     Generated in {elapsed:.1f}s")
-            print(f"     File: {image_data['filename']}")
-            print(f"     Size: {file_size_mb:.2f} MB")
-            print(f"     Path: {filepath}")
-
-            return {
-                'index': index,
-                'title': image_data['title'],
-                'filename': image_data['filename'],
-                'filepath': str(filepath),
-                'dimensions': f"{image_data['width']}x{image_data['height']}",
-                'seed': image_data['seed'],
-                'generation_time_seconds': round(elapsed, 2),
-                'file_size_mb': round(file_size_mb, 2),
-                'cost': COST_PER_IMAGE,
-                'timestamp': datetime.now().isoformat(),
-                'model': MODEL,
-                'settings': SETTINGS
-            }
-        else:
-            print(f"\n  ❌ FAILED: No image returned from API")
-            return None
-
-    except Exception as e:
-        print(f"\n  ❌ ERROR: {e}")
-        return None
+def result_entry(job):
+    """Manifest record for a finished batch job"""
+    image_data = job.record
+    return {
+        'index': job.index,
+        'title': image_data['title'],
+        'filename': job.filename,
+        'filepath': str(job.filepath),
+        'dimensions': f"{image_data['width']}x{image_data['height']}",
+        'seed': image_data['seed'],
+        'generation_time_seconds': round(job.elapsed, 2),
+        'file_size_mb': round(job.file_size / (1024 * 1024), 2),
+        'cost': COST_PER_IMAGE,
+        'timestamp': datetime.now().isoformat(),
+        'model': MODEL,
+        'settings': SETTINGS
+    }
+
+BATCH = BatchSpec(
+    name="Energy flow beautification",
+    model=MODEL,
+    output_dir=OUTPUT_DIR,
+    prompts=ENERGY_IMAGES,
+    output_name="{filename}",
+    settings=SETTINGS,
+    cost_per_image=COST_PER_IMAGE
+)
 
 def main():
     print("\n" + "="*70)
@@ -170,24 +114,10 @@ def main():
     print("🚀 STARTING GENERATION")
     print("="*70)
 
-    start_time = time.time()
-    results = []
-    generated = 0
-    failed = 0
-
-    for i, image_data in enumerate(ENERGY_IMAGES, 1):
-        result = generate_image(image_data, i, len(ENERGY_IMAGES))
-
-        if result:
-            results.append(result)
-            generated += 1
-        else:
-            failed += 1
-
-        # Small delay between generations
-        if i < len(ENERGY_IMAGES):
-            print("\n  ⏳ Waiting 2 seconds before next generation...")
-            time.sleep(2)
+    report = run_batch(BATCH)
+    results = [result_entry(job) for job in report.succeeded]
+    generated = len(results)
+    failed = len(report.failed)
 
     # Save manifest
     manifest_file = OUTPUT_DIR / "manifest.json"
@@ -204,8 +134,8 @@ def main():
         }, f, indent=2)
 
     # Final summary
-    total_time = time.time() - start_time
-    actual_cost = generated * COST_PER_IMAGE
+    total_time = report.elapsed
+    actual_cost = report.cost
 
     print("\n" + "="*70)
     print("   GENERATION COMPLETE!")
@@ -4,18 +4,12 @@ Quick FLUX 1.1 Pro generator for SpiritAtlas
 Generates all 99 images using existing prompts with FLUX 1.1 Pro model
 """
 
-import os
-import json
 import re
 from pathlib import Path
 from datetime import datetime
-import time
 
-try:
-    import fal_client
-except ImportError:
-    print("❌ fal_client not installed. Install with: pip install fal-client")
-    exit(1)
+from batch_runner import BatchSpec, run_batch, print_report
+from manifest_journal import ManifestJournal
 
 # Configuration
 MODEL = "fal-ai/flux-pro/v1.1"
@@ -80,70 +74,35 @@ def parse_prompts_from_markdown():
 
     return prompts
 
-def generate_image(prompt_data, index, total):
-    """Generate single image with FLUX 1.1 Pro"""
-    print(f"\n[{index}/{total}] {prompt_data['title']}")
-    print(f"  Size: {prompt_data['width']}x{prompt_data['height']}")
-    print(f"  Seed: {prompt_data['seed']}")
-
-    try:
-        start_time = time.time()
-
-        result = fal_client.subscribe(
-            MODEL,
-            arguments={
-                "prompt": prompt_data['prompt'],
-                "image_size": {
-                    "width": prompt_data['width'],
-                    "height": prompt_data['height']
-                },
-                "num_inference_steps": SETTINGS["num_inference_steps"],
-                "guidance_scale": SETTINGS["guidance_scale"],
-                "num_images": 1,
-                "enable_safety_checker": True,
-                "safety_tolerance": SETTINGS["safety_tolerance"],
-                "output_format": "png",
-                "seed": prompt_data['seed']
-            }
-        )
-
-        elapsed = time.time() - start_time
-
-        if result and 'images' in result and result['images']:
-            image_url = result['images'][0]['url']
-
-            # Download image
-            import requests
-            response = requests.get(image_url)
-
-            # Save with descriptive filename
-            filename = f"{index:03d}_{prompt_data['title'].lower().replace(' ', '_')[:50]}.png"
-            filepath = OUTPUT_DIR / filename
-
-            with open(filepath, 'wb') as f:
-                f.write(response.content)
-
-            print(f"  ✅ Generated in {elapsed:.1f}s")
-            print(f"  💾 Saved: {filename}")
-
-            return {
-                'index': index,
-                'title': prompt_data['title'],
-                'filename': filename,
-                'filepath': str(filepath),
-                'size': f"{prompt_data['width']}x{prompt_data['height']}",
-                'seed': prompt_data['seed'],
-                'generation_time': elapsed,
-                'cost': COST_PER_IMAGE,
-                'timestamp': datetime.now().isoformat()
-            }
-        else:
-            print(f"  ❌ No image returned")
-            return None
-
-    except Exception as e:
-        print(f"  ❌ Error: {e}")
-        return None
+def output_filename(prompt_data, index):
+    """Descriptive filename"""
+    return f"{index:03d}_{prompt_data['title'].lower().replace(' ', '_')[:50]}.png"
+
+def manifest_entry(job):
+    """Manifest record for a finished batch job"""
+    prompt_data = job.record
+    return {
+        'index': job.index,
+        'title': prompt_data['title'],
+        'filename': job.filename,
+        'filepath': str(job.filepath),
+        'size': f"{prompt_data['width']}x{prompt_data['height']}",
+        'seed': prompt_data['seed'],
+        'generation_time': job.elapsed,
+        'cost': 0.0 if job.cached else COST_PER_IMAGE,  # Cache restores are free
+        'cached': job.cached,
+        'timestamp': datetime.now().isoformat()
+    }
+
+BATCH = BatchSpec(
+    name="FLUX 1.1 Pro (99 prompts)",
+    model=MODEL,
+    output_dir=OUTPUT_DIR,
+    prompts=parse_prompts_from_markdown,
+    output_name=output_filename,
+    settings=SETTINGS,
+    cost_per_image=COST_PER_IMAGE
+)
 
 def main():
     print("=" * 60)
@@ -167,50 +126,26 @@ def main():
     total_cost = len(prompts) * COST_PER_IMAGE
     print(f"\n💰 Estimated cost: ${total_cost:.2f} ({len(prompts)} images @ ${COST_PER_IMAGE}/image)")
 
-    # Load existing manifest
-    manifest = []
-    if MANIFEST_FILE.exists():
-        with open(MANIFEST_FILE, 'r') as f:
-            manifest = json.load(f)
-        print(f"📄 Loaded existing manifest ({len(manifest)} images)")
+    # Journal entries as they finish; the manifest file is written once at the end
+    journal = ManifestJournal(MANIFEST_FILE)
+    existing = len(journal)
+    if existing:
+        print(f"📄 Loaded existing manifest ({existing} images)")
 
-    # Generate images
-    print(f"\n🚀 Starting generation with FLUX 1.1 Pro...")
-    print(f"   Model: {MODEL}")
-    print(f"   Settings: {SETTINGS}")
-
-    start_time = time.time()
-    generated = 0
-    failed = 0
-
-    for i, prompt_data in enumerate(prompts, 1):
-        result = generate_image(prompt_data, i, len(prompts))
-
-        if result:
-            manifest.append(result)
-            generated += 1
+    def save_result(job):
+        if job.success:
+            journal.append(manifest_entry(job))
 
-            # Save manifest after each image
-            with open(MANIFEST_FILE, 'w') as f:
-                json.dump(manifest, f, indent=2)
-        else:
-            failed += 1
-
-        # Small delay to avoid rate limiting
-        time.sleep(0.5)
+    # Generate images
+    print(f"\n⚙️  Settings: {SETTINGS}")
+    with journal:
+        report = run_batch(BATCH, prompts, on_result=save_result)
 
     # Summary
-    total_time = time.time() - start_time
-    total_cost_actual = generated * COST_PER_IMAGE
-
     print("\n" + "=" * 60)
     print("GENERATION COMPLETE!")
     print("=" * 60)
-    print(f"✅ Successfully generated: {generated}/{len(prompts)}")
-    if failed > 0:
-        print(f"❌ Failed: {failed}")
-    print(f"⏱️  Total time: {total_time/60:.1f} minutes")
-    print(f"💰 Total cost: ${total_cost_actual:.2f}")
+    print_report(report, len(prompts))
     print(f"📁 Output directory: {OUTPUT_DIR}")
     print(f"📄 Manifest: {MANIFEST_FILE}")
     print("=" * 60)
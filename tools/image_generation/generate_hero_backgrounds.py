@@ -5,23 +5,11 @@ Budget: $0.30 (6 images @ $0.05/image with FLUX 1.1 Pro)
 Following beautification strategy and visual specifications
 """
 
-import os
-import json
 from pathlib import Path
 from datetime import datetime
-import time
 
-try:
-    import fal_client
-except ImportError:
-    print("❌ fal_client not installed. Install with: pip install fal-client")
-    exit(1)
-
-try:
-    import requests
-except ImportError:
-    print("❌ requests not installed. Install with: pip install requests")
-    exit(1)
+from batch_runner import BatchSpec, run_batch, print_report
+from manifest_journal import ManifestJournal
 
 # Configuration
 MODEL = "fal-ai/flux-pro/v1.1"
@@ -89,88 +77,35 @@ HERO_PROMPTS = [
     }
 ]
 
-def generate_hero_image(prompt_data, index, total):
-    """Generate single hero background with FLUX 1.1 Pro"""
-    print(f"\n{'='*70}")
-    print(f"[{index}/{total}] {prompt_data['title']}")
-    print(f"{'='*70}")
-    print(f"  ID: {prompt_data['id']}")
-    print(f"  Size: {prompt_data['width']}x{prompt_data['height']}")
-    print(f"  Seed: {prompt_data['seed']}")
-    print(f"  Cost: ${COST_PER_IMAGE:.2f}")
-
-    try:
-        start_time = time.time()
-
-        print(f"\n  🚀 Submitting to FLUX 1.1 Pro...")
-
-        result = fal_client.subscribe(
-            MODEL,
-            arguments={
-                "prompt": prompt_data['prompt'],
-                "image_size": {
-                    "width": prompt_data['width'],
-                    "height": prompt_data['height']
-                },
-                "num_inference_steps": SETTINGS["num_inference_steps"],
-                "guidance_scale": SETTINGS["guidance_scale"],
-                "num_images": 1,
-                "enable_safety_checker": True,
-                "safety_tolerance": SETTINGS["safety_tolerance"],
-                "output_format": "png",
-                "seed": prompt_data['seed']
-            }
-        )
-
-        elapsed = time.time() - start_time
-
-        if result and 'images' in result and result['images']:
-            image_url = result['images'][0]['url']
-
-            print(f"  ✅ Generated in {elapsed:.1f}s")
-            print(f"  📥 Downloading image...")
-
-            # Download image
-            response = requests.get(image_url)
-            response.raise_for_status()
-
-            # Save with descriptive filename
-            filename = f"{prompt_data['id']}.png"
-            filepath = OUTPUT_DIR / filename
-
-            with open(filepath, 'wb') as f:
-                f.write(response.content)
-
-            file_size_kb = len(response.content) / 1024
-
-            print(f"  💾 Saved: {filename}")
-            print(f"  📊 File size: {file_size_kb:.1f} KB")
-            print(f"  ✅ SUCCESS!")
-
-            return {
-                'index': index,
-                'id': prompt_data['id'],
-                'title': prompt_data['title'],
-                'filename': filename,
-                'filepath': str(filepath),
-                'size': f"{prompt_data['width']}x{prompt_data['height']}",
-                'seed': prompt_data['seed'],
-                'file_size_kb': round(file_size_kb, 1),
-                'generation_time_seconds': round(elapsed, 1),
-                'cost': COST_PER_IMAGE,
-                'timestamp': datetime.now().isoformat(),
-                'model': MODEL,
-                'settings': SETTINGS
-            }
-        else:
-            print(f"  ❌ No image returned from API")
-            return None
+def manifest_entry(job):
+    """Manifest record for a finished batch job"""
+    prompt_data = job.record
+    return {
+        'index': job.index,
+        'id': prompt_data['id'],
+        'title': prompt_data['title'],
+        'filename': job.filename,
+        'filepath': str(job.filepath),
+        'size': f"{prompt_data['width']}x{prompt_data['height']}",
+        'seed': prompt_data['seed'],
+        'file_size_kb': round(job.file_size / 1024, 1),
+        'generation_time_seconds': round(job.elapsed, 1),
+        'cost': 0.0 if job.cached else COST_PER_IMAGE,  # Cache restores are free
+        'cached': job.cached,
+        'timestamp': datetime.now().isoformat(),
+        'model': MODEL,
+        'settings': SETTINGS
+    }
 
-    except Exception as e:
-        print(f"  ❌ Error: {e}")
-        import traceback
-        traceback.print_exc()
-        return None
+BATCH = BatchSpec(
+    name="Hero backgrounds",
+    model=MODEL,
+    output_dir=OUTPUT_DIR,
+    prompts=HERO_PROMPTS,
+    output_name="{id}.png",
+    settings=SETTINGS,
+    cost_per_image=COST_PER_IMAGE
+)
 
 def main():
     print("=" * 70)
@@ -198,59 +133,29 @@ def main():
 
     print(f"\n💰 Estimated cost: ${total_cost:.2f}")
 
-    # Load existing manifest
-    manifest = []
-    if MANIFEST_FILE.exists():
-        with open(MANIFEST_FILE, 'r') as f:
-            manifest = json.load(f)
-        print(f"📄 Loaded existing manifest ({len(manifest)} images)")
-
-    # Generate images
-    print(f"\n🚀 Starting generation...")
-    print(f"   Rate limit protection: 0.5s delay between images")
-
-    start_time = time.time()
-    generated = 0
-    failed = 0
-    total_size_kb = 0
+    # Journal entries as they finish; the manifest file is written once at the end
+    journal = ManifestJournal(MANIFEST_FILE)
+    existing = len(journal)
+    if existing:
+        print(f"📄 Loaded existing manifest ({existing} images)")
 
-    for i, prompt_data in enumerate(HERO_PROMPTS, 1):
-        result = generate_hero_image(prompt_data, i, len(HERO_PROMPTS))
+    def save_result(job):
+        if job.success:
+            journal.append(manifest_entry(job))
 
-        if result:
-            manifest.append(result)
-            generated += 1
-            total_size_kb += result['file_size_kb']
-
-            # Save manifest after each image
-            with open(MANIFEST_FILE, 'w') as f:
-                json.dump(manifest, f, indent=2)
-
-            print(f"\n  📊 Progress: {generated}/{len(HERO_PROMPTS)} images")
-            print(f"  💰 Cost so far: ${generated * COST_PER_IMAGE:.2f}")
-        else:
-            failed += 1
-            print(f"\n  ⚠️  Failed: {failed} images")
-
-        # Small delay to avoid rate limiting
-        if i < len(HERO_PROMPTS):
-            print(f"\n  ⏳ Waiting 0.5s before next image...")
-            time.sleep(0.5)
-
-    # Summary
-    total_time = time.time() - start_time
-    total_cost_actual = generated * COST_PER_IMAGE
+    # Generate images
+    with journal:
+        report = run_batch(BATCH, on_result=save_result)
+    manifest = journal.entries()
+    generated = len(report.succeeded)
+    total_size_kb = sum(job.file_size for job in report.succeeded) / 1024
+    total_cost_actual = report.cost
     avg_size_kb = total_size_kb / generated if generated > 0 else 0
 
     print("\n" + "=" * 70)
     print("GENERATION COMPLETE!")
     print("=" * 70)
-    print(f"✅ Successfully generated: {generated}/{len(HERO_PROMPTS)}")
-    if failed > 0:
-        print(f"❌ Failed: {failed}")
-    print(f"⏱️  Total time: {total_time/60:.1f} minutes")
-    print(f"⏱️  Average time per image: {total_time/generated:.1f}s" if generated > 0 else "")
-    print(f"💰 Total cost: ${total_cost_actual:.2f}")
+    print_report(report, len(HERO_PROMPTS))
     print(f"💰 Budget remaining: ${TOTAL_BUDGET - total_cost_actual:.2f}")
     print(f"📊 Total file size: {total_size_kb/1024:.1f} MB")
     print(f"📊 Average file size: {avg_size_kb:.1f} KB")
@@ -8,6 +8,9 @@ Usage:
     python generate_images.py --provider replicate --output ./my_assets
     python generate_images.py --provider fal --categories numerology astrology
     python generate_images.py --list
+    python generate_images.py --provider fal --dedupe   # Flag near-duplicates of the library
+    python generate_images.py --provider fal --fixed-concurrency --batch-size 3
+    python generate_images.py --provider fal --retries 5   # More retries for a flaky provider
 """
 
 import os
@@ -17,8 +20,21 @@ import time
 import argparse
 from pathlib import Path
 from datetime import datetime
+from contextlib import nullcontext
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
+
+from concurrency_control import AIMDController, Sample
+from generation_cache import GenerationCache
+from retry_policy import RetryPolicy, CircuitBreaker, NO_RETRY
+
+try:
+    from image_dedupe import DuplicateIndex, collect_items
+except ImportError:  # NumPy missing - --dedupe unavailable
+    DuplicateIndex = None
+
+FAL_MODEL = "fal-ai/flux-schnell"
+REPLICATE_MODEL = "stability-ai/sdxl:39ed52f2a78e934b3ba6e2a89f5b1c712de7dfea535525255b1aa35c5565e08b"
 
 # Parse local.properties for API keys
 def get_api_keys():
@@ -49,8 +65,46 @@ def load_prompts(prompts_file: Path) -> Dict:
     with open(prompts_file, 'r') as f:
         return json.load(f)
 
-def generate_with_fal(prompt: str, size: str, api_key: str) -> Optional[str]:
-    """Generate image using fal.ai"""
+def generation_request(provider: str, size: str) -> Tuple[str, Dict[str, Any]]:
+    """Model ID and generation parameters (minus the prompt) for a provider and size"""
+    if provider == 'fal':
+        # Map size to fal.ai format
+        size_map = {
+            '512x512': 'square',
+            '768x768': 'square',
+            '1024x1024': 'square_hd',
+            '1024x1536': 'portrait_4_3',
+            '1536x1024': 'landscape_4_3',
+        }
+        return FAL_MODEL, {
+            "image_size": size_map.get(size, 'square_hd'),
+            "num_inference_steps": 4,
+            "num_images": 1
+        }
+
+    # Parse size
+    size_map = {
+        '512x512': (512, 512),
+        '768x768': (768, 768),
+        '1024x1024': (1024, 1024),
+        '1024x1536': (1024, 1536),
+        '1536x1024': (1536, 1024),
+    }
+    width, height = size_map.get(size, (1024, 1024))
+    return REPLICATE_MODEL, {
+        "width": width,
+        "height": height,
+        "num_outputs": 1
+    }
+
+def _slot(concurrency: Optional[AIMDController]):
+    """Concurrency slot for one provider request (no-op when the pool size is fixed)"""
+    return concurrency.slot() if concurrency is not None else nullcontext(Sample())
+
+def generate_with_fal(prompt: str, size: str, api_key: str,
+                      concurrency: Optional[AIMDController] = None,
+                      retry: Optional[RetryPolicy] = None) -> Optional[str]:
+    """Generate image using fal.ai (transient failures retried per `retry`)"""
     try:
         import fal_client
     except ImportError:
@@ -59,27 +113,16 @@ def generate_with_fal(prompt: str, size: str, api_key: str) -> Optional[str]:
 
     os.environ['FAL_KEY'] = api_key
 
-    # Map size to fal.ai format
-    size_map = {
-        '512x512': 'square',
-        '768x768': 'square',
-        '1024x1024': 'square_hd',
-        '1024x1536': 'portrait_4_3',
-        '1536x1024': 'landscape_4_3',
-    }
+    model, params = generation_request('fal', size)
 
-    image_size = size_map.get(size, 'square_hd')
+    def request():
+        # Every attempt takes its own slot so the controller sees each 429
+        with _slot(concurrency) as sample:
+            return fal_client.subscribe(model, arguments=dict(params, prompt=prompt),
+                                        on_queue_update=sample.on_queue_update)
 
     try:
-        result = fal_client.subscribe(
-            "fal-ai/flux-schnell",
-            arguments={
-                "prompt": prompt,
-                "image_size": image_size,
-                "num_inference_steps": 4,
-                "num_images": 1
-            }
-        )
+        result = (retry or NO_RETRY).call(request, prompt[:40])
 
         if result and 'images' in result and len(result['images']) > 0:
             return result['images'][0]['url']
@@ -89,8 +132,10 @@ def generate_with_fal(prompt: str, size: str, api_key: str) -> Optional[str]:
         print(f"ERROR: {str(e)}")
         return None
 
-def generate_with_replicate(prompt: str, size: str, api_key: str) -> Optional[str]:
-    """Generate image using Replicate"""
+def generate_with_replicate(prompt: str, size: str, api_key: str,
+                            concurrency: Optional[AIMDController] = None,
+                            retry: Optional[RetryPolicy] = None) -> Optional[str]:
+    """Generate image using Replicate (transient failures retried per `retry`)"""
     try:
         import replicate
     except ImportError:
@@ -99,26 +144,14 @@ def generate_with_replicate(prompt: str, size: str, api_key: str) -> Optional[st
 
     os.environ['REPLICATE_API_TOKEN'] = api_key
 
-    # Parse size
-    size_map = {
-        '512x512': (512, 512),
-        '768x768': (768, 768),
-        '1024x1024': (1024, 1024),
-        '1024x1536': (1024, 1536),
-        '1536x1024': (1536, 1024),
-    }
-    width, height = size_map.get(size, (1024, 1024))
+    model, params = generation_request('replicate', size)
+
+    def request():
+        with _slot(concurrency):
+            return replicate.run(model, input=dict(params, prompt=prompt))
 
     try:
-        output = replicate.run(
-            "stability-ai/sdxl:39ed52f2a78e934b3ba6e2a89f5b1c712de7dfea535525255b1aa35c5565e08b",
-            input={
-                "prompt": prompt,
-                "width": width,
-                "height": height,
-                "num_outputs": 1
-            }
-        )
+        output = (retry or NO_RETRY).call(request, prompt[:40])
 
         if output and len(output) > 0:
             return output[0]
@@ -128,23 +161,22 @@ def generate_with_replicate(prompt: str, size: str, api_key: str) -> Optional[st
         print(f"ERROR: {str(e)}")
         return None
 
-def download_image(url: str, output_path: Path) -> bool:
-    """Download image from URL"""
+def download_image(url: str, output_path: Path, retry: Optional[RetryPolicy] = None) -> bool:
+    """
+    Download image from URL (streamed over the shared keep-alive session)
+
+    The file only appears at output_path once complete, so retried attempts
+    never leave a partial image behind.
+    """
     try:
-        import requests
+        from downloads import download_file
     except ImportError:
         print("ERROR: requests not installed. Run: pip3 install requests")
         return False
 
     try:
-        response = requests.get(url, timeout=60)
-        response.raise_for_status()
-
-        output_path.parent.mkdir(parents=True, exist_ok=True)
-
-        with open(output_path, 'wb') as f:
-            f.write(response.content)
-
+        (retry or NO_RETRY).call(lambda: download_file(url, output_path, timeout=60),
+                                 f"download {output_path.name}")
         return True
 
     except Exception as e:
@@ -152,8 +184,20 @@ def download_image(url: str, output_path: Path) -> bool:
         return False
 
 def generate_asset(asset_name: str, asset_data: Dict, provider: str, api_key: str,
-                  output_dir: Path, index: int, total: int) -> Dict:
-    """Generate a single asset"""
+                  output_dir: Path, index: int, total: int,
+                  cache: Optional[GenerationCache] = None,
+                  dedupe: Optional['DuplicateIndex'] = None,
+                  concurrency: Optional[AIMDController] = None,
+                  retry: Optional[RetryPolicy] = None) -> Dict:
+    """
+    Generate a single asset (reusing an identical cached result when available)
+
+    With a dedupe index, a new image that is a near-duplicate of one already
+    in the library is reported via result['duplicate_of']. With an adaptive
+    controller, the provider request waits for one of its slots (cache hits
+    and downloads don't). The cache is only updated after the final,
+    successful attempt of a retried generation or download.
+    """
     start_time = time.time()
 
     prompt = asset_data['prompt']
@@ -163,8 +207,35 @@ def generate_asset(asset_name: str, asset_data: Dict, provider: str, api_key: st
     # Output path
     output_path = output_dir / category / f"{asset_name}.png"
 
+    model, params = generation_request(provider, size)
+    cache_key = GenerationCache.make_key(prompt, model, **params)
+
+    if cache is not None:
+        # Identical request generated before (under any filename)
+        if cache.restore(cache_key, output_path):
+            return {
+                'success': True,
+                'asset': asset_name,
+                'path': output_path,
+                'elapsed': time.time() - start_time,
+                'skipped': True,
+                'cached': True
+            }
+
+        # Image from before the cache existed: adopt it as the current prompt's result.
+        # A file the cache recorded under a different key means the prompt changed.
+        if output_path.exists() and cache.key_for_output(output_path) is None:
+            cache.put(cache_key, output_path, prompt=prompt, model=model, asset=asset_name)
+            return {
+                'success': True,
+                'asset': asset_name,
+                'path': output_path,
+                'elapsed': time.time() - start_time,
+                'skipped': True
+            }
+
     # Check if already exists
-    if output_path.exists():
+    elif output_path.exists():
         elapsed = time.time() - start_time
         return {
             'success': True,
@@ -176,9 +247,9 @@ def generate_asset(asset_name: str, asset_data: Dict, provider: str, api_key: st
 
     # Generate image
     if provider == 'fal':
-        image_url = generate_with_fal(prompt, size, api_key)
+        image_url = generate_with_fal(prompt, size, api_key, concurrency, retry)
     else:
-        image_url = generate_with_replicate(prompt, size, api_key)
+        image_url = generate_with_replicate(prompt, size, api_key, concurrency, retry)
 
     if not image_url:
         return {
@@ -188,15 +259,27 @@ def generate_asset(asset_name: str, asset_data: Dict, provider: str, api_key: st
         }
 
     # Download image
-    if download_image(image_url, output_path):
+    if download_image(image_url, output_path, retry):
+        if cache is not None:
+            cache.put(cache_key, output_path, prompt=prompt, model=model, asset=asset_name)
         elapsed = time.time() - start_time
-        return {
+        result = {
             'success': True,
             'asset': asset_name,
             'path': output_path,
             'elapsed': elapsed,
             'skipped': False
         }
+        if dedupe is not None:
+            # The image is paid for and saved; a failed check must not undo that
+            try:
+                matches = dedupe.find(output_path)
+            except Exception as e:
+                result['dedupe_error'] = str(e)
+            else:
+                if matches:
+                    result['duplicate_of'] = matches[0][1].key
+        return result
     else:
         return {
             'success': False,
@@ -242,6 +325,7 @@ Examples:
   python generate_images.py --provider replicate                     # Generate all with Replicate
   python generate_images.py --provider fal --categories numerology   # Generate one category
   python generate_images.py --provider fal --skip-existing           # Skip existing images
+  python generate_images.py --provider fal --no-cache                # Ignore the generation cache
 
 Categories:
   numerology, astrology, chakras, elements, ayurveda,
@@ -258,11 +342,25 @@ Categories:
     parser.add_argument('--list', action='store_true',
                        help='List all prompts without generating')
     parser.add_argument('--batch-size', type=int, default=5,
-                       help='Number of concurrent generations (default: 5)')
+                       help='Starting number of concurrent generations, adapted to the '
+                            'provider\'s throughput as the run goes (default: 5)')
+    parser.add_argument('--max-concurrency', type=int, default=16,
+                       help='Upper bound for adaptive concurrency (default: 16)')
+    parser.add_argument('--fixed-concurrency', action='store_true',
+                       help='Always run exactly --batch-size generations at once')
+    parser.add_argument('--retries', type=int, default=3,
+                       help='Retries per generation/download on transient errors (default: 3)')
     parser.add_argument('--skip-existing', action='store_true',
                        help='Skip images that already exist')
     parser.add_argument('--prompts', default='prompts.json',
                        help='Prompts JSON file (default: prompts.json)')
+    parser.add_argument('--no-cache', action='store_true',
+                       help='Do not reuse or record results in the generation cache')
+    parser.add_argument('--cache-dir', type=Path,
+                       help='Generation cache directory (default: .generation_cache)')
+    parser.add_argument('--dedupe', action='store_true',
+                       help='Flag new images that near-duplicate the generated library or '
+                            'app drawables (see image_dedupe.py)')
 
     args = parser.parse_args()
 
@@ -305,6 +403,33 @@ Categories:
     # Count total assets
     total_assets = sum(len(assets) for assets in prompts.values())
 
+    cache = None if args.no_cache else GenerationCache(args.cache_dir)
+
+    dedupe = None
+    if args.dedupe:
+        if DuplicateIndex is None:
+            print("ERROR: --dedupe needs NumPy. Install with: pip install numpy")
+            sys.exit(1)
+        dedupe = DuplicateIndex()
+        dedupe.build(collect_items(output_dir, script_dir.parent.parent / 'app' / 'src' / 'main' / 'res'))
+        dedupe.save()
+
+    concurrency = None
+    if not args.fixed_concurrency:
+        concurrency = AIMDController(
+            initial=args.batch_size,
+            max_limit=max(args.batch_size, args.max_concurrency),
+            on_change=lambda old, new, reason: print(f"    ⇅ concurrency {old} → {new} ({reason})")
+        )
+
+    # One breaker for all workers: the whole batch pauses while the provider is failing
+    breaker = CircuitBreaker(
+        on_state_change=lambda old, new: print(
+            f"    ⏸ {args.provider} failing - pausing batch for {breaker.reset_timeout:.0f}s"
+            if new == 'open' else f"    ▶ {args.provider} circuit {new}")
+    )
+    retry = RetryPolicy(max_attempts=max(1, args.retries + 1), breaker=breaker)
+
     # Print header
     print("\n" + "=" * 70)
     print("SPIRITATLAS IMAGE GENERATION")
@@ -313,7 +438,15 @@ Categories:
     print(f"Output:       {output_dir}")
     print(f"Total assets: {total_assets}")
     print(f"Categories:   {', '.join(prompts.keys())}")
-    print(f"Batch size:   {args.batch_size}")
+    if concurrency is not None:
+        print(f"Concurrency:  adaptive, {concurrency.limit} to start (max {concurrency.max_limit})")
+    else:
+        print(f"Batch size:   {args.batch_size}")
+    print(f"Retries:      {retry.max_attempts - 1} per request")
+    if cache is not None:
+        print(f"Cache:        {cache.root} ({len(cache)} entries)")
+    if dedupe is not None:
+        print(f"Dedupe:       {len(dedupe.items)} library images indexed")
     print("=" * 70 + "\n")
 
     # Prepare asset list
@@ -331,8 +464,11 @@ Categories:
     successful = 0
     failed = 0
     skipped = 0
+    cached = 0
+    duplicates = []
 
-    with ThreadPoolExecutor(max_workers=args.batch_size) as executor:
+    workers = concurrency.max_limit if concurrency is not None else args.batch_size
+    with ThreadPoolExecutor(max_workers=workers) as executor:
         futures = []
 
         for i, asset_info in enumerate(asset_list):
@@ -344,7 +480,11 @@ Categories:
                 api_key,
                 output_dir,
                 i + 1,
-                total_assets
+                total_assets,
+                cache,
+                dedupe,
+                concurrency,
+                retry
             )
             futures.append((future, asset_info['name'], i + 1))
 
@@ -353,18 +493,31 @@ Categories:
             result = future.result()
 
             if result['success']:
-                if result.get('skipped'):
+                if result.get('cached'):
+                    status = '↺ cached'
+                    cached += 1
+                elif result.get('skipped'):
                     status = '↷ skipped'
                     skipped += 1
                 else:
                     status = f"✓ ({result['elapsed']:.1f}s)"
                     successful += 1
+                if result.get('duplicate_of'):
+                    status += f" ≈ near-duplicate of {result['duplicate_of']}"
+                    duplicates.append(asset_name)
+                elif result.get('dedupe_error'):
+                    status += f" (dedupe check failed: {result['dedupe_error']})"
                 print(f"[{index:2d}/{total_assets}] {asset_name:40s} {status}")
             else:
                 status = f"✗ {result.get('error', 'failed')}"
                 failed += 1
                 print(f"[{index:2d}/{total_assets}] {asset_name:40s} {status}")
 
+    if cache is not None:
+        # One index rewrite per run; entries were journaled as they finished
+        cache.compact()
+        cache.close()
+
     # Summary
     total_time = time.time() - start_time
     minutes = int(total_time // 60)
@@ -374,11 +527,19 @@ Categories:
     print("GENERATION COMPLETE")
     print("=" * 70)
     print(f"Successful:    {successful}")
+    if cached > 0:
+        print(f"From cache:    {cached}")
     if skipped > 0:
         print(f"Skipped:       {skipped}")
     if failed > 0:
         print(f"Failed:        {failed}")
+    if duplicates:
+        print(f"Near-duplicates: {len(duplicates)} (review before deploying: {', '.join(duplicates)})")
     print(f"Total time:    {minutes}m {seconds}s")
+    if concurrency is not None:
+        print(f"Concurrency:   {concurrency.summary()}")
+    if breaker.opened:
+        print(f"Paused:        {breaker.opened}x (provider failing)")
 
     # Cost estimate
     cost_per_image = 0.05 if args.provider == 'fal' else 0.003
@@ -6,16 +6,11 @@ Target quality: 9.8+/10, Budget: $0.25 (5 images @ $0.05 each)
 """
 
 import os
-import json
-import time
 from pathlib import Path
 from datetime import datetime
 
-try:
-    import fal_client
-except ImportError:
-    print("❌ fal_client not installed. Install with: pip install fal-client")
-    exit(1)
+from batch_runner import BatchSpec, run_batch, print_report
+from manifest_journal import ManifestJournal
 
 # Check for FAL_KEY
 if not os.environ.get('FAL_KEY'):
@@ -108,76 +103,36 @@ spiritual genesis symbolism, perfect circular symmetry, mystical depth, professi
     }
 ]
 
-def generate_image(prompt_data, index, total):
-    """Generate single sacred geometry image with FLUX 1.1 Pro"""
-    print(f"\n[{index}/{total}] {prompt_data['title']}")
-    print(f"  Size: {prompt_data['width']}x{prompt_data['height']}")
-    print(f"  Seed: {prompt_data['seed']}")
-    print(f"  Estimated cost: ${COST_PER_IMAGE}")
-
-    try:
-        start_time = time.time()
-
-        result = fal_client.subscribe(
-            MODEL,
-            arguments={
-                "prompt": prompt_data['prompt'],
-                "image_size": {
-                    "width": prompt_data['width'],
-                    "height": prompt_data['height']
-                },
-                "num_inference_steps": SETTINGS["num_inference_steps"],
-                "guidance_scale": SETTINGS["guidance_scale"],
-                "num_images": 1,
-                "enable_safety_checker": True,
-                "safety_tolerance": SETTINGS["safety_tolerance"],
-                "output_format": "png",
-                "seed": prompt_data['seed']
-            }
-        )
-
-        elapsed = time.time() - start_time
-
-        if result and 'images' in result and result['images']:
-            image_url = result['images'][0]['url']
-
-            # Download image
-            import requests
-            response = requests.get(image_url)
-
-            # Save with descriptive filename
-            filename = f"sacred_geometry_{index:02d}_{prompt_data['title'].lower().replace(' ', '_').replace('-', '_')[:40]}.png"
-            filepath = OUTPUT_DIR / filename
-
-            with open(filepath, 'wb') as f:
-                f.write(response.content)
-
-            file_size_mb = len(response.content) / (1024 * 1024)
-
-            print(f"  ✅ Generated in {elapsed:.1f}s")
-            print(f"  💾 Saved: {filename}")
-            print(f"  📦 Size: {file_size_mb:.2f} MB")
-
-            return {
-                'index': index,
-                'title': prompt_data['title'],
-                'filename': filename,
-                'filepath': str(filepath),
-                'size': f"{prompt_data['width']}x{prompt_data['height']}",
-                'seed': prompt_data['seed'],
-                'generation_time': elapsed,
-                'file_size_mb': file_size_mb,
-                'cost': COST_PER_IMAGE,
-                'timestamp': datetime.now().isoformat(),
-                'image_url': image_url
-            }
-        else:
-            print(f"  ❌ No image returned")
-            return None
+def output_filename(prompt_data, index):
+    """Descriptive filename"""
+    return f"sacred_geometry_{index:02d}_{prompt_data['title'].lower().replace(' ', '_').replace('-', '_')[:40]}.png"
+
+def manifest_entry(job):
+    """Manifest record for a finished batch job"""
+    prompt_data = job.record
+    return {
+        'index': job.index,
+        'title': prompt_data['title'],
+        'filename': job.filename,
+        'filepath': str(job.filepath),
+        'size': f"{prompt_data['width']}x{prompt_data['height']}",
+        'seed': prompt_data['seed'],
+        'generation_time': job.elapsed,
+        'file_size_mb': job.file_size / (1024 * 1024),
+        'cost': COST_PER_IMAGE,
+        'timestamp': datetime.now().isoformat(),
+        'image_url': job.image_url
+    }
 
-    except Exception as e:
-        print(f"  ❌ Error: {e}")
-        return None
+BATCH = BatchSpec(
+    name="Sacred geometry showcase",
+    model=MODEL,
+    output_dir=OUTPUT_DIR,
+    prompts=SACRED_GEOMETRY_PROMPTS,
+    output_name=output_filename,
+    settings=SETTINGS,
+    cost_per_image=COST_PER_IMAGE
+)
 
 def main():
     print("=" * 70)
@@ -208,44 +163,24 @@ def main():
 
     input("\n⏸️  Press Enter to start generation...")
 
-    # Generate images
-    print(f"\n🚀 Starting generation with FLUX 1.1 Pro...")
-
-    start_time = time.time()
-    manifest = []
-    generated = 0
-    failed = 0
+    journal = ManifestJournal(MANIFEST_FILE, reset=True)
 
-    for i, prompt_data in enumerate(SACRED_GEOMETRY_PROMPTS, 1):
-        result = generate_image(prompt_data, i, len(SACRED_GEOMETRY_PROMPTS))
+    def save_result(job):
+        if job.success:
+            journal.append(manifest_entry(job))
 
-        if result:
-            manifest.append(result)
-            generated += 1
-
-            # Save manifest after each image
-            with open(MANIFEST_FILE, 'w') as f:
-                json.dump(manifest, f, indent=2)
-        else:
-            failed += 1
-
-        # Small delay to avoid rate limiting
-        if i < len(SACRED_GEOMETRY_PROMPTS):
-            time.sleep(1)
-
-    # Summary
-    total_time = time.time() - start_time
-    total_cost_actual = generated * COST_PER_IMAGE
-    avg_time = total_time / generated if generated > 0 else 0
+    # Generate images
+    with journal:
+        report = run_batch(BATCH, on_result=save_result)
+    manifest = journal.entries()
+    generated = len(report.succeeded)
+    avg_time = sum(job.elapsed for job in report.succeeded) / generated if generated > 0 else 0
 
     print("\n" + "=" * 70)
     print("GENERATION COMPLETE!")
     print("=" * 70)
-    print(f"✅ Successfully generated: {generated}/{len(SACRED_GEOMETRY_PROMPTS)}")
-    if failed > 0:
-        print(f"❌ Failed: {failed}")
-    print(f"⏱️  Total time: {total_time/60:.1f} minutes ({avg_time:.1f}s per image)")
-    print(f"💰 Total cost: ${total_cost_actual:.2f}")
+    print_report(report, len(SACRED_GEOMETRY_PROMPTS))
+    print(f"⏱️  Average generation time: {avg_time:.1f}s per image")
     print(f"📁 Output directory: {OUTPUT_DIR.absolute()}")
     print(f"📄 Manifest: {MANIFEST_FILE.absolute()}")
     print("=" * 70)
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Content-addressed generation cache for SpiritAtlas generators
+
+Every generation request is reduced to a cache key: a SHA-256 over the
+normalized prompt, the model ID and the generation parameters (size, steps,
+guidance, seed, ...). Finished images are stored once in a blob store keyed by
+the hash of their bytes, and an index maps request keys to blobs. Any script
+can then reuse an identical earlier result at zero API cost, even when it was
+saved under a different filename, and a small prompt edit only misses the
+cache for the prompts that actually changed.
+
+Layout:
+    .generation_cache/
+        index.json              # request key -> blob + metadata, output path -> key
+        index.journal.jsonl     # index changes since the last compact()
+        blobs/ab/abcdef....png  # image bytes, named by their SHA-256
+
+Index changes are appended to a journal (see manifest_journal.py) instead of
+rewriting index.json per image, so concurrent runs sharing the cache don't
+overwrite each other's entries; compact() folds the journal into index.json.
+
+Usage:
+    from generation_cache import GenerationCache
+
+    with GenerationCache() as cache:
+        key = cache.make_key(prompt, "fal-ai/flux-pro/v1.1", width=1024, height=1024, seed=42)
+        if not cache.restore(key, output_path):
+            ...generate and download to output_path...
+            cache.put(key, output_path, prompt=prompt, model="fal-ai/flux-pro/v1.1")
+"""
+
+import os
+import re
+import json
+import shutil
+import hashlib
+import tempfile
+import threading
+from pathlib import Path
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from manifest_journal import ManifestJournal
+
+
+DEFAULT_CACHE_DIR = Path(__file__).parent / ".generation_cache"
+
+# index.json used to be one {"version": 1, "entries": ..., "outputs": ...} object
+LEGACY_INDEX_VERSION = 1
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Collapse whitespace so reflowed prompt text hashes identically."""
+    return re.sub(r'\s+', ' ', prompt).strip()
+
+
+def file_sha256(path: Path, chunk_size: int = 1024 * 1024) -> str:
+    """SHA-256 of a file's contents, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _fold_index(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Latest blob record per request key and latest key per output path"""
+    entries: Dict[str, Dict[str, Any]] = {}
+    outputs: Dict[str, str] = {}
+    for record in records:
+        if "output" in record:
+            outputs[record["output"]] = record["key"]
+        else:
+            entries[record["key"]] = record["entry"]
+    return ([{"key": key, "entry": entry} for key, entry in entries.items()]
+            + [{"output": output, "key": key} for output, key in outputs.items()])
+
+
+def _atomic_copy(source: Path, destination: Path):
+    """Copy through a temp file in the destination directory and rename into place."""
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp_name = tempfile.mkstemp(
+        dir=destination.parent, prefix=f".{destination.name}.", suffix=".part"
+    )
+    os.close(fd)
+    try:
+        shutil.copyfile(source, temp_name)
+        os.chmod(temp_name, 0o644)
+        os.replace(temp_name, destination)
+    except BaseException:
+        if os.path.exists(temp_name):
+            os.unlink(temp_name)
+        raise
+
+
+class GenerationCache:
+    """
+    Request-keyed index over a content-addressed blob store.
+
+    Thread-safe; every change is journaled as it happens, so an interrupted
+    batch keeps everything it finished and concurrent processes can share one
+    cache. Call compact() (or use the cache as a context manager) once at the
+    end of a run to fold the journal into index.json.
+    """
+
+    def __init__(self, root: Optional[Path] = None):
+        """
+        Args:
+            root: Cache directory (default: tools/image_generation/.generation_cache)
+        """
+        self.root = Path(root) if root else DEFAULT_CACHE_DIR
+        self.blob_dir = self.root / "blobs"
+        self.index_file = self.root / "index.json"
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._outputs: Dict[str, str] = {}
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._upgrade_index()
+        self._journal = ManifestJournal(self.index_file,
+                                        journal_file=self.root / "index.journal.jsonl")
+        self._load(self._journal.entries())
+
+    @staticmethod
+    def make_key(prompt: str, model: str, **params) -> str:
+        """
+        Cache key for a generation request.
+
+        Args:
+            prompt: Prompt text (whitespace-normalized before hashing)
+            model: Model/endpoint ID
+            **params: Generation parameters; None values are ignored so an
+                omitted argument and an explicit None share a key
+
+        Returns:
+            Hex SHA-256 request key
+        """
+        payload = {
+            "prompt": normalize_prompt(prompt),
+            "model": model,
+            "params": {k: v for k, v in params.items() if v is not None},
+        }
+        encoded = json.dumps(payload, sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+    def _upgrade_index(self):
+        """Rewrite an index.json from before the journal as a list of records."""
+        if not self.index_file.exists():
+            return
+        try:
+            with open(self.index_file, 'r') as f:
+                data = json.load(f)
+        except OSError:
+            return
+        except ValueError:
+            data = {}  # Unreadable index: start over, the blobs are still there
+        if isinstance(data, list):
+            return
+
+        records = []
+        if data.get("version") == LEGACY_INDEX_VERSION:
+            records = (
+                [{"key": key, "entry": entry} for key, entry in data.get("entries", {}).items()]
+                + [{"output": output, "key": key} for output, key in data.get("outputs", {}).items()]
+            )
+        fd, temp_name = tempfile.mkstemp(dir=self.root, prefix=".index.", suffix=".json")
+        try:
+            os.chmod(temp_name, 0o644)
+            with os.fdopen(fd, 'w') as f:
+                json.dump(records, f, indent=2)
+            os.replace(temp_name, self.index_file)
+        except BaseException:
+            if os.path.exists(temp_name):
+                os.unlink(temp_name)
+            raise
+
+    def _load(self, records: List[Dict[str, Any]]):
+        entries: Dict[str, Dict[str, Any]] = {}
+        outputs: Dict[str, str] = {}
+        for record in records:
+            if "output" in record:
+                outputs[record["output"]] = record["key"]
+            else:
+                entries[record["key"]] = record["entry"]
+        with self._lock:
+            self._entries = entries
+            self._outputs = outputs
+
+    def _blob_path(self, digest: str, suffix: str) -> Path:
+        return self.blob_dir / digest[:2] / f"{digest}{suffix}"
+
+    def get(self, key: str) -> Optional[Path]:
+        """Blob path for a request key, or None on a miss (or a pruned blob)."""
+        with self._lock:
+            entry = self._entries.get(key)
+        if not entry:
+            return None
+        blob = self.root / entry["blob"]
+        return blob if blob.exists() else None
+
+    def key_for_output(self, output_path: Path) -> Optional[str]:
+        """Request key that last produced a given output file, if known."""
+        with self._lock:
+            return self._outputs.get(str(Path(output_path).resolve()))
+
+    def restore(self, key: str, output_path: Path) -> bool:
+        """
+        Materialize a cached result at output_path.
+
+        Returns:
+            True on a cache hit (the file is in place), False on a miss
+        """
+        blob = self.get(key)
+        if blob is None:
+            return False
+
+        output_path = Path(output_path)
+        if not (output_path.exists() and self.key_for_output(output_path) == key):
+            _atomic_copy(blob, output_path)
+
+        output = str(output_path.resolve())
+        with self._lock:
+            if self._outputs.get(output) != key:
+                self._outputs[output] = key
+                self._journal.append({"output": output, "key": key})
+        return True
+
+    def put(self, key: str, image_path: Path, **metadata) -> Path:
+        """
+        Add a finished image to the cache under a request key.
+
+        Args:
+            key: Request key from make_key()
+            image_path: Image file that was produced for the request
+            **metadata: Extra fields stored in the index (prompt, model, ...)
+
+        Returns:
+            Path of the blob holding the image
+        """
+        image_path = Path(image_path)
+        digest = file_sha256(image_path)
+        blob = self._blob_path(digest, image_path.suffix.lower() or ".png")
+
+        if not blob.exists():
+            _atomic_copy(image_path, blob)
+
+        entry = dict(
+            metadata,
+            blob=str(blob.relative_to(self.root)),
+            sha256=digest,
+            size_bytes=blob.stat().st_size,
+            created=datetime.now().isoformat(),
+        )
+        output = str(image_path.resolve())
+        with self._lock:
+            self._entries[key] = entry
+            self._outputs[output] = key
+            self._journal.append({"key": key, "entry": entry})
+            self._journal.append({"output": output, "key": key})
+        return blob
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def compact(self):
+        """
+        Fold the journal into index.json, keeping the latest record per key
+        and per output. Entries journaled by other processes are picked up too.
+        """
+        self._load(self._journal.compact(_fold_index))
+
+    def close(self):
+        self._journal.close()
+
+    def __enter__(self) -> "GenerationCache":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.compact()
+        finally:
+            self.close()
@@ -0,0 +1,421 @@
+#!/usr/bin/env python3
+"""
+Perceptual-hash duplicate detector for the SpiritAtlas image library
+
+Several generators cover the same subjects (generate_images.py chakras,
+beautify_chakras.py, optimize_beautified_chakras.py, the 99-prompt and
+100-119 runs), so near-identical images get shipped under several resource
+names. This tool hashes every image in generated_images/ and every drawable
+in the app's res/drawable-* folders, then reports clusters of
+near-duplicates with their byte cost.
+
+- Each image gets a 64-bit pHash (DCT of a 32x32 greyscale thumbnail) and a
+  64-bit dHash (gradient signs on a 9x8 thumbnail). Both are computed with
+  NumPy for a whole batch of thumbnails at once.
+- Candidate pairs come from a BK-tree over pHash (sub-linear Hamming radius
+  search) and are confirmed by dHash distance. Clusters are the connected
+  components of the confirmed pairs.
+- A drawable resource (all its densities) counts as one item, hashed from
+  its smallest density. Its byte cost is the total over all densities. A
+  cluster's APK cost is the bytes of every drawable in it except the largest
+  one.
+- Hashes are kept in .dedupe_index.json, keyed by path, size and mtime, so
+  re-scans only decode new or changed files.
+
+Generators can ask DuplicateIndex.find() whether a new image is already in
+the library (see generate_images.py --dedupe).
+
+Usage:
+    python image_dedupe.py [--generated DIR] [--res DIR] [--phash-radius 6]
+                           [--dhash-radius 10] [--jobs N] [--report clusters.json]
+"""
+
+import os
+import json
+import argparse
+from pathlib import Path
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+from PIL import Image
+
+from advanced_optimize import BASE_RES_PATH, DENSITIES
+from webp_codec import map_largest_first
+
+INDEX_VERSION = 1
+INDEX_FILE = Path(__file__).parent / ".dedupe_index.json"
+GENERATED_DIR = Path(__file__).parent / "generated_images"
+
+IMAGE_SUFFIXES = ('.png', '.jpg', '.jpeg', '.webp')
+
+# Default Hamming radii (of 64 bits) for a near-duplicate
+PHASH_RADIUS = 6
+DHASH_RADIUS = 10
+
+# Thumbnails are hashed in batches of this many images
+HASH_BATCH = 64
+
+_PHASH_SIZE = 32   # DCT input
+_PHASH_KEEP = 8    # Low-frequency block kept
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+    """Orthonormal DCT-II matrix"""
+    k = np.arange(n)[:, None]
+    x = np.arange(n)[None, :]
+    matrix = np.cos(np.pi * (2 * x + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    matrix[0] /= np.sqrt(2.0)
+    return matrix
+
+
+_DCT = _dct_matrix(_PHASH_SIZE)
+
+
+def _pack_bits(bits: np.ndarray) -> List[int]:
+    """(N, 64) booleans -> N 64-bit ints, first bit most significant"""
+    packed = np.packbits(bits.astype(np.uint8), axis=1)
+    return [int.from_bytes(row.tobytes(), 'big') for row in packed]
+
+
+def phash_batch(thumbnails: np.ndarray) -> List[int]:
+    """
+    pHash of a batch of greyscale thumbnails.
+
+    Args:
+        thumbnails: (N, 32, 32) array
+
+    Returns:
+        N 64-bit hashes: the 8x8 lowest DCT frequencies against their median
+        (DC excluded from the median)
+    """
+    coefficients = np.einsum('ij,njk,lk->nil', _DCT, thumbnails, _DCT)
+    low = coefficients[:, :_PHASH_KEEP, :_PHASH_KEEP].reshape(len(thumbnails), -1)
+    median = np.median(low[:, 1:], axis=1, keepdims=True)
+    return _pack_bits(low > median)
+
+
+def dhash_batch(thumbnails: np.ndarray) -> List[int]:
+    """
+    dHash of a batch of greyscale thumbnails.
+
+    Args:
+        thumbnails: (N, 8, 9) array
+
+    Returns:
+        N 64-bit hashes: whether each pixel is brighter than its right neighbour
+    """
+    bits = thumbnails[:, :, 1:] > thumbnails[:, :, :-1]
+    return _pack_bits(bits.reshape(len(thumbnails), -1))
+
+
+def thumbnails(path: Union[str, Path]) -> Tuple[np.ndarray, np.ndarray]:
+    """Greyscale (32x32, 8x9) thumbnails of one image file"""
+    with Image.open(path) as img:
+        img.draft('L', (_PHASH_SIZE * 2, _PHASH_SIZE * 2))  # JPEG: decode at reduced size
+        if img.mode in ('RGBA', 'LA', 'PA') or 'transparency' in img.info:
+            # Hash what is visible: transparent areas as white
+            img = img.convert('RGBA')
+            flat = Image.new('RGB', img.size, (255, 255, 255))
+            flat.paste(img, mask=img.getchannel('A'))
+            img = flat
+        grey = img.convert('L')
+    large = grey.resize((_PHASH_SIZE, _PHASH_SIZE), Image.Resampling.LANCZOS, reducing_gap=2.0)
+    small = large.resize((9, 8), Image.Resampling.BOX)
+    return np.asarray(large, dtype=np.float64), np.asarray(small, dtype=np.float64)
+
+
+def hash_files(paths: List[Path], jobs: Optional[int] = None) -> Dict[Path, Union[Tuple[int, int], Exception]]:
+    """
+    (pHash, dHash) per file.
+
+    Files are decoded to thumbnails on the worker pool; hashes are computed
+    per batch of HASH_BATCH thumbnails.
+    """
+    results: Dict[Path, Union[Tuple[int, int], Exception]] = {}
+    for start in range(0, len(paths), HASH_BATCH):
+        batch = paths[start:start + HASH_BATCH]
+        decoded = []
+        for path, result in map_largest_first(thumbnails, batch, lambda p: p.stat().st_size,
+                                              max_workers=jobs):
+            if isinstance(result, Exception):
+                results[path] = result
+            else:
+                decoded.append((path, result))
+        if not decoded:
+            continue
+        phashes = phash_batch(np.stack([large for _, (large, _small) in decoded]))
+        dhashes = dhash_batch(np.stack([small for _, (_large, small) in decoded]))
+        for (path, _), p, d in zip(decoded, phashes, dhashes):
+            results[path] = (p, d)
+    return results
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count('1')
+
+
+class BKTree:
+    """Burkhard-Keller tree over 64-bit hashes (Hamming metric)"""
+
+    def __init__(self):
+        # Node: [hash, items with that hash, {distance: child node}]
+        self._root: Optional[list] = None
+        self._size = 0
+
+    def add(self, value: int, item: Any):
+        self._size += 1
+        if self._root is None:
+            self._root = [value, [item], {}]
+            return
+        node = self._root
+        while True:
+            distance = hamming(value, node[0])
+            if distance == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, [item], {}]
+                return
+            node = child
+
+    def search(self, value: int, radius: int) -> List[Tuple[int, Any]]:
+        """(distance, item) for every item within `radius` of value"""
+        found = []
+        stack = [self._root] if self._root else []
+        while stack:
+            node = stack.pop()
+            distance = hamming(value, node[0])
+            if distance <= radius:
+                found.extend((distance, item) for item in node[1])
+            # Triangle inequality: only children at distance +/- radius can match
+            for edge, child in node[2].items():
+                if distance - radius <= edge <= distance + radius:
+                    stack.append(child)
+        return found
+
+    def __len__(self) -> int:
+        return self._size
+
+
+@dataclass
+class LibraryItem:
+    """One image as shipped or generated"""
+    key: str                 # 'drawable:<name>' or the generated file's path
+    kind: str                # 'drawable' or 'generated'
+    hash_path: Path          # File the hashes were computed from
+    size: int                # Bytes (all densities for a drawable)
+    files: List[str] = field(default_factory=list)
+    phash: int = 0
+    dhash: int = 0
+
+
+def collect_items(generated_dir: Optional[Path], res_dir: Optional[Path]) -> List[LibraryItem]:
+    """Generated files plus one item per drawable resource"""
+    items = []
+    if generated_dir and generated_dir.exists():
+        for path in sorted(generated_dir.rglob("*")):
+            if path.suffix.lower() in IMAGE_SUFFIXES and path.is_file():
+                size = path.stat().st_size
+                items.append(LibraryItem(str(path), 'generated', path, size, [str(path)]))
+
+    if res_dir and res_dir.exists():
+        resources: Dict[str, LibraryItem] = {}
+        # Smallest density first, so each resource is hashed from its cheapest file
+        folders = [res_dir / f"drawable-{density}" for density in DENSITIES]
+        folders += sorted(d for d in res_dir.glob("drawable*")
+                          if d not in folders and d.name != "drawable-lqip")
+        for folder in folders:
+            if not folder.is_dir():
+                continue
+            for path in sorted(folder.iterdir()):
+                if path.suffix.lower() not in IMAGE_SUFFIXES:
+                    continue
+                item = resources.get(path.stem)
+                if item is None:
+                    item = resources[path.stem] = LibraryItem(f"drawable:{path.stem}", 'drawable',
+                                                              path, 0)
+                item.size += path.stat().st_size
+                item.files.append(f"{folder.name}/{path.name}")
+        items.extend(resources[name] for name in sorted(resources))
+    return items
+
+
+class DuplicateIndex:
+    """Hashes of the library, persisted in .dedupe_index.json, with BK-tree lookup"""
+
+    def __init__(self, path: Path = INDEX_FILE):
+        self.path = Path(path)
+        self._hashes: Dict[str, Dict[str, Any]] = {}
+        if self.path.exists():
+            try:
+                with open(self.path, 'r') as f:
+                    data = json.load(f)
+                if data.get('version') == INDEX_VERSION:
+                    self._hashes = data.get('files', {})
+            except (OSError, ValueError):
+                pass
+        self.items: List[LibraryItem] = []
+        self._tree = BKTree()
+
+    def _cached(self, path: Path) -> Optional[Tuple[int, int]]:
+        entry = self._hashes.get(str(path))
+        stat = path.stat()
+        if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            return int(entry['phash'], 16), int(entry['dhash'], 16)
+        return None
+
+    def _remember(self, path: Path, hashes: Tuple[int, int]):
+        stat = path.stat()
+        self._hashes[str(path)] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                                   'phash': f"{hashes[0]:016x}", 'dhash': f"{hashes[1]:016x}"}
+
+    def build(self, items: List[LibraryItem], jobs: Optional[int] = None) -> Tuple[int, int]:
+        """
+        Hash every item (reusing cached hashes) and index it.
+
+        Returns:
+            (files hashed, files failed)
+        """
+        todo = [item.hash_path for item in items if self._cached(item.hash_path) is None]
+        results = hash_files(todo, jobs)
+        failed = 0
+        for path, result in results.items():
+            if isinstance(result, Exception):
+                print(f"  ✗ {path}: {result}")
+                failed += 1
+            else:
+                self._remember(path, result)
+
+        self.items = []
+        self._tree = BKTree()
+        for item in items:
+            hashes = self._cached(item.hash_path)
+            if hashes is None:
+                continue
+            item.phash, item.dhash = hashes
+            self._tree.add(item.phash, len(self.items))
+            self.items.append(item)
+        return len(todo) - failed, failed
+
+    def find(self, path: Union[str, Path], phash_radius: int = PHASH_RADIUS,
+             dhash_radius: int = DHASH_RADIUS) -> List[Tuple[int, LibraryItem]]:
+        """
+        Library items that are near-duplicates of an image file.
+
+        Returns:
+            (pHash distance, item) pairs, closest first; the file itself is excluded
+        """
+        path = Path(path)
+        hashes = self._cached(path) or hash_files([path])[path]
+        if isinstance(hashes, Exception):
+            raise hashes
+        matches = []
+        for distance, index in self._tree.search(hashes[0], phash_radius):
+            item = self.items[index]
+            if item.hash_path.resolve() == path.resolve():
+                continue
+            if hamming(hashes[1], item.dhash) <= dhash_radius:
+                matches.append((distance, item))
+        return sorted(matches, key=lambda match: (match[0], match[1].key))
+
+    def clusters(self, phash_radius: int = PHASH_RADIUS,
+                 dhash_radius: int = DHASH_RADIUS) -> List[List[LibraryItem]]:
+        """Connected components of near-duplicate pairs (2+ items each)"""
+        parent = list(range(len(self.items)))
+
+        def root(i: int) -> int:
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        for i, item in enumerate(self.items):
+            for _, j in self._tree.search(item.phash, phash_radius):
+                if j > i and hamming(item.dhash, self.items[j].dhash) <= dhash_radius:
+                    parent[root(j)] = root(i)
+
+        groups: Dict[int, List[LibraryItem]] = {}
+        for i, item in enumerate(self.items):
+            groups.setdefault(root(i), []).append(item)
+        return [members for members in groups.values() if len(members) > 1]
+
+    def save(self):
+        # Forget files that no longer exist
+        files = {key: entry for key, entry in self._hashes.items() if os.path.exists(key)}
+        temp_file = self.path.with_name(self.path.name + ".tmp")
+        with open(temp_file, 'w') as f:
+            json.dump({'version': INDEX_VERSION, 'files': files}, f, sort_keys=True)
+        os.replace(temp_file, self.path)
+        self._hashes = files
+
+
+def apk_cost(cluster: List[LibraryItem]) -> int:
+    """Bytes of shipped drawables in a cluster beyond the largest one"""
+    sizes = sorted((item.size for item in cluster if item.kind == 'drawable'), reverse=True)
+    return sum(sizes[1:])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Find near-duplicate images in the library')
+    parser.add_argument('--generated', type=Path, default=GENERATED_DIR,
+                        help=f'Generated images directory (default: {GENERATED_DIR.name}/)')
+    parser.add_argument('--res', type=Path, default=BASE_RES_PATH,
+                        help='Android res directory (default: app res)')
+    parser.add_argument('--index', type=Path, default=INDEX_FILE,
+                        help=f'Hash cache (default: {INDEX_FILE.name})')
+    parser.add_argument('--phash-radius', type=int, default=PHASH_RADIUS,
+                        help=f'Max pHash distance of 64 bits (default: {PHASH_RADIUS})')
+    parser.add_argument('--dhash-radius', type=int, default=DHASH_RADIUS,
+                        help=f'Max dHash distance of 64 bits (default: {DHASH_RADIUS})')
+    parser.add_argument('--report', type=Path,
+                        help='Also write the clusters as JSON')
+    parser.add_argument('--jobs', '-j', type=int, default=None,
+                        help='Parallel decode workers (default: all CPU cores)')
+    args = parser.parse_args()
+
+    print("🔍 NEAR-DUPLICATE SCAN")
+    print("=" * 80)
+
+    items = collect_items(args.generated, args.res)
+    drawables = sum(1 for item in items if item.kind == 'drawable')
+    print(f"Items: {len(items)} ({drawables} drawable resources, {len(items) - drawables} generated files)")
+
+    index = DuplicateIndex(args.index)
+    try:
+        hashed, failed = index.build(items, args.jobs)
+    finally:
+        index.save()
+    print(f"Hashed: {hashed} new/changed, {len(index.items) - hashed} cached, {failed} failed")
+
+    clusters = sorted(index.clusters(args.phash_radius, args.dhash_radius),
+                      key=lambda cluster: (-apk_cost(cluster), cluster[0].key))
+    total_cost = 0
+    for number, cluster in enumerate(clusters, 1):
+        cost = apk_cost(cluster)
+        total_cost += cost
+        print(f"\nCluster {number}: {len(cluster)} images | APK cost {cost / 1024:.1f} KB")
+        for item in sorted(cluster, key=lambda item: (item.kind, -item.size)):
+            label = (item.key if item.kind == 'drawable'
+                     else os.path.relpath(item.key, args.generated.parent))
+            print(f"  {item.kind:9s} {label:70s} {item.size / 1024:8.1f} KB")
+
+    print("\n" + "=" * 80)
+    print(f"Clusters: {len(clusters)}")
+    print(f"Reclaimable APK bytes (keeping the largest drawable per cluster): "
+          f"{total_cost / (1024*1024):.2f} MB")
+
+    if args.report:
+        report = [{'apk_cost': apk_cost(cluster),
+                   'items': [{'key': item.key, 'kind': item.kind, 'size': item.size,
+                              'files': item.files, 'phash': f"{item.phash:016x}",
+                              'dhash': f"{item.dhash:016x}"} for item in cluster]}
+                  for cluster in clusters]
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"✓ Report written to {args.report}")
+
+
+if __name__ == "__main__":
+    main()
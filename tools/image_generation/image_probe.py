@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Header-only image probe for SpiritAtlas tooling
+
+Metadata used to cost a subprocess or a full decode per file:
+deploy_backgrounds.py asked macOS `sips` for dimensions, and
+create_resource_mapping() left 'dimensions' empty because decoding every
+drawable was too slow. probe() answers from the first few hundred bytes:
+
+- PNG: IHDR gives size, bit depth and colour type; the chunk headers up to
+  the first IDAT reveal tRNS (transparency) and acTL (APNG animation).
+- WebP: the RIFF chunk headers (VP8 / VP8L / VP8X) - see
+  webp_codec.read_webp_header().
+- Anything else: Pillow's lazy open, which also reads only the header.
+
+Results are memoized per (path, size, mtime) in a ProbeCache, which can be
+persisted to JSON so bulk runs over thousands of files only re-read headers
+of files that changed.
+
+Usage:
+    from image_probe import probe
+
+    info = probe(path)
+    print(info.width, info.height, info.has_alpha, info.lossless)
+"""
+
+import os
+import json
+import struct
+import threading
+from pathlib import Path
+from dataclasses import dataclass, asdict
+from typing import Dict, Iterable, Optional, Tuple, Union
+
+from webp_codec import read_webp_header
+
+PROBE_CACHE_VERSION = 1
+
+_PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+# PNG colour types with an alpha channel (greyscale+alpha, RGBA)
+_PNG_ALPHA_COLOR_TYPES = (4, 6)
+
+
+@dataclass
+class ImageInfo:
+    """Image metadata read without decoding pixels"""
+    format: str          # 'PNG', 'WEBP', or Pillow's format name
+    width: int
+    height: int
+    has_alpha: bool
+    lossless: bool
+    animated: bool
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        return self.width, self.height
+
+
+def _read_struct(f, fmt: str, path: Union[str, Path]) -> Tuple:
+    """Unpack fmt from the next bytes of f; a truncated file raises ValueError"""
+    size = struct.calcsize(fmt)
+    data = f.read(size)
+    if len(data) < size:
+        raise ValueError(f"{path}: truncated PNG header")
+    return struct.unpack(fmt, data)
+
+
+def _probe_png(f, path: Union[str, Path]) -> ImageInfo:
+    """Parse IHDR and the chunk headers before the first IDAT"""
+    f.seek(len(_PNG_SIGNATURE))
+    length, fourcc = _read_struct(f, '>I4s', path)
+    if fourcc != b'IHDR' or length != 13:
+        raise ValueError(f"{path}: PNG without IHDR")
+    width, height, _bit_depth, color_type = _read_struct(f, '>IIBB', path)
+    f.seek(length - 10 + 4, os.SEEK_CUR)  # Rest of IHDR + CRC
+
+    has_alpha = color_type in _PNG_ALPHA_COLOR_TYPES
+    animated = False
+    while True:
+        header = f.read(8)
+        if len(header) < 8:
+            break
+        length, fourcc = struct.unpack('>I4s', header)
+        if fourcc in (b'IDAT', b'IEND'):
+            break
+        if fourcc == b'tRNS':
+            has_alpha = True
+        elif fourcc == b'acTL':
+            animated = True
+        f.seek(length + 4, os.SEEK_CUR)  # Payload + CRC
+    return ImageInfo('PNG', width, height, has_alpha, True, animated)
+
+
+def _probe_pillow(path: Union[str, Path]) -> ImageInfo:
+    from PIL import Image
+
+    with Image.open(path) as img:  # Reads the header only
+        has_alpha = 'A' in img.getbands() or 'transparency' in img.info
+        lossless = img.format not in ('JPEG', 'MPO')
+        animated = getattr(img, 'is_animated', False)
+        return ImageInfo(img.format or '', img.size[0], img.size[1], has_alpha, lossless, animated)
+
+
+def read_image_header(path: Union[str, Path]) -> ImageInfo:
+    """
+    Probe one file, uncached.
+
+    Raises:
+        ValueError: If the header is malformed
+        OSError: If the file cannot be read
+    """
+    with open(path, 'rb') as f:
+        magic = f.read(12)
+        if magic[:8] == _PNG_SIGNATURE:
+            return _probe_png(f, path)
+    if magic[:4] == b'RIFF' and magic[8:12] == b'WEBP':
+        try:
+            webp = read_webp_header(path)
+        except (struct.error, IndexError) as e:  # Chunk cut short
+            raise ValueError(f"{path}: truncated WebP header") from e
+        return ImageInfo('WEBP', webp.width, webp.height, webp.has_alpha, webp.lossless,
+                         webp.animated)
+    return _probe_pillow(path)
+
+
+class ProbeCache:
+    """
+    Probe results memoized by (path, size, mtime).
+
+    Thread-safe; with a path, entries are loaded from and saved to JSON.
+    """
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path) if path else None
+        self._entries: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._changed = False
+        if self.path and self.path.exists():
+            try:
+                with open(self.path, 'r') as f:
+                    data = json.load(f)
+                if data.get('version') == PROBE_CACHE_VERSION:
+                    self._entries = data.get('entries', {})
+            except (OSError, ValueError):
+                pass
+
+    def probe(self, path: Union[str, Path]) -> ImageInfo:
+        key = str(Path(path).resolve())
+        stat = os.stat(path)
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            return ImageInfo(**entry['info'])
+
+        info = read_image_header(path)
+        with self._lock:
+            self._entries[key] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                                  'info': asdict(info)}
+            self._changed = True
+        return info
+
+    def probe_all(self, paths: Iterable[Union[str, Path]]) -> Dict[Path, Union[ImageInfo, Exception]]:
+        """Probe many files; unreadable ones map to their exception"""
+        results = {}
+        for path in paths:
+            try:
+                results[Path(path)] = self.probe(path)
+            except (OSError, ValueError) as e:
+                results[Path(path)] = e
+        return results
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def save(self):
+        if not self.path or not self._changed:
+            return
+        with self._lock:
+            # Forget files that no longer exist
+            entries = {key: entry for key, entry in self._entries.items() if os.path.exists(key)}
+            temp_file = self.path.with_name(self.path.name + ".tmp")
+            with open(temp_file, 'w') as f:
+                json.dump({'version': PROBE_CACHE_VERSION, 'entries': entries}, f, sort_keys=True)
+            os.replace(temp_file, self.path)
+            self._entries = entries
+            self._changed = False
+
+
+# Process-wide in-memory cache used by probe()
+_default_cache = ProbeCache()
+
+
+def probe(path: Union[str, Path]) -> ImageInfo:
+    """Header metadata of an image file (memoized per path, size and mtime)"""
+    return _default_cache.probe(path)
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Append-only manifest journal for SpiritAtlas generators
+
+Batch scripts used to reload manifest.json and json.dump() the whole list after
+every image - O(n^2) bytes written over a run, and a crash mid-write left a
+truncated manifest. Instead, each finished image is appended as one JSON line
+to a journal next to the manifest (manifest.json -> manifest.journal.jsonl),
+fsyncs are batched, and compact() materializes manifest.json once at the end
+with an atomic rename.
+
+Appends are safe for concurrent writers: threads share a lock, and separate
+processes append through O_APPEND with an advisory file lock (POSIX). A journal
+left behind by a crashed run is folded into the manifest by the next compact().
+
+Usage:
+    from manifest_journal import ManifestJournal
+
+    journal = ManifestJournal(OUTPUT_DIR / "manifest.json")
+    for entry in ...:
+        journal.append(entry)
+    manifest = journal.compact()
+"""
+
+import os
+import json
+import time
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: thread lock + O_APPEND only
+    fcntl = None
+
+
+class ManifestJournal:
+    """
+    JSON-lines journal that compacts into a JSON list manifest.
+    """
+
+    def __init__(
+        self,
+        manifest_file: Path,
+        journal_file: Optional[Path] = None,
+        fsync_every: int = 8,
+        fsync_interval: float = 2.0,
+        reset: bool = False
+    ):
+        """
+        Args:
+            manifest_file: Compacted manifest (a JSON list)
+            journal_file: JSONL journal (default: <manifest>.journal.jsonl)
+            fsync_every: fsync after this many appends...
+            fsync_interval: ...or once this many seconds have passed since the last fsync
+            reset: Start a fresh manifest, discarding the existing manifest and journal
+        """
+        self.manifest_file = Path(manifest_file)
+        self.journal_file = Path(journal_file) if journal_file else \
+            self.manifest_file.with_name(f"{self.manifest_file.stem}.journal.jsonl")
+        self.fsync_every = max(1, fsync_every)
+        self.fsync_interval = fsync_interval
+
+        self._lock = threading.Lock()
+        self._fd: Optional[int] = None
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+        self.manifest_file.parent.mkdir(parents=True, exist_ok=True)
+        if reset:
+            for path in (self.manifest_file, self.journal_file):
+                if path.exists():
+                    path.unlink()
+
+    def _open(self) -> int:
+        if self._fd is None:
+            self._fd = os.open(self.journal_file, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+        return self._fd
+
+    def _flock(self, fd: int, exclusive: bool = True):
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+
+    def _funlock(self, fd: int):
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+
+    def append(self, entry: Dict[str, Any]):
+        """Append one manifest entry (a single write of one complete line)."""
+        line = (json.dumps(entry, separators=(',', ':'), default=str) + "\n").encode('utf-8')
+
+        with self._lock:
+            fd = self._open()
+            self._flock(fd)
+            try:
+                # A crash mid-append leaves a torn last line without its newline;
+                # start on a fresh line so this entry doesn't merge into it
+                if os.fstat(fd).st_size:
+                    os.lseek(fd, -1, os.SEEK_END)
+                    if os.read(fd, 1) != b"\n":
+                        line = b"\n" + line
+                os.write(fd, line)
+            finally:
+                self._funlock(fd)
+
+            self._unsynced += 1
+            if (self._unsynced >= self.fsync_every
+                    or time.monotonic() - self._last_sync >= self.fsync_interval):
+                self._sync_locked()
+
+    def _sync_locked(self):
+        if self._fd is not None and self._unsynced:
+            os.fsync(self._fd)
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def sync(self):
+        """Force buffered appends to disk."""
+        with self._lock:
+            self._sync_locked()
+
+    def _read_manifest(self) -> List[Dict[str, Any]]:
+        if not self.manifest_file.exists():
+            return []
+        with open(self.manifest_file, 'r') as f:
+            return json.load(f)
+
+    def _read_journal(self) -> List[Dict[str, Any]]:
+        if not self.journal_file.exists():
+            return []
+        entries = []
+        with open(self.journal_file, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    # Torn line from a crash mid-append; later lines are intact
+                    continue
+        return entries
+
+    def entries(self) -> List[Dict[str, Any]]:
+        """Compacted manifest entries followed by journaled ones."""
+        with self._lock:
+            return self._read_manifest() + self._read_journal()
+
+    def __len__(self) -> int:
+        return len(self.entries())
+
+    def compact(
+        self,
+        transform: Optional[Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Fold the journal into manifest.json (atomic rename) and clear the journal.
+
+        Args:
+            transform: Applied to the merged entries before writing (e.g. to dedupe)
+
+        Returns:
+            The full manifest list
+        """
+        with self._lock:
+            self._sync_locked()
+            fd = self._open()
+            self._flock(fd)
+            try:
+                manifest = self._read_manifest() + self._read_journal()
+                if transform is not None:
+                    manifest = transform(manifest)
+
+                tmp_fd, temp_name = tempfile.mkstemp(
+                    dir=self.manifest_file.parent, prefix=f".{self.manifest_file.name}.",
+                    suffix=".tmp"
+                )
+                try:
+                    os.chmod(temp_name, 0o644)
+                    with os.fdopen(tmp_fd, 'w') as f:
+                        json.dump(manifest, f, indent=2)
+                        f.flush()
+                        os.fsync(f.fileno())
+                    os.replace(temp_name, self.manifest_file)
+                except BaseException:
+                    if os.path.exists(temp_name):
+                        os.unlink(temp_name)
+                    raise
+
+                os.ftruncate(fd, 0)
+            finally:
+                self._funlock(fd)
+            return manifest
+
+    def close(self):
+        with self._lock:
+            self._sync_locked()
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+    def __enter__(self) -> "ManifestJournal":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.compact()
+        finally:
+            self.close()
@@ -13,11 +13,19 @@ This will generate:
 - Round variants
 - Play Store asset (512x512)
 - Preview composites
+
+The master icon is decoded once; every density, round and Play Store variant
+is rendered from that buffer (see decode_pipeline.py).
+
+Each PNG is also tried as an 8-bit palette PNG (within palette_codec's error
+bounds) and written that way when smaller; pass --no-palette to disable.
 """
 
+import io
 import os
 import sys
 from pathlib import Path
+from typing import Tuple
 
 try:
     from PIL import Image, ImageDraw, ImageFilter
@@ -25,6 +33,9 @@ except ImportError:
     print("❌ Pillow not installed. Run: pip install Pillow")
     sys.exit(1)
 
+from decode_pipeline import FanOut, decode_source
+from palette_codec import encode_palette_png, quantize
+
 
 # Android mipmap density sizes (px)
 DENSITIES = {
@@ -38,6 +49,9 @@ DENSITIES = {
 # Additional sizes
 PLAY_STORE_SIZE = 512
 
+# Try palette PNGs (toggled by --no-palette)
+USE_PALETTE = True
+
 
 def create_round_mask(size: int) -> Image.Image:
     """Create a circular mask for round icons"""
@@ -47,19 +61,20 @@ def create_round_mask(size: int) -> Image.Image:
     return mask
 
 
-def resize_icon(input_path: Path, output_path: Path, size: int, round_icon: bool = False):
+def resize_icon(img: Image.Image, output_path: Path, size: int,
+                round_icon: bool = False) -> Tuple[int, int]:
     """
     Resize icon to specified size, optionally applying circular mask
 
     Args:
-        input_path: Source image path
+        img: Decoded source icon (left unmodified)
         output_path: Destination path
         size: Target size (square)
         round_icon: Apply circular mask
-    """
-    # Open source image
-    img = Image.open(input_path)
 
+    Returns:
+        (truecolor PNG size, written size) in bytes
+    """
     # Convert to RGBA if needed
     if img.mode != "RGBA":
         img = img.convert("RGBA")
@@ -72,10 +87,23 @@ def resize_icon(input_path: Path, output_path: Path, size: int, round_icon: bool
         mask = create_round_mask(size)
         img_resized.putalpha(mask)
 
-    # Save
+    # Save (as a palette PNG when that is smaller and within error bounds)
     output_path.parent.mkdir(parents=True, exist_ok=True)
-    img_resized.save(output_path, "PNG", optimize=True)
-    print(f"   ✅ {output_path.name} ({size}x{size}px)")
+    buffer = io.BytesIO()
+    img_resized.save(buffer, "PNG", optimize=True)
+    data = truecolor = buffer.getvalue()
+
+    note = ""
+    palette = quantize(img_resized) if USE_PALETTE else None
+    if palette:
+        indexed = encode_palette_png(palette)
+        if len(indexed) < len(truecolor):
+            data = indexed
+            note = f", palette {palette.colors} colors {len(truecolor)/1024:.1f}KB → {len(data)/1024:.1f}KB"
+
+    output_path.write_bytes(data)
+    print(f"   ✅ {output_path.name} ({size}x{size}px{note})")
+    return len(truecolor), len(data)
 
 
 def create_adaptive_preview(foreground_path: Path, background_path: Path, output_path: Path):
@@ -180,21 +208,44 @@ def optimize_icon(input_path: str):
 
     print(f"📁 Output: {output_base}")
 
-    # Generate all density variants
+    # Truecolor vs written bytes across all assets
+    truecolor_total = 0
+    written_total = 0
+
+    # Every variant is rendered from one decode of the master icon
+    source = decode_source(input_path, mode="RGBA")
+    failures = 0
+
+    def render(fanout: FanOut):
+        nonlocal truecolor_total, written_total, failures
+        for name, result in fanout.run(source).items():
+            if isinstance(result, Exception):
+                print(f"   ❌ {name}: {result}")
+                failures += 1
+            else:
+                truecolor, written = result
+                truecolor_total += truecolor
+                written_total += written
+
+    def variant(fanout: FanOut, output_path: Path, size: int, round_icon: bool):
+        fanout.add(str(output_path.relative_to(output_base)),
+                   lambda source: resize_icon(source.image, output_path, size, round_icon=round_icon))
+
+    # Generate all density variants (standard and round icon)
     print("\n🔄 Generating density variants...")
+    densities = FanOut()
     for density, size in DENSITIES.items():
-        # Standard icon
-        standard_path = output_base / "mipmap" / f"mipmap-{density}" / "ic_launcher.png"
-        resize_icon(input_path, standard_path, size, round_icon=False)
-
-        # Round icon
-        round_path = output_base / "mipmap" / f"mipmap-{density}" / "ic_launcher_round.png"
-        resize_icon(input_path, round_path, size, round_icon=True)
+        mipmap_dir = output_base / "mipmap" / f"mipmap-{density}"
+        variant(densities, mipmap_dir / "ic_launcher.png", size, round_icon=False)
+        variant(densities, mipmap_dir / "ic_launcher_round.png", size, round_icon=True)
+    render(densities)
 
     # Generate Play Store asset
     print("\n🔄 Generating Play Store asset (512x512)...")
-    playstore_path = output_base / "playstore" / "ic_launcher_playstore.png"
-    resize_icon(input_path, playstore_path, PLAY_STORE_SIZE, round_icon=False)
+    playstore = FanOut()
+    variant(playstore, output_base / "playstore" / "ic_launcher_playstore.png",
+            PLAY_STORE_SIZE, round_icon=False)
+    render(playstore)
 
     # Generate preview composites (if foreground/background layers available)
     print("\n🔄 Checking for adaptive icon layers...")
@@ -215,6 +266,10 @@ def optimize_icon(input_path: str):
     print("=" * 80)
     print(f"✅ Generated {len(DENSITIES) * 2} mipmap assets")
     print(f"✅ Generated 1 Play Store asset")
+    if failures:
+        print(f"❌ {failures} assets failed")
+    if USE_PALETTE:
+        print(f"🎨 Palette PNGs: {truecolor_total/1024:.1f}KB truecolor → {written_total/1024:.1f}KB written")
     print(f"📁 Output directory: {output_base}")
 
     print("\n" + "=" * 80)
@@ -238,13 +293,20 @@ def optimize_icon(input_path: str):
 
 
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: python3 optimize_app_icons.py <input_icon.png>")
+    global USE_PALETTE
+
+    args = sys.argv[1:]
+    if "--no-palette" in args:
+        args.remove("--no-palette")
+        USE_PALETTE = False
+
+    if not args:
+        print("Usage: python3 optimize_app_icons.py <input_icon.png> [--no-palette]")
         print("\nExample:")
         print("  python3 optimize_app_icons.py generated_icons/lotus_master_1024.png")
         sys.exit(1)
 
-    input_path = sys.argv[1]
+    input_path = args[0]
     optimize_icon(input_path)
 
 
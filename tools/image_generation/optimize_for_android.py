@@ -10,7 +10,39 @@ This script optimizes FLUX 1.1 Pro generated images for Android:
 - Provides size reduction statistics
 
 Usage:
-    python optimize_for_android.py [--input INPUT_DIR] [--output OUTPUT_DIR] [--dry-run]
+    python optimize_for_android.py [--input INPUT_DIR] [--output OUTPUT_DIR] [--dry-run] [--jobs N]
+                                   [--incremental] [--target-ssim 0.985] [--allow-upscale]
+                                   [--trim [CATEGORY ...]] [--no-palette] [--lqip]
+
+Each source is decoded and prepared once; every density variant (through a
+shared resampling pyramid), the optional LQIP and the quality metrics read
+that one buffer. With --jobs, whole images are spread across worker
+processes, largest first.
+
+With --lqip, a 32x32 placeholder is written to drawable-lqip/ from the
+smallest rendered level, replacing a separate create_lqip.py pass.
+
+Alpha is decided from content, not the PNG mode: fully opaque alpha channels
+(most FLUX RGBA output) are dropped, binary cut-outs keep lossless alpha, and
+soft alpha uses whichever of lossless or lossy (alpha_quality) alpha is
+smaller for that image.
+
+Densities above an image's base density are not generated: they would only
+upscale the source, adding bytes and decode memory without detail (Android
+scales the highest available density instead). Stale upscaled outputs from
+earlier runs are removed. Pass --allow-upscale for the old behaviour.
+
+App icons and buttons also try a palette (indexed-colour) lossless encode
+within error bounds per density, kept only when smaller than the truecolor
+encode (--no-palette to disable).
+
+With --trim, empty or near-uniform margins around the subject are cropped
+(default: symbols) before density generation. Crops are recorded in
+OUTPUT/.trim_crops.json and in resource_mapping.json so layouts can compensate.
+
+With --target-ssim, lossy assets are encoded at the lowest quality (up to the
+category's webp_quality) that still meets the SSIM target for each density;
+chosen qualities are cached in OUTPUT/.quality_cache.json.
 
 Android Density Guidelines:
 - mdpi (baseline):   1x   (160 dpi)
@@ -20,23 +52,42 @@ Android Density Guidelines:
 - xxxhdpi:           4x   (640 dpi)
 """
 
+import io
 import os
 import sys
 import json
+import hashlib
 import argparse
+import tempfile
 from pathlib import Path
-from typing import Dict, List, Tuple, Optional
-from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Tuple, Optional
+from dataclasses import dataclass, asdict
 from enum import Enum
+from concurrent.futures import ProcessPoolExecutor
 import shutil
 
 try:
-    from PIL import Image
+    from PIL import Image, ImageChops, ImageStat
     import PIL.features
 except ImportError:
     print("ERROR: Pillow is required. Install with: pip install Pillow")
     sys.exit(1)
 
+from decode_pipeline import decode_source, render_lqip
+from image_probe import ProbeCache
+from palette_codec import PaletteBounds, encode_palette_webp, quantize
+
+try:
+    import numpy as np
+except ImportError:  # --trim unavailable
+    np = None
+
+try:
+    from quality_search import QUALITY_CACHE_FILENAME, QualityCache, search_quality
+except ImportError:  # NumPy missing - --target-ssim unavailable
+    QualityCache = None
+    QUALITY_CACHE_FILENAME = ".quality_cache.json"
+
 
 class ImageCategory(Enum):
     """Image categories with different optimization strategies"""
@@ -48,6 +99,104 @@ class ImageCategory(Enum):
     BONUS_UI = "bonus_ui"           # Additional UI elements
 
 
+class AlphaKind(Enum):
+    """What a source's alpha channel actually contains"""
+    OPAQUE = "opaque"    # No alpha, or alpha 255 everywhere - encode as RGB
+    BINARY = "binary"    # Only 0/255 cut-outs - lossless alpha compresses to almost nothing
+    FULL = "full"        # Soft edges/gradients - lossless or lossy alpha, whichever is smaller
+
+
+def analyze_alpha(img: Image.Image) -> AlphaKind:
+    """
+    Classify an image's alpha channel by its content.
+
+    Uses Pillow's C-level extrema/histogram over the alpha band, so it is a
+    single pass over the pixels without per-pixel Python work.
+    """
+    if img.mode == 'P' and 'transparency' in img.info:
+        img = img.convert('RGBA')
+    if img.mode not in ('RGBA', 'LA', 'PA'):
+        return AlphaKind.OPAQUE
+
+    alpha = img.getchannel('A')
+    low, high = alpha.getextrema()
+    if low == 255:
+        return AlphaKind.OPAQUE
+
+    # Any level strictly between 0 and 255 means partial transparency
+    if sum(alpha.histogram()[1:255]) == 0:
+        return AlphaKind.BINARY
+    return AlphaKind.FULL
+
+
+# Categories that try the palette path (flat colour art)
+PALETTE_CATEGORIES = (ImageCategory.APP_ICON, ImageCategory.BUTTON)
+
+# Trim pre-stage: skip crops that remove less than this fraction of the area
+TRIM_MIN_SAVING = 0.05
+TRIM_FILENAME = ".trim_crops.json"
+
+
+def content_bbox(img: Image.Image, tolerance: int = 4) -> Optional[Tuple[int, int, int, int]]:
+    """
+    Bounding box (left, top, right, bottom) of an image's subject.
+
+    Transparent images: pixels with alpha above the tolerance. Opaque images:
+    pixels differing from the (uniform) corner colour by more than the
+    tolerance in any channel. Returns None when there is no margin to trim
+    (corners disagree) or nothing but margin.
+    """
+    pixels = np.asarray(img)
+    if img.mode == 'RGBA' and pixels[..., 3].min() < 255:
+        mask = pixels[..., 3] > tolerance
+    else:
+        rgb = pixels[..., :3].astype(np.int16)
+        corners = rgb[[0, 0, -1, -1], [0, -1, 0, -1]]
+        if np.ptp(corners, axis=0).max() > tolerance:
+            return None
+        background = np.median(corners, axis=0)
+        mask = np.abs(rgb - background).max(axis=-1) > tolerance
+
+    rows = np.flatnonzero(mask.any(axis=1))
+    cols = np.flatnonzero(mask.any(axis=0))
+    if rows.size == 0:
+        return None
+    return int(cols[0]), int(rows[0]), int(cols[-1]) + 1, int(rows[-1]) + 1
+
+
+def trim_image(img: Image.Image, padding: float = 0.02,
+               tolerance: int = 4) -> Tuple[Image.Image, Optional[Dict[str, Any]]]:
+    """
+    Crop empty margins, keeping `padding` (fraction of the longer side) around the subject.
+
+    Returns:
+        (cropped image, crop record or None if not worth cropping)
+    """
+    bbox = content_bbox(img, tolerance)
+    if bbox is None:
+        return img, None
+
+    width, height = img.size
+    pad = int(round(padding * max(width, height)))
+    left, top = max(0, bbox[0] - pad), max(0, bbox[1] - pad)
+    right, bottom = min(width, bbox[2] + pad), min(height, bbox[3] + pad)
+    if (right - left) * (bottom - top) > (1 - TRIM_MIN_SAVING) * width * height:
+        return img, None
+
+    crop = {
+        'source_size': [width, height],
+        'box': [left, top, right, bottom],
+        # Fractions of the untrimmed image, for layouts that must compensate
+        'insets': {
+            'left': round(left / width, 4),
+            'top': round(top / height, 4),
+            'right': round((width - right) / width, 4),
+            'bottom': round((height - bottom) / height, 4),
+        },
+    }
+    return img.crop((left, top, right, bottom)), crop
+
+
 class DensityConfig(Enum):
     """Android density configurations"""
     MDPI = ("mdpi", 1.0)
@@ -71,6 +220,14 @@ class OptimizationConfig:
     use_lossless: bool = False
     max_dimension: Optional[int] = None
     preserve_transparency: bool = True
+    target_ssim: Optional[float] = None  # Search quality per density instead of using webp_quality
+    allow_upscale: bool = False  # Render densities above base_density (upscaled from the source)
+    alpha_quality: int = 70  # Lossy alpha candidate for soft (AlphaKind.FULL) transparency
+    trim: bool = False  # Crop empty/uniform margins before density generation
+    trim_padding: float = 0.02  # Margin kept around the subject (fraction of the longer side)
+    trim_tolerance: int = 4  # Alpha / colour difference (8-bit levels) still counted as margin
+    palette: bool = False  # Also try a bounded-error palette encode; keep it if smaller
+    lqip: bool = False  # Also write a low-quality placeholder to drawable-lqip
 
     def __post_init__(self):
         if self.target_densities is None:
@@ -78,19 +235,153 @@ class OptimizationConfig:
             self.target_densities = list(DensityConfig)
 
 
+# Derive a density level from an already-resampled level when that level is at
+# least this many times larger; LANCZOS from a >=2x intermediate is visually
+# identical to resampling the full-resolution source, and far cheaper.
+PYRAMID_GAP = 2.0
+
+# Max mean absolute difference (8-bit levels, per channel) allowed between a
+# pyramid level and a direct resize of the source - see --verify-pyramid
+PYRAMID_TOLERANCE = 1.0
+
+# Resource folder suffix for placeholders (drawable-lqip, see --lqip)
+LQIP_FOLDER = "lqip"
+
+
+class DensityPyramid:
+    """
+    Lazily built resampling pyramid for one prepared image.
+
+    Each requested size is resampled from the smallest already-downscaled level
+    that is at least PYRAMID_GAP times larger (or from the source), so mdpi is
+    derived from xhdpi instead of from a 1920px original. The parent of a level
+    depends only on the set of target sizes, never on request order, so a
+    worker rendering a single density produces the same pixels as a serial run.
+    """
+
+    def __init__(self, img: Image.Image, target_sizes: List[Tuple[int, int]],
+                 gap: float = PYRAMID_GAP):
+        self.source = img
+        self.gap = gap
+        self._levels = {img.size: img}
+        # Only downscaled levels are usable as intermediates
+        self._intermediates = sorted(
+            {size for size in target_sizes if size[0] <= img.size[0] and size[1] <= img.size[1]},
+            key=lambda size: size[0] * size[1],
+            reverse=True
+        )
+
+    def _parent(self, size: Tuple[int, int]) -> Tuple[int, int]:
+        parent = self.source.size
+        for candidate in self._intermediates:
+            if candidate[0] >= size[0] * self.gap and candidate[1] >= size[1] * self.gap:
+                parent = candidate
+        return parent
+
+    def get(self, size: Tuple[int, int]) -> Image.Image:
+        """Image resampled to size (memoized)"""
+        if size not in self._levels:
+            parent = self.get(self._parent(size))
+            self._levels[size] = parent.resize(size, Image.Resampling.LANCZOS)
+        return self._levels[size]
+
+    def smallest(self) -> Image.Image:
+        """Smallest level built so far (the source if none)"""
+        return min(self._levels.values(), key=lambda level: level.size[0] * level.size[1])
+
+    def max_error(self) -> float:
+        """Largest mean absolute difference of any intermediate-derived level vs. a direct resize"""
+        worst = 0.0
+        for size in self._intermediates:
+            if self._parent(size) == self.source.size:
+                continue
+            direct = self.source.resize(size, Image.Resampling.LANCZOS)
+            diff = ImageChops.difference(self.get(size), direct)
+            worst = max(worst, max(ImageStat.Stat(diff).mean))
+        return worst
+
+
+# Bump when the encoding pipeline changes so --incremental re-encodes everything
+STATE_VERSION = 1
+STATE_FILENAME = ".optimize_state.json"
+
+
+def source_fingerprint(path: Path) -> Dict[str, Any]:
+    """Size, mtime and content hash of a source image"""
+    stat = path.stat()
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': digest.hexdigest()}
+
+
+def config_fingerprint(config: OptimizationConfig) -> str:
+    """Stable hash of the effective optimization config"""
+    encoded = json.dumps(asdict(config), sort_keys=True, default=lambda o: getattr(o, 'name', str(o)))
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()[:16]
+
+
 class ImageOptimizer:
     """Optimizes images for Android following best practices"""
 
-    def __init__(self, input_dir: Path, output_dir: Path, dry_run: bool = False):
+    def __init__(self, input_dir: Path, output_dir: Path, dry_run: bool = False,
+                 verify_pyramid: bool = False, state_file: Optional[Path] = None,
+                 target_ssim: Optional[float] = None, quality_cache_file: Optional[Path] = None,
+                 allow_upscale: bool = False, trim_categories: Optional[List[ImageCategory]] = None,
+                 trim_padding: float = 0.02, palette: bool = True, lqip: bool = False):
+        """
+        Args:
+            input_dir: Directory of source PNGs
+            output_dir: Android res directory (drawable-* folders are created here)
+            dry_run: Report what would be done without writing files
+            verify_pyramid: Check pyramid levels against direct resizes
+            state_file: Incremental state; when set, unchanged sources are skipped
+                and outputs of deleted sources are pruned
+            target_ssim: Per-density quality search target for lossy categories
+            quality_cache_file: Cache of searched qualities
+                (default: OUTPUT/.quality_cache.json)
+            allow_upscale: Also render densities above each image's base density
+            trim_categories: Categories whose empty margins are cropped
+            trim_padding: Margin kept around trimmed subjects (fraction of the longer side)
+            palette: Try palette encodes for PALETTE_CATEGORIES
+            lqip: Also write a placeholder per image to drawable-lqip
+        """
         self.input_dir = Path(input_dir)
         self.output_dir = Path(output_dir)
         self.dry_run = dry_run
+        self.verify_pyramid = verify_pyramid
+        self.state_file = Path(state_file) if state_file else None
+        self.target_ssim = target_ssim
+        self.allow_upscale = allow_upscale
+        self.trim_categories = set(trim_categories or [])
+        self.trim_padding = trim_padding
+        self.palette = palette
+        self.lqip = lqip
+        if self.trim_categories and np is None:
+            raise RuntimeError("--trim needs NumPy. Install with: pip install numpy")
+        self.crops: Dict[str, Dict[str, Any]] = self._load_crops()
+        self._crops_changed = False
+        self.quality_cache = None
+        if target_ssim is not None:
+            if QualityCache is None:
+                raise RuntimeError("--target-ssim needs NumPy. Install with: pip install numpy")
+            if not dry_run:
+                self.quality_cache = QualityCache(
+                    quality_cache_file or self.output_dir / QUALITY_CACHE_FILENAME
+                )
+        self.state: Dict[str, Dict[str, Any]] = self._load_state()
         self.stats = {
             'processed': 0,
             'total_input_size': 0,
             'total_output_size': 0,
             'skipped': 0,
-            'errors': 0
+            'pruned': 0,
+            'errors': 0,
+            'upscale_skipped': 0,
+            'alpha': {kind.value: 0 for kind in AlphaKind},
+            'palette': _empty_palette_stats(),
+            'upscale_saved': {}  # category -> estimated bytes not written
         }
 
         # Check WebP support
@@ -100,6 +391,19 @@ class ImageOptimizer:
 
     def categorize_image(self, image_path: Path) -> Tuple[ImageCategory, OptimizationConfig]:
         """Determine image category and optimization config from path/filename"""
+        category, config = self._category_config(image_path)
+        if self.target_ssim is not None and not config.use_lossless:
+            config.target_ssim = self.target_ssim
+        config.allow_upscale = self.allow_upscale
+        config.lqip = self.lqip
+        if self.palette and category in PALETTE_CATEGORIES:
+            config.palette = True
+        if category in self.trim_categories:
+            config.trim = True
+            config.trim_padding = self.trim_padding
+        return category, config
+
+    def _category_config(self, image_path: Path) -> Tuple[ImageCategory, OptimizationConfig]:
         path_str = str(image_path).lower()
         filename = image_path.stem.lower()
 
@@ -250,6 +554,10 @@ class ImageOptimizer:
         # Ensure dimensions are at least 1px
         return max(1, new_width), max(1, new_height)
 
+    def is_upscale(self, config: OptimizationConfig, density: DensityConfig) -> bool:
+        """Whether a density would be skipped as an upscale of the source"""
+        return not config.allow_upscale and density.scale > config.base_density.scale
+
     def get_android_resource_name(self, original_name: str) -> str:
         """Convert filename to Android resource naming convention"""
         # Remove extension
@@ -285,6 +593,241 @@ class ImageOptimizer:
 
         return cleaned
 
+    def prepare_image(
+        self, img: Image.Image, config: OptimizationConfig
+    ) -> Tuple[Image.Image, AlphaKind, Optional[Dict[str, Any]], Optional[str]]:
+        """
+        Classify alpha, trim margins and apply the max dimension constraint before density rendering
+
+        Returns:
+            (prepared image, alpha classification, crop record or None, log note or None)
+        """
+        # Drop alpha channels that are opaque everywhere; normalize the rest to RGBA
+        alpha = analyze_alpha(img)
+        if alpha is AlphaKind.OPAQUE:
+            if img.mode != 'RGB':
+                img = img.convert('RGB')
+        elif img.mode != 'RGBA':
+            img = img.convert('RGBA')
+
+        notes = []
+
+        # Crop empty margins (in source pixels, before any resizing)
+        crop = None
+        if config.trim:
+            untrimmed_size = img.size
+            img, crop = trim_image(img, config.trim_padding, config.trim_tolerance)
+            if crop:
+                notes.append(f"  Trimmed {untrimmed_size} to {img.size} (box {tuple(crop['box'])})")
+
+        # Apply max dimension constraint if specified
+        original_size = img.size
+        if config.max_dimension and max(img.size) > config.max_dimension:
+            ratio = config.max_dimension / max(img.size)
+            new_size = (int(img.size[0] * ratio), int(img.size[1] * ratio))
+            img = img.resize(new_size, Image.Resampling.LANCZOS)
+            notes.append(f"  Resized from {original_size} to {img.size} (max_dimension={config.max_dimension})")
+
+        return img, alpha, crop, "\n".join(notes) or None
+
+    def build_pyramid(self, img: Image.Image, config: OptimizationConfig) -> DensityPyramid:
+        """Resampling pyramid over all density sizes of a prepared image"""
+        sizes = [self.calculate_target_size(img.size, config.base_density, density)
+                 for density in config.target_densities if not self.is_upscale(config, density)]
+        return DensityPyramid(img, [size for size in sizes if min(size) >= 8])
+
+    def render_variants(self, img: Image.Image, alpha: AlphaKind, resource_name: str,
+                        config: OptimizationConfig) -> Iterator[Tuple[str, str, int]]:
+        """
+        Render every density variant (and the LQIP) of one prepared image.
+
+        All variants come from one resampling pyramid over the same buffer.
+
+        Yields:
+            (output folder, log line, output size in bytes)
+        """
+        pyramid = self.build_pyramid(img, config)
+        if self.verify_pyramid:
+            self._report_pyramid_error(pyramid)
+
+        for density in config.target_densities:
+            line, output_size = self.render_density(img, alpha, resource_name, config, density, pyramid)
+            yield density.folder, line, output_size
+
+        if config.lqip:
+            line, output_size = self.render_placeholder(resource_name, pyramid)
+            yield LQIP_FOLDER, line, output_size
+
+    def render_placeholder(self, resource_name: str, pyramid: DensityPyramid) -> Tuple[str, int]:
+        """
+        Write the LQIP from the smallest pyramid level rendered so far.
+
+        Returns:
+            (log line, output size in bytes - 0 in dry-run mode)
+        """
+        if self.dry_run:
+            return f"  [DRY RUN] {LQIP_FOLDER}: 32x32", 0
+
+        output_dir = self.output_dir / f"drawable-{LQIP_FOLDER}"
+        output_dir.mkdir(parents=True, exist_ok=True)
+        data = render_lqip(pyramid.smallest())
+        (output_dir / f"{resource_name}.webp").write_bytes(data)
+        return f"  {LQIP_FOLDER}: 32x32 ({len(data) / 1024:.1f} KB)", len(data)
+
+    def render_density(self, img: Image.Image, alpha: AlphaKind, resource_name: str,
+                       config: OptimizationConfig, density: DensityConfig,
+                       pyramid: Optional[DensityPyramid] = None) -> Tuple[str, int]:
+        """
+        Render one density variant of a prepared image.
+
+        Args:
+            alpha: Alpha classification from prepare_image()
+            pyramid: Shared resampling pyramid (default: one built for this image)
+
+        Returns:
+            (log line, output size in bytes - 0 when skipped or in dry-run mode)
+        """
+        # Calculate target size
+        target_size = self.calculate_target_size(
+            img.size, config.base_density, density
+        )
+
+        # Skip if target size is too small
+        if min(target_size) < 8:
+            return f"  Skipping {density.folder}: size would be {target_size} (too small)", 0
+
+        # Generate output path
+        output_dir = self.output_dir / f"drawable-{density.folder}"
+        output_path = output_dir / f"{resource_name}.webp"
+
+        # No-upscale policy: Android scales the highest real density instead
+        if self.is_upscale(config, density):
+            line = (f"  Skipping {density.folder}: {target_size[0]}x{target_size[1]} would upscale "
+                    f"the {img.size[0]}x{img.size[1]} source")
+            # A stale upscaled file would still win resource resolution
+            if not self.dry_run and output_path.exists():
+                output_path.unlink()
+                line += " (removed stale output)"
+            return line, 0
+
+        # Create output directory
+        if not self.dry_run:
+            output_dir.mkdir(parents=True, exist_ok=True)
+
+        if self.dry_run:
+            return f"  [DRY RUN] {density.folder}: {target_size[0]}x{target_size[1]}", 0
+
+        # Resize if needed (via the density pyramid)
+        if pyramid is None:
+            pyramid = self.build_pyramid(img, config)
+        resized = pyramid.get(target_size)
+
+        # Convert and save as WebP
+        # Determine WebP mode (prepare_image() leaves only RGB or RGBA)
+        if config.preserve_transparency and alpha is not AlphaKind.OPAQUE:
+            save_mode = 'RGBA'
+        else:
+            save_mode = 'RGB'
+            if resized.mode == 'RGBA':
+                # Create white background for transparency
+                background = Image.new('RGB', resized.size, (255, 255, 255))
+                background.paste(resized, mask=resized.getchannel('A'))
+                resized = background
+
+        # Save WebP
+        if save_mode != resized.mode:
+            resized = resized.convert(save_mode)
+
+        # Binary cut-outs stay lossless in the alpha plane (they compress to
+        # almost nothing); soft alpha gets whichever alpha coding is smaller
+        save_options = {}
+        if save_mode == 'RGBA' and not config.use_lossless:
+            save_options['alpha_quality'] = (100 if alpha is AlphaKind.BINARY
+                                             else self.tune_alpha_quality(resized, config))
+
+        if config.target_ssim is not None and not config.use_lossless:
+            line, output_size = self._render_searched(resized, resource_name, config, density,
+                                                      output_path, **save_options)
+        else:
+            resized.save(
+                output_path,
+                'WEBP',
+                quality=config.webp_quality,
+                lossless=config.use_lossless,
+                method=6,  # Slowest but best compression
+                **save_options
+            )
+
+            output_size = output_path.stat().st_size
+            line = (f"  {density.folder}: {target_size[0]}x{target_size[1]} "
+                    f"({output_size / 1024:.1f} KB)")
+
+        if config.palette:
+            output_size, palette_note = self._try_palette(resized, output_path, output_size)
+            if palette_note:
+                line += palette_note
+        return line, output_size
+
+    def _try_palette(self, resized: Image.Image, output_path: Path,
+                     truecolor_size: int) -> Tuple[int, Optional[str]]:
+        """
+        Replace a truecolor encode with a palette one if it meets the error bounds and is smaller.
+
+        Returns:
+            (final output size, log suffix or None)
+        """
+        stats = self.stats['palette']
+        stats['variants'] += 1
+        stats['truecolor_bytes'] += truecolor_size
+
+        result = quantize(resized, PaletteBounds())
+        data = encode_palette_webp(result) if result else None
+        if data is None or len(data) >= truecolor_size:
+            stats['output_bytes'] += truecolor_size
+            return truecolor_size, None
+
+        output_path.write_bytes(data)
+        stats['chosen'] += 1
+        stats['output_bytes'] += len(data)
+        return len(data), (f" → palette {result.colors} colors {len(data) / 1024:.1f} KB "
+                           f"(truecolor {truecolor_size / 1024:.1f} KB, "
+                           f"mean err {result.mean_error:.2f})")
+
+    def tune_alpha_quality(self, img: Image.Image, config: OptimizationConfig) -> int:
+        """
+        Pick lossless (100) or config.alpha_quality for a soft alpha plane.
+
+        Lossy alpha quantizes levels, which can cost more than lossless coding
+        on smooth gradients, so both are probed with a fast encode.
+        """
+        sizes = {}
+        for alpha_quality in (100, config.alpha_quality):
+            buffer = io.BytesIO()
+            img.save(buffer, 'WEBP', quality=config.webp_quality, method=0,
+                     alpha_quality=alpha_quality)
+            sizes[alpha_quality] = buffer.tell()
+        return min(sizes, key=sizes.get)
+
+    def _render_searched(self, resized: Image.Image, resource_name: str, config: OptimizationConfig,
+                         density: DensityConfig, output_path: Path,
+                         alpha_quality: Optional[int] = None) -> Tuple[str, int]:
+        """Encode at the lowest quality (<= webp_quality) meeting config.target_ssim"""
+        choice, data = search_quality(
+            resized,
+            target=config.target_ssim,
+            max_quality=config.webp_quality,
+            method=6,
+            alpha_quality=alpha_quality,
+            cache=self.quality_cache,
+            cache_key=f"{density.folder}/{resource_name}"
+        )
+        output_path.write_bytes(data)
+
+        source = "cached" if choice.cached else f"{choice.probes} probes"
+        return (f"  {density.folder}: {resized.size[0]}x{resized.size[1]} "
+                f"({choice.size / 1024:.1f} KB, q={choice.quality} "
+                f"ssim={choice.score:.4f}, {source})"), choice.size
+
     def optimize_image(self, input_path: Path, category: ImageCategory,
                       config: OptimizationConfig) -> Dict[str, int]:
         """Optimize a single image and generate all density variants"""
@@ -292,127 +835,297 @@ class ImageOptimizer:
         result = {'input_size': 0, 'output_sizes': {}}
 
         try:
-            # Load original image
-            with Image.open(input_path) as img:
-                # Get original size
-                result['input_size'] = input_path.stat().st_size
-                self.stats['total_input_size'] += result['input_size']
-
-                # Convert RGBA to RGB if image has no transparency and we don't need it
-                has_transparency = img.mode in ('RGBA', 'LA') or (
-                    img.mode == 'P' and 'transparency' in img.info
-                )
-
-                # Apply max dimension constraint if specified
-                original_size = img.size
-                if config.max_dimension and max(img.size) > config.max_dimension:
-                    ratio = config.max_dimension / max(img.size)
-                    new_size = (int(img.size[0] * ratio), int(img.size[1] * ratio))
-                    img = img.resize(new_size, Image.Resampling.LANCZOS)
-                    print(f"  Resized from {original_size} to {img.size} (max_dimension={config.max_dimension})")
-
-                # Generate resource name
-                resource_name = self.get_android_resource_name(input_path.name)
-
-                # Generate variants for each density
-                for density in config.target_densities:
-                    # Calculate target size
-                    target_size = self.calculate_target_size(
-                        img.size, config.base_density, density
-                    )
-
-                    # Skip if target size is too small
-                    if min(target_size) < 8:
-                        print(f"  Skipping {density.folder}: size would be {target_size} (too small)")
-                        continue
-
-                    # Create output directory
-                    output_dir = self.output_dir / f"drawable-{density.folder}"
-                    if not self.dry_run:
-                        output_dir.mkdir(parents=True, exist_ok=True)
-
-                    # Generate output path
-                    output_path = output_dir / f"{resource_name}.webp"
-
-                    # Resize if needed
-                    if target_size != img.size:
-                        resized = img.resize(target_size, Image.Resampling.LANCZOS)
-                    else:
-                        resized = img
-
-                    # Convert and save as WebP
-                    if not self.dry_run:
-                        # Determine WebP mode
-                        if config.preserve_transparency and has_transparency:
-                            save_mode = resized.mode
-                        else:
-                            save_mode = 'RGB'
-                            if resized.mode in ('RGBA', 'LA', 'P'):
-                                # Create white background for transparency
-                                background = Image.new('RGB', resized.size, (255, 255, 255))
-                                if resized.mode == 'P':
-                                    resized = resized.convert('RGBA')
-                                background.paste(resized, mask=resized.split()[-1] if resized.mode in ('RGBA', 'LA') else None)
-                                resized = background
-
-                        # Save WebP
-                        if save_mode != resized.mode:
-                            resized = resized.convert(save_mode)
-
-                        resized.save(
-                            output_path,
-                            'WEBP',
-                            quality=config.webp_quality,
-                            lossless=config.use_lossless,
-                            method=6  # Slowest but best compression
-                        )
-
-                        output_size = output_path.stat().st_size
-                        result['output_sizes'][density.folder] = output_size
-                        self.stats['total_output_size'] += output_size
-
-                        print(f"  {density.folder}: {target_size[0]}x{target_size[1]} "
-                              f"({output_size / 1024:.1f} KB)")
-                    else:
-                        print(f"  [DRY RUN] {density.folder}: {target_size[0]}x{target_size[1]}")
-
-                self.stats['processed'] += 1
-                return result
+            # Get original size
+            result['input_size'] = input_path.stat().st_size
+            self.stats['total_input_size'] += result['input_size']
+
+            # Decode once; every variant is rendered from this buffer
+            img = decode_source(input_path).image
+            img, alpha, crop, note = self.prepare_image(img, config)
+            self.stats['alpha'][alpha.value] += 1
+            print(f"  Alpha: {alpha.value}")
+            if note:
+                print(note)
+
+            # Generate resource name
+            resource_name = self.get_android_resource_name(input_path.name)
+            self._record_crop(resource_name, crop)
+
+            # Generate variants for each density
+            for folder, line, output_size in self.render_variants(img, alpha, resource_name, config):
+                if output_size:
+                    result['output_sizes'][folder] = output_size
+                    self.stats['total_output_size'] += output_size
+                print(line)
+
+            self._record_upscale_savings(category, config, result['output_sizes'])
+            self.stats['processed'] += 1
+            return result
 
         except Exception as e:
             print(f"  ERROR: {str(e)}")
             self.stats['errors'] += 1
             return result
 
-    def process_directory(self, input_dir: Optional[Path] = None):
-        """Process all images in the input directory"""
+    def process_directory(self, input_dir: Optional[Path] = None, jobs: int = 1):
+        """
+        Process all images in the input directory
+
+        Args:
+            input_dir: Directory to scan (default: self.input_dir)
+            jobs: Worker processes; >1 spreads images (each decoded once) across cores
+        """
 
         if input_dir is None:
             input_dir = self.input_dir
 
-        # Find all PNG files
-        png_files = list(input_dir.rglob("*.png"))
+        # Find all PNG files (sorted so runs are reproducible)
+        png_files = sorted(input_dir.rglob("*.png"))
+
+        if self.state_file:
+            self._prune_deleted(png_files)
 
         if not png_files:
             print(f"No PNG files found in {input_dir}")
+            self._save_state()
             return
 
         print(f"\nFound {len(png_files)} PNG files to process")
-        print(f"{'=' * 80}")
 
-        # Process each image
-        for i, png_path in enumerate(png_files, 1):
-            print(f"\n[{i}/{len(png_files)}] Processing: {png_path.name}")
-            print(f"  Size: {png_path.stat().st_size / 1024:.1f} KB")
+        if self.state_file:
+            changed = [png_path for png_path in png_files
+                       if not self._is_unchanged(png_path, self.categorize_image(png_path)[1])]
+            self.stats['skipped'] += len(png_files) - len(changed)
+            print(f"Incremental: {len(changed)} changed, {len(png_files) - len(changed)} unchanged")
+            png_files = changed
 
-            # Categorize and get config
-            category, config = self.categorize_image(png_path)
-            print(f"  Category: {category.value}")
-            print(f"  WebP Quality: {config.webp_quality} ({'lossless' if config.use_lossless else 'lossy'})")
-            print(f"  Base Density: {config.base_density.folder} ({config.base_density.scale}x)")
+        print(f"{'=' * 80}")
 
-            # Optimize
-            self.optimize_image(png_path, category, config)
+        try:
+            if jobs > 1:
+                self._process_parallel(png_files, jobs)
+                return
+
+            # Process each image
+            for i, png_path in enumerate(png_files, 1):
+                category, config = self._print_image_header(png_path, i, len(png_files))
+
+                # Optimize
+                errors = self.stats['errors']
+                result = self.optimize_image(png_path, category, config)
+                if self.stats['errors'] == errors:
+                    self._record_state(png_path, config, result['output_sizes'])
+        finally:
+            self._save_state()
+            self._save_crops()
+            if self.quality_cache is not None:
+                self.quality_cache.compact()
+
+    def _load_state(self) -> Dict[str, Dict[str, Any]]:
+        if not self.state_file or not self.state_file.exists():
+            return {}
+        try:
+            with open(self.state_file, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return data.get('sources', {}) if data.get('version') == STATE_VERSION else {}
+
+    def _save_state(self):
+        if not self.state_file or self.dry_run:
+            return
+        self.state_file.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_name = tempfile.mkstemp(dir=self.state_file.parent, prefix=".optimize_state.",
+                                         suffix=".tmp")
+        try:
+            os.chmod(temp_name, 0o644)
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'version': STATE_VERSION, 'sources': self.state}, f, indent=2, sort_keys=True)
+            os.replace(temp_name, self.state_file)
+        except BaseException:
+            if os.path.exists(temp_name):
+                os.unlink(temp_name)
+            raise
+
+    def _state_key(self, png_path: Path) -> str:
+        try:
+            return str(png_path.resolve().relative_to(self.input_dir.resolve()))
+        except ValueError:
+            return str(png_path.resolve())
+
+    def _is_unchanged(self, png_path: Path, config: OptimizationConfig) -> bool:
+        """True if the source, its config and all its outputs match the saved state"""
+        entry = self.state.get(self._state_key(png_path))
+        if not entry or entry['config'] != config_fingerprint(config):
+            return False
+        if not all((self.output_dir / output).exists() for output in entry['outputs']):
+            return False
+
+        stat = png_path.stat()
+        if stat.st_size == entry['size'] and stat.st_mtime_ns == entry['mtime_ns']:
+            return True
+        if stat.st_size != entry['size']:
+            return False
+
+        # Touched but maybe not modified: fall back to the content hash
+        fingerprint = source_fingerprint(png_path)
+        if fingerprint['sha256'] != entry['sha256']:
+            return False
+        entry['mtime_ns'] = fingerprint['mtime_ns']
+        return True
+
+    def _record_state(self, png_path: Path, config: OptimizationConfig, output_sizes: Dict[str, int]):
+        """Remember a successfully encoded source and remove outputs it no longer produces"""
+        if not self.state_file or self.dry_run:
+            return
+        key = self._state_key(png_path)
+        resource_name = self.get_android_resource_name(png_path.name)
+        outputs = sorted(f"drawable-{folder}/{resource_name}.webp" for folder in output_sizes)
+
+        previous = self.state.get(key, {}).get('outputs', [])
+        for stale in set(previous) - set(outputs):
+            stale_path = self.output_dir / stale
+            if stale_path.exists():
+                stale_path.unlink()
+
+        self.state[key] = dict(
+            source_fingerprint(png_path),
+            config=config_fingerprint(config),
+            outputs=outputs,
+            output_size=sum(output_sizes.values())
+        )
+
+    def _prune_deleted(self, png_files: List[Path]):
+        """Delete outputs whose source PNG no longer exists"""
+        current = {self._state_key(png_path) for png_path in png_files}
+        for key in sorted(set(self.state) - current):
+            for output in self.state[key]['outputs']:
+                output_path = self.output_dir / output
+                if self.dry_run:
+                    print(f"  [DRY RUN] Would prune {output} (source {key} deleted)")
+                elif output_path.exists():
+                    output_path.unlink()
+                    print(f"  Pruned {output} (source {key} deleted)")
+            self.stats['pruned'] += 1
+            if not self.dry_run:
+                del self.state[key]
+                self._record_crop(self.get_android_resource_name(Path(key).name), None)
+
+    def _load_crops(self) -> Dict[str, Dict[str, Any]]:
+        return load_crops(self.output_dir)
+
+    def _record_crop(self, resource_name: str, crop: Optional[Dict[str, Any]]):
+        """Remember (or forget) the trim applied to a resource"""
+        if self.crops.get(resource_name) != crop:
+            if crop is None:
+                self.crops.pop(resource_name, None)
+            else:
+                self.crops[resource_name] = crop
+            self._crops_changed = True
+
+    def _save_crops(self):
+        if not self._crops_changed or self.dry_run:
+            return
+        crops_file = self.output_dir / TRIM_FILENAME
+        crops_file.parent.mkdir(parents=True, exist_ok=True)
+        temp_file = crops_file.with_name(crops_file.name + ".tmp")
+        with open(temp_file, 'w') as f:
+            json.dump(self.crops, f, indent=2, sort_keys=True)
+        os.replace(temp_file, crops_file)
+        self._crops_changed = False
+
+    def _record_upscale_savings(self, category: ImageCategory, config: OptimizationConfig,
+                                output_sizes: Dict[str, int]):
+        """
+        Estimate the bytes the no-upscale policy saved for one image.
+
+        An upscaled variant carries no more detail than the base density, so
+        its size is estimated as the base-density output scaled by area.
+        """
+        base_size = output_sizes.get(config.base_density.folder)
+        for density in config.target_densities:
+            if not self.is_upscale(config, density):
+                continue
+            self.stats['upscale_skipped'] += 1
+            if base_size:
+                ratio = (density.scale / config.base_density.scale) ** 2
+                saved = self.stats['upscale_saved']
+                saved[category.value] = saved.get(category.value, 0) + int(base_size * ratio)
+
+    def _report_pyramid_error(self, pyramid: DensityPyramid):
+        error = pyramid.max_error()
+        status = "OK" if error <= PYRAMID_TOLERANCE else "EXCEEDS TOLERANCE"
+        print(f"  Pyramid vs direct resize: {error:.3f} mean abs diff "
+              f"(tolerance {PYRAMID_TOLERANCE}) {status}")
+        if error > PYRAMID_TOLERANCE:
+            self.stats['pyramid_violations'] = self.stats.get('pyramid_violations', 0) + 1
+
+    def _print_image_header(self, png_path: Path, index: int,
+                            total: int) -> Tuple[ImageCategory, OptimizationConfig]:
+        print(f"\n[{index}/{total}] Processing: {png_path.name}")
+        print(f"  Size: {png_path.stat().st_size / 1024:.1f} KB")
+
+        # Categorize and get config
+        category, config = self.categorize_image(png_path)
+        print(f"  Category: {category.value}")
+        print(f"  WebP Quality: {config.webp_quality} ({'lossless' if config.use_lossless else 'lossy'})"
+              + (f", searched for SSIM >= {config.target_ssim}" if config.target_ssim is not None else ""))
+        print(f"  Base Density: {config.base_density.folder} ({config.base_density.scale}x)")
+        return category, config
+
+    def _process_parallel(self, png_files: List[Path], jobs: int):
+        """
+        Render images on a process pool, one task per source image.
+
+        Each worker decodes and prepares its source once and renders every
+        variant from it. Tasks are submitted largest source first; results are
+        reported image by image in input order, so the log and the stats are
+        the same as a serial run.
+        """
+        quality_cache_file = self.quality_cache.path if self.quality_cache else None
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                                 initargs=(self.input_dir, self.output_dir, self.dry_run,
+                                           self.target_ssim, quality_cache_file)) as executor:
+            pending = [(png_path,) + self.categorize_image(png_path) for png_path in png_files]
+            futures = {}
+            for png_path, category, config in sorted(pending, key=lambda item: item[0].stat().st_size,
+                                                     reverse=True):
+                resource_name = self.get_android_resource_name(png_path.name)
+                futures[png_path] = executor.submit(_render_image_unit, png_path, resource_name, config)
+
+            for i, (png_path, category, config) in enumerate(pending, 1):
+                self._print_image_header(png_path, i, len(png_files))
+                self.stats['total_input_size'] += png_path.stat().st_size
+
+                try:
+                    alpha, crop, note, variants, error, palette = futures.pop(png_path).result()
+                except Exception as e:
+                    print(f"  ERROR: {str(e)}")
+                    self.stats['errors'] += 1
+                    continue
+
+                # Report like optimize_image(): variants up to the first failure
+                self._record_crop(self.get_android_resource_name(png_path.name), crop)
+                self.stats['alpha'][alpha.value] += 1
+                print(f"  Alpha: {alpha.value}")
+                if note:
+                    print(note)
+                output_sizes = {}
+                for folder, line, output_size in variants:
+                    print(line)
+                    self.stats['total_output_size'] += output_size
+                    if output_size:
+                        output_sizes[folder] = output_size
+                for key, value in palette.items():
+                    self.stats['palette'][key] += value
+
+                if error:
+                    print(f"  ERROR: {error}")
+                    self.stats['errors'] += 1
+                else:
+                    self._record_upscale_savings(category, config, output_sizes)
+                    self.stats['processed'] += 1
+                    self._record_state(png_path, config, output_sizes)
 
     def print_summary(self):
         """Print optimization summary statistics"""
@@ -421,7 +1134,22 @@ class ImageOptimizer:
         print(f"{'=' * 80}")
         print(f"Processed: {self.stats['processed']} images")
         print(f"Skipped:   {self.stats['skipped']} images")
+        if self.stats['pruned']:
+            print(f"Pruned:    {self.stats['pruned']} deleted sources")
         print(f"Errors:    {self.stats['errors']} images")
+        if self.verify_pyramid:
+            print(f"Pyramid tolerance violations: {self.stats.get('pyramid_violations', 0)}")
+        if any(self.stats['alpha'].values()):
+            print("Alpha:     " + ", ".join(f"{count} {kind}" for kind, count in self.stats['alpha'].items()))
+        palette = self.stats['palette']
+        if palette['variants']:
+            print(f"Palette:   {palette['chosen']}/{palette['variants']} variants | "
+                  f"truecolor {palette['truecolor_bytes'] / 1024:.1f} KB → "
+                  f"{palette['output_bytes'] / 1024:.1f} KB")
+        if self.stats['upscale_skipped']:
+            print(f"Upscaled densities skipped: {self.stats['upscale_skipped']}")
+            for category, saved in sorted(self.stats['upscale_saved'].items()):
+                print(f"  {category:12s} ~{saved / 1024:.1f} KB saved (estimated)")
 
         if self.stats['processed'] > 0 and not self.dry_run:
             input_size_mb = self.stats['total_input_size'] / (1024 * 1024)
@@ -438,21 +1166,94 @@ class ImageOptimizer:
         print(f"{'=' * 80}\n")
 
 
-def create_resource_mapping(output_dir: Path) -> Dict:
-    """Create a JSON mapping of resources for easy reference"""
+_worker_optimizer: Optional[ImageOptimizer] = None
+
+
+def _empty_palette_stats() -> Dict[str, int]:
+    return {'variants': 0, 'chosen': 0, 'truecolor_bytes': 0, 'output_bytes': 0}
+
+
+def _init_worker(input_dir: Path, output_dir: Path, dry_run: bool,
+                 target_ssim: Optional[float] = None, quality_cache_file: Optional[Path] = None):
+    """Process pool initializer: one optimizer per worker process"""
+    global _worker_optimizer
+    # Workers share the quality cache journal (appends are process-safe)
+    _worker_optimizer = ImageOptimizer(input_dir, output_dir, dry_run=dry_run,
+                                       target_ssim=target_ssim,
+                                       quality_cache_file=quality_cache_file)
+
+
+def _render_image_unit(input_path: Path, resource_name: str, config: OptimizationConfig
+                       ) -> Tuple[AlphaKind, Optional[Dict[str, Any]], Optional[str],
+                                  List[Tuple[str, str, int]], Optional[str], Dict[str, int]]:
+    """
+    Worker: decode and prepare one source once, then render all its variants.
+
+    Returns:
+        (alpha, crop, note, [(folder, line, size), ...] up to the first failure,
+         error message or None, palette stats)
+    """
+    # Per-image palette stats travel back to the parent with the result
+    _worker_optimizer.stats['palette'] = _empty_palette_stats()
+    img = decode_source(input_path).image
+    img, alpha, crop, note = _worker_optimizer.prepare_image(img, config)
+
+    variants = []
+    error = None
+    try:
+        for variant in _worker_optimizer.render_variants(img, alpha, resource_name, config):
+            variants.append(variant)
+    except Exception as e:
+        error = str(e)
+    return alpha, crop, note, variants, error, _worker_optimizer.stats['palette']
+
+
+def load_crops(output_dir: Path) -> Dict[str, Dict[str, Any]]:
+    """Trim records by resource name (see --trim)"""
+    crops_file = Path(output_dir) / TRIM_FILENAME
+    if not crops_file.exists():
+        return {}
+    try:
+        with open(crops_file, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def create_resource_mapping(output_dir: Path, probe_cache: Optional[ProbeCache] = None) -> Dict:
+    """
+    Create a JSON mapping of resources for easy reference
+
+    Args:
+        output_dir: Android res directory
+        probe_cache: Header cache for dimensions (default: a fresh in-memory one)
+    """
     mapping = {}
+    crops = load_crops(output_dir)
+    probe_cache = probe_cache or ProbeCache()
 
     for drawable_dir in output_dir.glob("drawable-*"):
         density = drawable_dir.name.replace("drawable-", "")
         mapping[density] = []
 
         for webp_file in drawable_dir.glob("*.webp"):
-            mapping[density].append({
+            # Header-only probe: no pixel decode per drawable
+            try:
+                info = probe_cache.probe(webp_file)
+            except (OSError, ValueError) as e:
+                print(f"  WARNING: could not read header of {webp_file}: {e}")
+                info = None
+            entry = {
                 'name': webp_file.stem,
                 'file': webp_file.name,
                 'size': webp_file.stat().st_size,
-                'dimensions': None  # Could add with PIL if needed
-            })
+                'dimensions': [info.width, info.height] if info else None,
+                'lossless': info.lossless if info else None,
+                'alpha': info.has_alpha if info else None
+            }
+            if webp_file.stem in crops:
+                entry['crop'] = crops[webp_file.stem]
+            mapping[density].append(entry)
 
     return mapping
 
@@ -490,6 +1291,79 @@ def main():
         help='Create resource_mapping.json after optimization'
     )
 
+    parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help=f'Only re-encode sources whose content or category config changed, and prune '
+             f'outputs of deleted sources (state kept in OUTPUT/{STATE_FILENAME})'
+    )
+
+    parser.add_argument(
+        '--state-file',
+        type=Path,
+        help=f'Incremental state file (default: OUTPUT/{STATE_FILENAME}; implies --incremental)'
+    )
+
+    parser.add_argument(
+        '--verify-pyramid',
+        action='store_true',
+        help='Check pyramid-resampled densities against direct resizes of the source (serial mode)'
+    )
+
+    parser.add_argument(
+        '--trim',
+        nargs='*',
+        metavar='CATEGORY',
+        choices=[category.value for category in ImageCategory],
+        help='Crop empty/uniform margins before density generation, for the given categories '
+             '(default with no value: symbols); crops are recorded for layouts'
+    )
+
+    parser.add_argument(
+        '--trim-padding',
+        type=float,
+        default=0.02,
+        help='Margin kept around trimmed subjects, as a fraction of the longer side (default: 0.02)'
+    )
+
+    parser.add_argument(
+        '--no-palette',
+        action='store_true',
+        help='Do not try palette encodes for app icons and buttons'
+    )
+
+    parser.add_argument(
+        '--lqip',
+        action='store_true',
+        help='Also write a 32x32 placeholder per image to drawable-lqip (no separate decode pass)'
+    )
+
+    parser.add_argument(
+        '--allow-upscale',
+        action='store_true',
+        help='Also generate densities above each image\'s base density (upscaled from the source)'
+    )
+
+    parser.add_argument(
+        '--target-ssim',
+        type=float,
+        help='Search WebP quality per image and density for the smallest encode with at least '
+             'this SSIM (e.g. 0.985); lossy categories only, capped at the category quality'
+    )
+
+    parser.add_argument(
+        '--quality-cache',
+        type=Path,
+        help=f'Cache of searched qualities (default: OUTPUT/{QUALITY_CACHE_FILENAME})'
+    )
+
+    parser.add_argument(
+        '--jobs', '-j',
+        type=int,
+        default=1,
+        help='Worker processes, one source image per task (default: 1, 0 = all CPU cores)'
+    )
+
     args = parser.parse_args()
 
     # Validate input directory
@@ -508,8 +1382,20 @@ Mode:   {'DRY RUN (no files will be created)' if args.dry_run else 'LIVE (files
 """)
 
     # Create optimizer and process
-    optimizer = ImageOptimizer(args.input, args.output, dry_run=args.dry_run)
-    optimizer.process_directory()
+    trim_categories = None
+    if args.trim is not None:
+        trim_categories = [ImageCategory(value) for value in args.trim] or [ImageCategory.SYMBOL]
+    state_file = args.state_file or (args.output / STATE_FILENAME if args.incremental else None)
+    optimizer = ImageOptimizer(args.input, args.output, dry_run=args.dry_run,
+                               verify_pyramid=args.verify_pyramid, state_file=state_file,
+                               target_ssim=args.target_ssim, quality_cache_file=args.quality_cache,
+                               allow_upscale=args.allow_upscale, trim_categories=trim_categories,
+                               trim_padding=args.trim_padding, palette=not args.no_palette,
+                               lqip=args.lqip)
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+    if args.verify_pyramid:
+        jobs = 1
+    optimizer.process_directory(jobs=jobs)
     optimizer.print_summary()
 
     # Create resource mapping if requested
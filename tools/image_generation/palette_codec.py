@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Palette (indexed-colour) encoding for flat SpiritAtlas icons and UI elements
+
+App icons and buttons are mostly flat colour, yet they were encoded as
+truecolor lossless WebP/PNG (or q90 lossy). Quantizing them to a small
+adaptive palette - only as far as an error bound allows - lets WebP lossless
+use its colour-indexing transform (pixels packed 2/4/8 per byte at <=16/4/2
+colours) and PNG use 8-bit indexed storage.
+
+- count_colors() counts distinct colours (stops counting past a limit).
+- quantize() finds the smallest palette whose pixel error stays within
+  PaletteBounds (mean, 99th percentile and maximum absolute error per
+  channel, alpha included - the maximum keeps antialiased edges from
+  collapsing into jaggies), using Pillow's C quantizers and histograms.
+- encode_palette_webp() / encode_palette_png() encode the result; callers
+  keep it only when it beats their truecolor encode.
+
+Usage:
+    from palette_codec import quantize, encode_palette_webp
+
+    result = quantize(img)
+    if result:
+        data = encode_palette_webp(result)
+"""
+
+import io
+from dataclasses import dataclass
+from typing import List, Optional
+
+from PIL import Image, ImageChops
+
+from webp_codec import encode_webp
+
+# Palette sizes tried, smallest first (WebP packs pixels at <=2/4/16 colours)
+PALETTE_SIZES = [2, 4, 8, 16, 32, 64, 128, 256]
+
+
+@dataclass
+class PaletteBounds:
+    """Maximum quantization error, in 8-bit levels per channel"""
+    mean_error: float = 1.0
+    p99_error: int = 12
+    max_error: int = 40
+
+
+@dataclass
+class PaletteResult:
+    """A palette version of an image that met the error bounds"""
+    image: Image.Image      # 'P' mode
+    mode: str               # 'RGB' or 'RGBA' - the mode of the source
+    colors: int
+    mean_error: float
+    p99_error: int
+    max_error: int
+
+
+def count_colors(img: Image.Image, limit: int = 65536) -> Optional[int]:
+    """Number of distinct colours, or None if there are more than `limit`"""
+    colors = img.getcolors(maxcolors=limit)
+    return len(colors) if colors is not None else None
+
+
+def _errors(source: Image.Image, candidate: Image.Image) -> List[float]:
+    """(mean, p99, max) absolute error, worst channel"""
+    difference = ImageChops.difference(source, candidate)
+    pixels = source.size[0] * source.size[1]
+    histograms = difference.histogram()
+    mean, p99, peak = 0.0, 0, 0
+    for band in range(len(difference.getbands())):
+        histogram = histograms[band * 256:(band + 1) * 256]
+        mean = max(mean, sum(level * count for level, count in enumerate(histogram)) / pixels)
+        peak = max(peak, max(level for level, count in enumerate(histogram) if count))
+
+        cutoff, seen = pixels * 0.99, 0
+        for level, count in enumerate(histogram):
+            seen += count
+            if seen >= cutoff:
+                p99 = max(p99, level)
+                break
+    return [mean, p99, peak]
+
+
+def _quantize(img: Image.Image, colors: int) -> Image.Image:
+    # Median cut only handles RGB; fast octree handles alpha
+    method = Image.Quantize.FASTOCTREE if img.mode == 'RGBA' else Image.Quantize.MEDIANCUT
+    return img.quantize(colors=colors, method=method, dither=Image.Dither.NONE)
+
+
+def quantize(img: Image.Image, bounds: Optional[PaletteBounds] = None,
+             max_colors: int = 256) -> Optional[PaletteResult]:
+    """
+    Smallest adaptive palette that stays within the error bounds.
+
+    Args:
+        img: Source image
+        bounds: Error bounds (default: PaletteBounds())
+        max_colors: Largest palette to consider (<= 256)
+
+    Returns:
+        PaletteResult, or None if even max_colors exceeds the bounds
+    """
+    bounds = bounds or PaletteBounds()
+    mode = 'RGBA' if img.mode in ('RGBA', 'LA', 'PA') or 'transparency' in img.info else 'RGB'
+    if img.mode != mode:
+        img = img.convert(mode)
+
+    sizes = [n for n in PALETTE_SIZES if n <= max_colors]
+    exact = count_colors(img, max_colors)
+    if exact is not None:
+        # Already few colours: the exact palette is the largest one worth trying
+        sizes = [n for n in sizes if n < exact] + [exact]
+
+    # Error shrinks as the palette grows: bisect for the smallest that passes
+    best = None
+    low, high = 0, len(sizes) - 1
+    while low <= high:
+        mid = (low + high) // 2
+        candidate = _quantize(img, sizes[mid])
+        mean, p99, peak = _errors(img, candidate.convert(mode))
+        if mean <= bounds.mean_error and p99 <= bounds.p99_error and peak <= bounds.max_error:
+            best = PaletteResult(candidate, mode, sizes[mid], mean, int(p99), int(peak))
+            high = mid - 1
+        else:
+            low = mid + 1
+    return best
+
+
+def encode_palette_webp(result: PaletteResult, method: int = 6) -> bytes:
+    """Lossless WebP of a palette result (libwebp applies its colour-indexing transform)"""
+    return encode_webp(result.image.convert(result.mode), quality=100, method=method,
+                       lossless=True)
+
+
+def encode_palette_png(result: PaletteResult) -> bytes:
+    """8-bit indexed PNG of a palette result"""
+    buffer = io.BytesIO()
+    result.image.save(buffer, 'PNG', optimize=True)
+    return buffer.getvalue()
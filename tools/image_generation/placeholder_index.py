@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+BlurHash placeholder index for SpiritAtlas drawables
+
+create_lqip.py writes a 32x32 WebP per drawable to drawable-lqip/, and each
+one costs a resource entry, a zip entry and a decode on the device. This
+script instead computes a BlurHash string (~20-30 characters) for every
+drawable and writes them all to one index:
+
+- placeholder_index.json - hash, source size and fingerprint per resource
+- ImagePlaceholders.kt   - Kotlin constants plus a name -> hash map, so the
+  app renders placeholders with no I/O
+
+Hashes are computed on a worker pool from the smallest density of each
+drawable. The JSON doubles as incremental state: a resource is re-hashed
+only when its source file or the hash settings change, and resources whose
+drawables were deleted are dropped.
+
+Transparent drawables are flattened onto PLACEHOLDER_BACKGROUND (BlurHash
+has no alpha) and flagged with "alpha": true in the JSON.
+
+Usage:
+    python placeholder_index.py [--jobs N] [--json PATH] [--kotlin PATH] [--force]
+"""
+
+import os
+import re
+import json
+import argparse
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from advanced_optimize import BASE_RES_PATH, DENSITIES
+from decode_pipeline import decode_source
+from generation_cache import file_sha256
+from webp_codec import map_largest_first
+
+INDEX_VERSION = 1
+INDEX_FILE = Path(__file__).parent / "placeholder_index.json"
+KOTLIN_PACKAGE = "com.spiritatlas.app.resources"
+KOTLIN_FILE = (BASE_RES_PATH.parent / "java" / Path(*KOTLIN_PACKAGE.split('.'))
+               / "ImagePlaceholders.kt")
+
+# Components along the longer side (the shorter side gets proportionally fewer)
+MAX_COMPONENTS = 4
+
+# Hashes are computed on an image no larger than this (BlurHash keeps only
+# a few cosine components, so more pixels add time, not detail)
+HASH_INPUT_SIZE = 32
+
+# Transparent pixels are flattened onto this colour, as optimize_for_android.py does
+PLACEHOLDER_BACKGROUND = (255, 255, 255)
+
+_BASE83 = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~"
+
+
+def _base83(value: int, length: int) -> str:
+    digits = []
+    for _ in range(length):
+        value, digit = divmod(value, 83)
+        digits.append(_BASE83[digit])
+    return "".join(reversed(digits))
+
+
+def _srgb_to_linear(pixels: np.ndarray) -> np.ndarray:
+    v = pixels / 255.0
+    return np.where(v <= 0.04045, v / 12.92, ((v + 0.055) / 1.055) ** 2.4)
+
+
+def _linear_to_srgb(value: float) -> int:
+    v = min(max(value, 0.0), 1.0)
+    if v <= 0.0031308:
+        return int(v * 12.92 * 255 + 0.5)
+    return int((1.055 * v ** (1 / 2.4) - 0.055) * 255 + 0.5)
+
+
+def components_for(size: Tuple[int, int], max_components: int = MAX_COMPONENTS) -> Tuple[int, int]:
+    """(x, y) component counts matching an image's aspect ratio"""
+    width, height = size
+    longest = max(width, height)
+    return (max(2, min(9, round(max_components * width / longest))),
+            max(2, min(9, round(max_components * height / longest))))
+
+
+def encode_blurhash(img: Image.Image, components: Optional[Tuple[int, int]] = None) -> str:
+    """
+    BlurHash of an image.
+
+    Args:
+        img: Source image (any mode, any size - reduced to HASH_INPUT_SIZE first)
+        components: (x, y) components, 1-9 each (default: components_for(img.size))
+
+    Returns:
+        BlurHash string
+    """
+    cx, cy = components or components_for(img.size)
+    if not (1 <= cx <= 9 and 1 <= cy <= 9):
+        raise ValueError(f"BlurHash components must be 1-9, got {cx}x{cy}")
+
+    if img.mode in ('RGBA', 'LA', 'PA') or 'transparency' in img.info:
+        img = img.convert('RGBA')
+        flat = Image.new('RGB', img.size, PLACEHOLDER_BACKGROUND)
+        flat.paste(img, mask=img.getchannel('A'))
+        img = flat
+    elif img.mode != 'RGB':
+        img = img.convert('RGB')
+    img = img.copy()
+    img.thumbnail((HASH_INPUT_SIZE, HASH_INPUT_SIZE), Image.Resampling.BOX, reducing_gap=2.0)
+
+    linear = _srgb_to_linear(np.asarray(img, dtype=np.float64))
+    height, width = linear.shape[:2]
+    basis_x = np.cos(np.pi * np.outer(np.arange(cx), np.arange(width)) / width)    # (cx, w)
+    basis_y = np.cos(np.pi * np.outer(np.arange(cy), np.arange(height)) / height)  # (cy, h)
+
+    # factors[j, i] = mean over pixels of basis_x[i] * basis_y[j] * colour
+    factors = np.einsum('jy,ix,yxc->jic', basis_y, basis_x, linear) / (width * height)
+    factors[1:, :] *= 2
+    factors[0, 1:] *= 2
+    factors = factors.reshape(cx * cy, 3)
+    dc, ac = factors[0], factors[1:]
+
+    parts = [_base83((cx - 1) + (cy - 1) * 9, 1)]
+    if len(ac):
+        quantised_max = int(max(0, min(82, np.floor(np.abs(ac).max() * 166 - 0.5))))
+        maximum = (quantised_max + 1) / 166
+    else:
+        quantised_max, maximum = 0, 1.0
+    parts.append(_base83(quantised_max, 1))
+
+    r, g, b = (_linear_to_srgb(channel) for channel in dc)
+    parts.append(_base83((r << 16) + (g << 8) + b, 4))
+
+    scaled = np.sign(ac) * np.sqrt(np.abs(ac / maximum))
+    quantised = np.clip(np.floor(scaled * 9 + 9.5), 0, 18).astype(int)
+    for qr, qg, qb in quantised:
+        parts.append(_base83(qr * 19 * 19 + qg * 19 + qb, 2))
+    return "".join(parts)
+
+
+def _settings() -> Dict[str, Any]:
+    """Everything besides the source bytes that changes a hash"""
+    return {'max_components': MAX_COMPONENTS, 'input_size': HASH_INPUT_SIZE,
+            'background': list(PLACEHOLDER_BACKGROUND)}
+
+
+def find_sources(res_dir: Path = BASE_RES_PATH) -> Dict[str, Path]:
+    """Resource name -> smallest-density drawable of that name"""
+    sources: Dict[str, Path] = {}
+    for density in DENSITIES:
+        drawable_dir = res_dir / f"drawable-{density}"
+        if not drawable_dir.exists():
+            continue
+        for webp_file in sorted(drawable_dir.glob("*.webp")):
+            sources.setdefault(webp_file.stem, webp_file)
+    return sources
+
+
+def hash_source(path: Path) -> Dict[str, Any]:
+    """Index entry for one drawable"""
+    source = decode_source(path)
+    img = source.image
+    return {
+        'blurhash': encode_blurhash(img),
+        'width': img.size[0],
+        'height': img.size[1],
+        'alpha': img.mode in ('RGBA', 'LA', 'PA') or 'transparency' in img.info,
+        'source': f"{path.parent.name}/{path.name}",
+        'sha256': file_sha256(path),
+    }
+
+
+class PlaceholderIndex:
+    """placeholder_index.json: BlurHash per resource name"""
+
+    def __init__(self, path: Path = INDEX_FILE):
+        self.path = Path(path)
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        if self.path.exists():
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            # Entries made with other settings are stale
+            if data.get('version') == INDEX_VERSION and data.get('settings') == _settings():
+                self.entries = data.get('placeholders', {})
+
+    def is_current(self, name: str, path: Path) -> bool:
+        entry = self.entries.get(name)
+        return (entry is not None and entry['source'] == f"{path.parent.name}/{path.name}"
+                and entry['sha256'] == file_sha256(path))
+
+    def save(self):
+        temp_file = self.path.with_suffix('.json.tmp')
+        with open(temp_file, 'w') as f:
+            json.dump({'version': INDEX_VERSION, 'settings': _settings(),
+                       'placeholders': self.entries}, f, indent=2, sort_keys=True)
+        os.replace(temp_file, self.path)
+
+
+def kotlin_source(entries: Dict[str, Dict[str, Any]], package: str = KOTLIN_PACKAGE) -> str:
+    """ImagePlaceholders.kt for the index entries"""
+    def constant(name: str) -> str:
+        return re.sub(r'\W', '_', name).upper()
+
+    def literal(text: str) -> str:
+        return '"' + text.replace('\\', '\\\\').replace('"', '\\"').replace('$', '\\$') + '"'
+
+    names = sorted(entries)
+    lines = [
+        "// Generated by tools/image_generation/placeholder_index.py - do not edit.",
+        f"package {package}",
+        "",
+        "/**",
+        " * BlurHash placeholders for drawables, keyed by resource name.",
+        " * Decode at a small size (e.g. 32 px) and scale up while the drawable loads.",
+        " */",
+        "object ImagePlaceholders {",
+    ]
+    lines += [f"    const val {constant(name)} = {literal(entries[name]['blurhash'])}" for name in names]
+    lines += ["", "    val byResourceName: Map<String, String> = mapOf("]
+    lines += [f"        {literal(name)} to {constant(name)}," for name in names]
+    lines += ["    )", "}", ""]
+    return "\n".join(lines)
+
+
+def write_kotlin(entries: Dict[str, Dict[str, Any]], path: Path = KOTLIN_FILE) -> bool:
+    """Write ImagePlaceholders.kt; returns False if it was already up to date"""
+    source = kotlin_source(entries)
+    if path.exists() and path.read_text() == source:
+        return False
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_file = path.with_name(path.name + ".tmp")
+    temp_file.write_text(source)
+    os.replace(temp_file, path)
+    return True
+
+
+def build_index(index: PlaceholderIndex, sources: Dict[str, Path], force: bool = False,
+                jobs: Optional[int] = None) -> Tuple[int, int, int]:
+    """
+    Bring the index up to date with the drawables.
+
+    Returns:
+        (hashed, unchanged, removed)
+    """
+    removed = sorted(set(index.entries) - set(sources))
+    for name in removed:
+        del index.entries[name]
+        print(f"  - {name} (drawable removed)")
+
+    todo: List[Tuple[str, Path]] = [(name, path) for name, path in sorted(sources.items())
+                                    if force or not index.is_current(name, path)]
+    hashed = 0
+    for (name, path), result in map_largest_first(lambda item: hash_source(item[1]), todo,
+                                                  lambda item: item[1].stat().st_size,
+                                                  max_workers=jobs):
+        if isinstance(result, Exception):
+            print(f"  ✗ {name:50s} | {result}")
+            continue
+        index.entries[name] = result
+        hashed += 1
+        print(f"  ✓ {name:50s} | {result['blurhash']}")
+    return hashed, len(sources) - len(todo), len(removed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the BlurHash placeholder index')
+    parser.add_argument('--res', type=Path, default=BASE_RES_PATH,
+                        help='Android res directory (default: app res)')
+    parser.add_argument('--json', type=Path, default=INDEX_FILE,
+                        help=f'Index file (default: {INDEX_FILE.name})')
+    parser.add_argument('--kotlin', type=Path, default=KOTLIN_FILE,
+                        help='Generated Kotlin source (default: app resources package)')
+    parser.add_argument('--force', action='store_true',
+                        help='Re-hash every drawable')
+    parser.add_argument('--jobs', '-j', type=int, default=None,
+                        help='Parallel workers (default: all CPU cores)')
+    args = parser.parse_args()
+
+    print("🌫️  PLACEHOLDER INDEX (BlurHash)")
+    print("=" * 80)
+
+    sources = find_sources(args.res)
+    print(f"Drawables: {len(sources)}")
+
+    index = PlaceholderIndex(args.json)
+    try:
+        hashed, unchanged, removed = build_index(index, sources, args.force, args.jobs)
+    finally:
+        index.save()
+    kotlin_changed = write_kotlin(index.entries, args.kotlin)
+
+    total = sum(len(entry['blurhash']) for entry in index.entries.values())
+    print("\n" + "=" * 80)
+    print(f"Hashed: {hashed} | Unchanged: {unchanged} | Removed: {removed}")
+    print(f"Index: {len(index.entries)} placeholders, {total / 1024:.1f} KB of hash strings")
+    print(f"✓ {args.json}")
+    print(f"{'✓' if kotlin_changed else '='} {args.kotlin}{'' if kotlin_changed else ' (unchanged)'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Per-asset WebP quality search for SpiritAtlas
+
+The optimizers used to pick one fixed quality per image class, which spends
+too many bytes on flat art and too few on busy backgrounds. search_quality()
+binary-searches the encoder quality for the smallest WebP that still scores at
+least a target SSIM against the source pixels.
+
+- ssim() is a NumPy-vectorized tiled SSIM: 8x8 tile statistics come from one
+  reshape per tile grid (two half-tile-offset grids, so block edges are not
+  blind spots), computed on luma with colours premultiplied by alpha; for
+  transparent images the alpha plane is scored too and the worse of the two
+  counts.
+- QualityCache remembers the chosen quality per asset and density, keyed by a
+  fingerprint of the source pixels and encode settings, so later runs encode
+  once instead of searching. It is a ManifestJournal, so worker processes can
+  append to it concurrently.
+
+Usage:
+    from quality_search import QualityCache, search_quality
+
+    cache = QualityCache(res_dir / ".quality_cache.json")
+    choice, data = search_quality(img, target=0.985, max_quality=90, method=6,
+                                  cache=cache, cache_key="xhdpi/img_012")
+    cache.close()
+"""
+
+import io
+import json
+import hashlib
+from pathlib import Path
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from manifest_journal import ManifestJournal
+from webp_codec import encode_webp
+
+# Default score an encode must reach (mean tiled SSIM, 1.0 = identical)
+DEFAULT_TARGET_SSIM = 0.985
+
+# Never search below this quality
+MIN_QUALITY = 50
+
+QUALITY_CACHE_FILENAME = ".quality_cache.json"
+
+# SSIM stabilizers for 8-bit data (K1=0.01, K2=0.03)
+_C1 = (0.01 * 255) ** 2
+_C2 = (0.03 * 255) ** 2
+
+
+@dataclass
+class QualityChoice:
+    """Result of a quality search"""
+    quality: int
+    score: float
+    size: int
+    probes: int = 0       # Encodes performed (0 on a cache hit)
+    cached: bool = False
+
+
+def _planes(img: Image.Image) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """Luma plane (colours premultiplied by alpha) and alpha plane (None if opaque)"""
+    if img.mode not in ('RGB', 'RGBA'):
+        img = img.convert('RGBA' if 'A' in img.getbands() or 'transparency' in img.info else 'RGB')
+    pixels = np.asarray(img, dtype=np.float64)
+
+    alpha = None
+    rgb = pixels[..., :3]
+    if pixels.shape[-1] == 4:
+        alpha = pixels[..., 3]
+        rgb = rgb * (alpha[..., None] / 255.0)
+
+    luma = rgb @ np.array([0.299, 0.587, 0.114])
+    return luma, alpha
+
+
+def _tile_ssim(x: np.ndarray, y: np.ndarray, tile: int) -> float:
+    """Mean SSIM over non-overlapping tile x tile windows of two planes"""
+    rows, cols = x.shape[0] // tile, x.shape[1] // tile
+    if rows == 0 or cols == 0:
+        # Smaller than one tile: score the whole plane as a single window
+        tile = min(x.shape)
+        rows, cols = 1, 1
+        x, y = x[:tile, :tile], y[:tile, :tile]
+
+    shape = (rows, tile, cols, tile)
+    x = x[:rows * tile, :cols * tile].reshape(shape)
+    y = y[:rows * tile, :cols * tile].reshape(shape)
+
+    mu_x = x.mean(axis=(1, 3))
+    mu_y = y.mean(axis=(1, 3))
+    var_x = x.var(axis=(1, 3))
+    var_y = y.var(axis=(1, 3))
+    cov = (x * y).mean(axis=(1, 3)) - mu_x * mu_y
+
+    ssim_map = ((2 * mu_x * mu_y + _C1) * (2 * cov + _C2)) / \
+               ((mu_x ** 2 + mu_y ** 2 + _C1) * (var_x + var_y + _C2))
+    return float(ssim_map.mean())
+
+
+def _plane_ssim(x: np.ndarray, y: np.ndarray, tile: int) -> float:
+    half = tile // 2
+    scores = [_tile_ssim(x, y, tile)]
+    if half and min(x.shape) > tile + half:
+        scores.append(_tile_ssim(x[half:, half:], y[half:, half:], tile))
+    return sum(scores) / len(scores)
+
+
+def ssim(reference: Image.Image, candidate: Image.Image, tile: int = 8) -> float:
+    """
+    Tiled SSIM between two images of the same size.
+
+    Args:
+        reference: Source image
+        candidate: Decoded encode of the source
+        tile: Window size in pixels
+
+    Returns:
+        Mean SSIM in [-1, 1]; the worse of luma and alpha for transparent images
+    """
+    if reference.size != candidate.size:
+        raise ValueError(f"size mismatch: {reference.size} vs {candidate.size}")
+
+    ref_luma, ref_alpha = _planes(reference)
+    cand_luma, cand_alpha = _planes(candidate)
+
+    score = _plane_ssim(ref_luma, cand_luma, tile)
+    if ref_alpha is not None:
+        if cand_alpha is None:
+            cand_alpha = np.full_like(ref_alpha, 255.0)
+        score = min(score, _plane_ssim(ref_alpha, cand_alpha, tile))
+    return score
+
+
+def source_fingerprint(img: Image.Image, **settings) -> str:
+    """Hash of the source pixels plus every setting that affects the search result"""
+    digest = hashlib.sha256()
+    digest.update(f"{img.mode}:{img.size}".encode('utf-8'))
+    digest.update(img.tobytes())
+    digest.update(json.dumps(settings, sort_keys=True, default=str).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class QualityCache:
+    """
+    Chosen quality per asset (e.g. "xhdpi/img_012_dark_background").
+
+    Entries are appended to a journal as they are found; compact() folds them
+    into the JSON file, keeping the newest entry per asset.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._journal = ManifestJournal(self.path)
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        for entry in self._journal.entries():
+            self._entries[entry['asset']] = entry
+
+    def get(self, asset: str, fingerprint: str) -> Optional[QualityChoice]:
+        """Cached choice for an asset, if its source and settings are unchanged"""
+        entry = self._entries.get(asset)
+        if not entry or entry.get('fingerprint') != fingerprint:
+            return None
+        return QualityChoice(quality=entry['quality'], score=entry['score'], size=entry['size'],
+                             cached=True)
+
+    def put(self, asset: str, fingerprint: str, choice: QualityChoice):
+        entry = {'asset': asset, 'fingerprint': fingerprint, 'quality': choice.quality,
+                 'score': round(choice.score, 5), 'size': choice.size}
+        self._entries[asset] = entry
+        self._journal.append(entry)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def compact(self):
+        """Rewrite the cache file with one (the newest) entry per asset."""
+        def newest_per_asset(entries):
+            latest = {entry['asset']: entry for entry in entries}
+            return sorted(latest.values(), key=lambda entry: entry['asset'])
+
+        self._entries = {entry['asset']: entry
+                         for entry in self._journal.compact(transform=newest_per_asset)}
+
+    def close(self):
+        self._journal.close()
+
+
+def encoded_ssim(img: Image.Image, data: bytes) -> float:
+    """SSIM of an encoded WebP against the image it was encoded from"""
+    with Image.open(io.BytesIO(data)) as decoded:
+        decoded.load()
+        if decoded.mode != img.mode:
+            decoded = decoded.convert(img.mode)
+        return ssim(img, decoded)
+
+
+def search_quality(
+    img: Image.Image,
+    target: float = DEFAULT_TARGET_SSIM,
+    min_quality: int = MIN_QUALITY,
+    max_quality: int = 95,
+    cache: Optional[QualityCache] = None,
+    cache_key: Optional[str] = None,
+    **encode_options
+) -> Tuple[QualityChoice, bytes]:
+    """
+    Find the lowest WebP quality whose encode scores at least `target` SSIM.
+
+    Assumes the score is monotonic in quality and bisects [min_quality,
+    max_quality] - about six encodes for the default range. If even
+    max_quality misses the target, max_quality is used (never more bytes than
+    the fixed-quality setting it replaces).
+
+    Args:
+        img: Image to encode (RGB or RGBA)
+        target: Minimum SSIM
+        min_quality: Lowest quality to consider
+        max_quality: Highest quality to consider (the class's fixed quality)
+        cache: Per-asset cache of earlier searches
+        cache_key: Asset name in the cache (required to use the cache)
+        **encode_options: Other encode_webp() options (method, alpha_quality, ...)
+
+    Returns:
+        (choice, encoded WebP bytes)
+    """
+    encode_options.pop('quality', None)
+    encode_options.pop('lossless', None)
+    min_quality = max(0, min(min_quality, max_quality))
+
+    fingerprint = None
+    if cache is not None and cache_key:
+        fingerprint = source_fingerprint(img, target=target, min_quality=min_quality,
+                                         max_quality=max_quality, **encode_options)
+        hit = cache.get(cache_key, fingerprint)
+        if hit is not None:
+            data = encode_webp(img, quality=hit.quality, **encode_options)
+            hit.size = len(data)
+            return hit, data
+
+    probes = 0
+    results: Dict[int, Tuple[float, bytes]] = {}
+
+    def probe(quality: int) -> float:
+        nonlocal probes
+        if quality not in results:
+            data = encode_webp(img, quality=quality, **encode_options)
+            results[quality] = (encoded_ssim(img, data), data)
+            probes += 1
+        return results[quality][0]
+
+    # Invariant: best passes (or is max_quality), everything below low fails
+    low, best = min_quality, max_quality
+    high = max_quality - 1
+    if probe(max_quality) < target:
+        high = low - 1  # Monotonic: no lower quality can pass either
+    while low <= high:
+        mid = (low + high) // 2
+        if probe(mid) >= target:
+            best = mid
+            high = mid - 1
+        else:
+            low = mid + 1
+
+    score, data = results[best]
+    choice = QualityChoice(quality=best, score=score, size=len(data), probes=probes)
+    if fingerprint is not None:
+        cache.put(cache_key, fingerprint, choice)
+    return choice, data
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Persisted fal.ai request IDs for resumable queue-mode batches
+
+fal_client.subscribe() blocks until a result is ready, so a batch that dies
+mid-run (laptop sleep, CI timeout) loses every request that was in flight or
+finished but not yet downloaded - and the re-run pays for them again. In queue
+mode (FalImageGenerator.generate_many_async(request_store=...)) each job is
+submitted to the fal queue and its request ID is recorded here under the
+job's prompt hash (GenerationCache.make_key) before the result is awaited:
+
+    submitted   -> request accepted; a restarted run polls it instead of resubmitting
+    completed   -> result JSON stored; a restarted run downloads it without an API call
+    downloaded  -> files saved; a restarted run reuses them if they still exist
+    failed      -> the request errored; the next run submits it again
+
+Records are appended to a JSON-lines journal (see manifest_journal.py), so a
+crash loses at most the line being written; the latest record per key wins.
+
+Usage:
+    from request_store import RequestStore
+
+    with RequestStore() as store:
+        async for outcome in generator.generate_many_async(jobs, request_store=store):
+            ...
+"""
+
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from manifest_journal import ManifestJournal
+
+DEFAULT_STATE_FILE = Path(__file__).parent / ".fal_requests.json"
+
+SUBMITTED = "submitted"
+COMPLETED = "completed"
+DOWNLOADED = "downloaded"
+FAILED = "failed"
+
+
+def _latest_per_key(entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    latest: Dict[str, Dict[str, Any]] = {}
+    for entry in entries:
+        latest[entry["key"]] = entry
+    return list(latest.values())
+
+
+class RequestStore:
+    """
+    Latest queue state per request key, backed by an append-only journal.
+    """
+
+    def __init__(self, path: Optional[Path] = None, reset: bool = False):
+        """
+        Args:
+            path: Compacted state file (default: tools/image_generation/.fal_requests.json);
+                the journal lives next to it
+            reset: Forget every recorded request
+        """
+        self.path = Path(path) if path else DEFAULT_STATE_FILE
+        self._journal = ManifestJournal(self.path, fsync_every=1, reset=reset)
+        self._records: Dict[str, Dict[str, Any]] = {
+            entry["key"]: entry for entry in _latest_per_key(self._journal.entries())
+        }
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Latest record for a request key, if any."""
+        return self._records.get(key)
+
+    def record(self, key: str, state: str, **fields: Any) -> Dict[str, Any]:
+        """
+        Record a state change (fsynced before returning).
+
+        Fields of the previous record (request_id, model, result, ...) carry
+        over unless overridden.
+        """
+        entry = dict(self._records.get(key, {}), **fields)
+        entry.update(key=key, state=state, updated=time.time())
+        self._records[key] = entry
+        self._journal.append(entry)
+        return entry
+
+    def pending(self) -> List[Dict[str, Any]]:
+        """Records still waiting in the fal queue."""
+        return [entry for entry in self._records.values() if entry["state"] == SUBMITTED]
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def compact(self):
+        """Fold the journal into the state file, keeping one record per key."""
+        self._journal.compact(_latest_per_key)
+
+    def close(self):
+        self._journal.close()
+
+    def __enter__(self) -> "RequestStore":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.compact()
+        finally:
+            self.close()
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Shared retry policy and circuit breaker for SpiritAtlas generation and downloads
+
+generate_with_fal(), generate_with_replicate() and FalImageGenerator.generate()
+gave up on the first exception, so one transient 503 or dropped connection
+lost the image until someone re-ran the script. RetryPolicy retries only
+errors that can succeed on a second try:
+
+- HTTP 408, 425, 429 and 5xx responses
+- timeouts and connection/transport errors (requests, httpx, builtin)
+
+Anything else (bad prompt, auth, 4xx, file errors) is raised at once. Waits
+use full-jitter exponential backoff (uniform in [0, base * 2^(attempt-1)],
+capped at max_delay) so retrying workers don't stampede together, and a
+Retry-After header from the provider is honoured.
+
+A CircuitBreaker shared by every worker pauses the whole batch once the
+provider fails repeatedly: after failure_threshold consecutive retryable
+failures, callers wait reset_timeout seconds, then a single probe request
+decides whether to resume or pause again.
+
+Retries are idempotent with respect to outputs: a request is only repeated
+when it raised (no result was handed back), downloads stream to a temp file
+that is renamed into place only when complete, and callers record caches and
+manifests after the final successful attempt.
+
+Usage:
+    from retry_policy import RetryPolicy, CircuitBreaker
+
+    retry = RetryPolicy(max_attempts=4, breaker=CircuitBreaker())
+    result = retry.call(lambda: fal_client.subscribe(model, arguments=args), "img_012")
+    result = await retry.call_async(lambda: fal_client.subscribe_async(model, arguments=args))
+"""
+
+import time
+import random
+import asyncio
+import threading
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from concurrency_control import http_status
+
+T = TypeVar('T')
+
+RETRYABLE_STATUS = {408, 425, 429}
+
+# Exception class names (anywhere in the MRO) that mean the request never got
+# an answer: builtin/requests ConnectionError, requests Timeout, httpx TransportError
+_TRANSIENT_CLASS_NAMES = {'ConnectionError', 'Timeout', 'TimeoutError', 'TransportError',
+                          'TimeoutException', 'ChunkedEncodingError'}
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+def is_retryable(error: BaseException) -> bool:
+    """True for errors that may succeed if the same request is sent again."""
+    status = http_status(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS or 500 <= status < 600
+    if isinstance(error, asyncio.TimeoutError):
+        return True
+    return any(cls.__name__ in _TRANSIENT_CLASS_NAMES for cls in type(error).__mro__)
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """Seconds from a Retry-After header on the error's response, if present."""
+    headers = getattr(error, 'response_headers', None)
+    if headers is None:
+        headers = getattr(getattr(error, 'response', None), 'headers', None)
+    if not headers:
+        return None
+    try:
+        return max(0.0, float(headers.get('retry-after') or headers.get('Retry-After')))
+    except (TypeError, ValueError):
+        return None  # Missing, or an HTTP date
+
+
+class CircuitBreaker:
+    """
+    Pauses every caller while the provider is failing.
+
+    closed    -> calls pass; consecutive retryable failures are counted
+    open      -> calls wait until reset_timeout has passed since opening
+    half-open -> one probe call passes, the rest wait for its outcome
+
+    Thread-safe; asyncio callers use wait_async() from one loop.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 on_state_change: Optional[Callable[[str, str], None]] = None):
+        """
+        Args:
+            failure_threshold: Consecutive retryable failures that open the circuit
+            reset_timeout: Seconds to pause before probing the provider again
+            on_state_change: Called with (old state, new state)
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.on_state_change = on_state_change
+        self.state = CLOSED
+        self.failures = 0
+        self.opened = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._condition = threading.Condition()
+
+    def _set_state(self, state: str):
+        if state != self.state:
+            old, self.state = self.state, state
+            if state == OPEN:
+                self.opened += 1
+                self._opened_at = time.monotonic()
+            if self.on_state_change:
+                self.on_state_change(old, state)
+            self._condition.notify_all()
+
+    def _try_pass(self) -> float:
+        """0 if the caller may go now, else seconds to wait before checking again"""
+        with self._condition:
+            if self.state == CLOSED:
+                return 0.0
+            if self.state == OPEN:
+                remaining = self._opened_at + self.reset_timeout - time.monotonic()
+                if remaining > 0:
+                    return remaining
+                self._set_state(HALF_OPEN)
+            if self._probe_in_flight:
+                return self.reset_timeout
+            self._probe_in_flight = True
+            return 0.0
+
+    def wait(self):
+        """Block while the circuit is open (or another caller is probing)."""
+        while True:
+            delay = self._try_pass()
+            if not delay:
+                return
+            with self._condition:
+                self._condition.wait(timeout=delay)
+
+    async def wait_async(self):
+        """wait() without blocking the event loop"""
+        while True:
+            delay = self._try_pass()
+            if not delay:
+                return
+            await asyncio.sleep(min(delay, 1.0))
+
+    def record_success(self):
+        """The provider answered (including non-retryable errors such as a bad prompt)."""
+        with self._condition:
+            self.failures = 0
+            self._probe_in_flight = False
+            self._set_state(CLOSED)
+
+    def cancel_probe(self):
+        """The caller holding the probe gave up without an outcome (e.g. was cancelled)."""
+        with self._condition:
+            if self._probe_in_flight:
+                self._probe_in_flight = False
+                self._condition.notify_all()
+
+    def record_failure(self):
+        """A retryable failure: counts towards opening, re-opens after a failed probe."""
+        with self._condition:
+            self.failures += 1
+            if self.state == HALF_OPEN:
+                self._probe_in_flight = False
+                self._set_state(OPEN)
+            elif self.failures >= self.failure_threshold:
+                self._set_state(OPEN)
+
+
+@dataclass
+class RetryPolicy:
+    """Retry schedule for one kind of request"""
+    max_attempts: int = 4        # Including the first try
+    base_delay: float = 2.0      # Backoff ceiling for the first retry (seconds)
+    max_delay: float = 60.0
+    breaker: Optional[CircuitBreaker] = None
+    verbose: bool = True         # Print each retry
+
+    def delay(self, attempt: int, error: Optional[BaseException] = None) -> float:
+        """Seconds to wait after failed attempt number `attempt` (1-based)."""
+        ceiling = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        wait = random.uniform(0, ceiling)
+        hinted = retry_after(error) if error is not None else None
+        if hinted is not None:
+            wait = max(wait, min(hinted, self.max_delay))
+        return wait
+
+    def _failed(self, error: Exception, attempt: int, describe: str) -> float:
+        """Record a failure; re-raises when out of attempts, else returns the delay."""
+        retryable = is_retryable(error)
+        if self.breaker is not None:
+            if retryable:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+        if not retryable or attempt >= self.max_attempts:
+            raise error
+        wait = self.delay(attempt, error)
+        if self.verbose:
+            print(f"    ↻ {describe or 'request'}: {error} - retry {attempt}/{self.max_attempts - 1} "
+                  f"in {wait:.1f}s")
+        return wait
+
+    def call(self, fn: Callable[[], T], describe: str = "") -> T:
+        """
+        Run fn() until it succeeds, fails with a non-retryable error, or runs
+        out of attempts (the last error is raised).
+
+        Args:
+            fn: Zero-argument callable that performs the whole request
+            describe: Label for retry messages
+        """
+        attempt = 0
+        while True:
+            attempt += 1
+            if self.breaker is not None:
+                self.breaker.wait()
+            try:
+                result = fn()
+            except Exception as e:
+                time.sleep(self._failed(e, attempt, describe))
+                continue
+            if self.breaker is not None:
+                self.breaker.record_success()
+            return result
+
+    async def call_async(self, fn: Callable[[], Awaitable[T]], describe: str = "") -> T:
+        """call() for coroutines; fn must create a new awaitable on every call."""
+        attempt = 0
+        while True:
+            attempt += 1
+            if self.breaker is not None:
+                await self.breaker.wait_async()
+            try:
+                result = await fn()
+            except asyncio.CancelledError:
+                if self.breaker is not None:
+                    self.breaker.cancel_probe()
+                raise
+            except Exception as e:
+                await asyncio.sleep(self._failed(e, attempt, describe))
+                continue
+            if self.breaker is not None:
+                self.breaker.record_success()
+            return result
+
+
+# Single attempt, for callers that were not given a policy
+NO_RETRY = RetryPolicy(max_attempts=1, verbose=False)
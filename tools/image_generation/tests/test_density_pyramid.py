@@ -0,0 +1,28 @@
+"""DensityPyramid stays within PYRAMID_TOLERANCE of direct resizes"""
+
+import os
+
+from PIL import Image
+
+from optimize_for_android import (DensityPyramid, ImageCategory, ImageOptimizer,
+                                  OptimizationConfig, PYRAMID_TOLERANCE)
+
+
+def test_pyramid_matches_direct_resize(tmp_path):
+    # Random noise is the worst case for resampling from an intermediate level
+    size = (1408, 1920)
+    img = Image.frombytes("RGB", size, os.urandom(size[0] * size[1] * 3))
+    optimizer = ImageOptimizer(tmp_path, tmp_path, dry_run=True)
+
+    pyramid = optimizer.build_pyramid(img, OptimizationConfig(category=ImageCategory.BACKGROUND))
+
+    derived = [level for level in pyramid._intermediates if pyramid._parent(level) != size]
+    assert derived, "no level was derived from an intermediate"
+    assert pyramid.max_error() <= PYRAMID_TOLERANCE
+
+
+def test_pyramid_parent_is_independent_of_request_order():
+    img = Image.new("RGB", (1408, 1920))
+    sizes = [(938, 1280), (704, 960), (469, 640)]
+    forward, backward = DensityPyramid(img, sizes), DensityPyramid(img, list(reversed(sizes)))
+    assert [forward._parent(s) for s in sizes] == [backward._parent(s) for s in sizes]
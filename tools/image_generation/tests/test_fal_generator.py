@@ -0,0 +1,73 @@
+"""FalImageGenerator batch behaviour (fal_client calls are monkeypatched)"""
+
+import random
+
+import fal_client
+
+from fal_generator import FalImageGenerator
+from generation_cache import GenerationCache
+from request_store import RequestStore, SUBMITTED
+from retry_policy import RetryPolicy
+
+
+def test_malformed_job_fails_alone(monkeypatch):
+    async def subscribe_async(model, arguments, on_queue_update=None):
+        return {"images": []}
+
+    monkeypatch.setattr(fal_client, "subscribe_async", subscribe_async)
+    generator = FalImageGenerator("test-key")
+
+    outcomes = generator.generate_many(
+        [{"prompt": "a"}, {"id": "bad"}, {"prompt": "c"}], on_result=lambda outcome: None
+    )
+
+    by_id = {outcome.job_id: outcome for outcome in outcomes}
+    assert by_id["0"].success and by_id["2"].success
+    assert isinstance(by_id["bad"].error, TypeError)
+
+
+def test_queue_mode_reattach_offline_keeps_request(monkeypatch, tmp_path):
+    submitted = []
+
+    async def submit_async(model, arguments):
+        submitted.append(arguments["prompt"])
+
+    async def status_async(model, request_id, with_logs=False):
+        raise ConnectionError("offline")
+
+    monkeypatch.setattr(fal_client, "submit_async", submit_async)
+    monkeypatch.setattr(fal_client, "status_async", status_async)
+    generator = FalImageGenerator("test-key", retry=RetryPolicy(max_attempts=1))
+    model = FalImageGenerator.MODEL_FLUX_PRO
+    store = RequestStore(tmp_path / "requests.json")
+    key = GenerationCache.make_key("a", model)
+    store.record(key, SUBMITTED, request_id="req-a", model=model)
+
+    outcomes = generator.generate_many([{"prompt": "a"}], on_result=lambda outcome: None,
+                                       request_store=store)
+
+    assert isinstance(outcomes[0].error, ConnectionError)
+    assert submitted == []
+    assert store.get(key)["state"] == SUBMITTED
+    store.close()
+
+
+def test_timeout_applies_per_request_not_to_retry_backoff(monkeypatch):
+    calls = []
+
+    async def subscribe_async(model, arguments, on_queue_update=None):
+        calls.append(arguments["prompt"])
+        if len(calls) == 1:
+            raise fal_client.FalClientHTTPError("unavailable", 503, {}, None)
+        return {"images": []}
+
+    monkeypatch.setattr(fal_client, "subscribe_async", subscribe_async)
+    monkeypatch.setattr(random, "uniform", lambda low, high: high)  # Full backoff
+    generator = FalImageGenerator("test-key", retry=RetryPolicy(base_delay=0.3, verbose=False))
+
+    # The backoff before the retry is longer than the timeout of either request
+    outcomes = generator.generate_many([{"prompt": "a"}], on_result=lambda outcome: None,
+                                       timeout=0.2)
+
+    assert outcomes[0].success, outcomes[0].error
+    assert calls == ["a", "a"]
@@ -0,0 +1,27 @@
+"""generate_asset() result handling (provider calls are monkeypatched)"""
+
+import generate_images
+
+
+class BrokenDedupe:
+    def find(self, path):
+        raise OSError("cannot identify image file")
+
+
+def fake_download(url, output_path, retry=None):
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    output_path.write_bytes(b"png")
+    return True
+
+
+def test_dedupe_error_keeps_success(monkeypatch, tmp_path):
+    monkeypatch.setattr(generate_images, "generate_with_fal", lambda *args: "https://cdn/x.png")
+    monkeypatch.setattr(generate_images, "download_image", fake_download)
+
+    result = generate_images.generate_asset(
+        "lotus", {"prompt": "lotus", "category": "symbols"}, "fal", "key", tmp_path, 1, 1,
+        dedupe=BrokenDedupe()
+    )
+
+    assert result['success'] and not result['skipped']
+    assert "cannot identify" in result['dedupe_error']
@@ -0,0 +1,47 @@
+"""GenerationCache index updates are journaled, not rewritten per image"""
+
+import json
+
+from generation_cache import GenerationCache
+
+
+def _image(path, data):
+    path.write_bytes(data)
+    return path
+
+
+def test_two_caches_sharing_a_root_keep_each_others_entries(tmp_path):
+    root = tmp_path / "cache"
+    first, second = GenerationCache(root), GenerationCache(root)
+
+    first.put("a", _image(tmp_path / "a.png", b"aaa"), prompt="a")
+    second.put("b", _image(tmp_path / "b.png", b"bbb"), prompt="b")
+    assert not (root / "index.json").exists()  # Nothing rewritten per put
+
+    first.compact()
+    second.compact()
+    first.close()
+    second.close()
+
+    with GenerationCache(root) as reopened:
+        assert reopened.get("a") is not None and reopened.get("b") is not None
+        assert reopened.restore("a", tmp_path / "copy.png")
+    assert (tmp_path / "copy.png").read_bytes() == b"aaa"
+    assert (root / "index.journal.jsonl").stat().st_size == 0
+
+
+def test_legacy_index_is_upgraded(tmp_path):
+    root = tmp_path / "cache"
+    with GenerationCache(root) as cache:
+        cache.put("a", _image(tmp_path / "a.png", b"aaa"))
+        blob = cache.get("a").relative_to(root)
+
+    (root / "index.json").write_text(json.dumps({
+        "version": 1,
+        "entries": {"a": {"blob": str(blob), "sha256": "x", "size_bytes": 3}},
+        "outputs": {str((tmp_path / "a.png").resolve()): "a"},
+    }))
+    cache = GenerationCache(root)
+    assert cache.get("a") == root / blob
+    assert cache.key_for_output(tmp_path / "a.png") == "a"
+    cache.close()
@@ -0,0 +1,37 @@
+"""Malformed headers must surface as ValueError, never struct.error"""
+
+from PIL import Image
+
+from image_probe import ProbeCache, read_image_header
+from optimize_for_android import create_resource_mapping
+
+
+def _truncated_png(path, size=10):
+    Image.new('RGBA', (8, 8)).save(path)
+    path.write_bytes(path.read_bytes()[:size])
+
+
+def test_truncated_png_raises_value_error(tmp_path):
+    for size in (10, 16, 20):
+        path = tmp_path / f"cut_{size}.png"
+        _truncated_png(path, size)
+        try:
+            read_image_header(path)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError(f"{size}-byte PNG was accepted")
+
+    results = ProbeCache().probe_all([tmp_path / "cut_10.png"])
+    assert isinstance(results[tmp_path / "cut_10.png"], ValueError)
+
+
+def test_resource_mapping_skips_unreadable_drawable(tmp_path):
+    drawable = tmp_path / "drawable-mdpi"
+    drawable.mkdir()
+    Image.new('RGB', (4, 3)).save(drawable / "good.webp", lossless=True)
+    (drawable / "bad.webp").write_bytes(b"RIFF\x20\x00\x00\x00WEBPVP8L\x05\x00")
+
+    entries = {e['name']: e for e in create_resource_mapping(tmp_path)['mdpi']}
+    assert entries['good']['dimensions'] == [4, 3]
+    assert entries['bad']['dimensions'] is None
@@ -0,0 +1,25 @@
+"""Manifest entries written by the batch scripts charge nothing for cache restores"""
+
+import importlib
+from pathlib import Path
+
+from batch_runner import JobResult
+
+COST_FIELDS = {
+    "generate_optimized": "cost",
+    "generate_hero_backgrounds": "cost",
+    "generate_flux_pro_quick": "cost",
+    "generate_additional_100-119": "estimated_cost_usd",
+}
+
+
+def test_cached_jobs_are_recorded_free():
+    record = {"id": 1, "title": "Root chakra", "width": 1024, "height": 1024, "seed": 7}
+    for module_name, cost_field in COST_FIELDS.items():
+        module = importlib.import_module(module_name)
+        generated = JobResult(1, record, "001.png", Path("001.png"))
+        restored = JobResult(1, record, "001.png", Path("001.png"), cached=True)
+
+        assert module.manifest_entry(generated)[cost_field] > 0, module_name
+        entry = module.manifest_entry(restored)
+        assert entry[cost_field] == 0 and entry["cached"], module_name
@@ -0,0 +1,50 @@
+"""ManifestJournal crash recovery"""
+
+import json
+
+from manifest_journal import ManifestJournal
+from request_store import RequestStore, SUBMITTED
+
+
+def test_append_after_torn_line_keeps_later_entries(tmp_path):
+    journal = ManifestJournal(tmp_path / "manifest.json")
+    journal.append({"key": "a"})
+    journal.close()
+
+    # Crash mid-append: partial JSON, no trailing newline
+    with open(journal.journal_file, "a") as f:
+        f.write('{"key": "b", "fi')
+
+    journal = ManifestJournal(tmp_path / "manifest.json")
+    journal.append({"key": "c"})
+    journal.append({"key": "d"})
+    manifest = journal.compact()
+    journal.close()
+
+    assert [entry["key"] for entry in manifest] == ["a", "c", "d"]
+    with open(tmp_path / "manifest.json") as f:
+        assert [entry["key"] for entry in json.load(f)] == ["a", "c", "d"]
+    assert journal.journal_file.stat().st_size == 0
+
+
+def test_request_store_survives_torn_line(tmp_path):
+    state_file = tmp_path / "requests.json"
+    with RequestStore(state_file) as store:
+        store.record("a", SUBMITTED, request_id="req-a")
+    # Leave the journal uncompacted, as a crashed run would
+    store = RequestStore(state_file)
+    store.close()
+    with open(store._journal.journal_file, "a") as f:
+        f.write('{"key": "b", "state": "subm')
+
+    store = RequestStore(state_file)
+    store.record("c", SUBMITTED, request_id="req-c")
+    store.record("d", SUBMITTED, request_id="req-d")
+    store.compact()
+    store.close()
+
+    store = RequestStore(state_file)
+    assert {key: store.get(key)["request_id"] for key in ("a", "c", "d")} == \
+        {"a": "req-a", "c": "req-c", "d": "req-d"}
+    assert store.get("b") is None
+    store.close()
@@ -0,0 +1,488 @@
+#!/usr/bin/env python3
+"""
+In-process WebP encoding and inspection for SpiritAtlas optimizers
+
+The optimization passes used to fork a `cwebp` process per file (and a
+`webpinfo` process per file just to ask whether it was lossless). This module
+does the same work inside the Python process:
+
+- encode_webp() drives libwebp's advanced API through ctypes, so every cwebp
+  profile knob is available: quality (-q), method (-m), near_lossless,
+  alpha_quality (-alpha_q), preprocessing (-pre), sharp_yuv, autofilter (-af)
+  and multithreading (-mt). If libwebp cannot be loaded it falls back to
+  Pillow's WebP writer, which supports quality/method/alpha_quality/lossless
+  only.
+- read_webp_header() reads dimensions and lossless/alpha/animation flags
+  straight from the RIFF chunk headers without decoding any pixels.
+- map_largest_first() runs per-file encode jobs on a thread pool (libwebp
+  releases the GIL) biggest files first, yielding results in input order.
+  Per-job timeouts abort the encoder through libwebp's progress hook.
+
+Usage:
+    from webp_codec import encode_webp_file, is_lossless
+
+    if is_lossless(path):
+        size = encode_webp_file(path, out_path, quality=92, method=6,
+                                alpha_quality=100, sharp_yuv=True)
+
+The libwebp shared library is located via $WEBP_LIBRARY, the system library
+path (e.g. Homebrew's webp, which also provides cwebp), or the copy bundled
+with Pillow wheels.
+"""
+
+import io
+import os
+import sys
+import glob
+import ctypes
+import ctypes.util
+import time
+import struct
+import tempfile
+import threading
+from pathlib import Path
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, Optional, Tuple, TypeVar, Union
+
+try:
+    from PIL import Image
+except ImportError:
+    print("ERROR: Pillow is required. Install with: pip install Pillow")
+    sys.exit(1)
+
+
+# ---------------------------------------------------------------------------
+# RIFF header inspection
+# ---------------------------------------------------------------------------
+
+@dataclass
+class WebPInfo:
+    """What the RIFF container says about a WebP file"""
+    width: int
+    height: int
+    lossless: bool
+    has_alpha: bool
+    animated: bool
+
+
+def read_webp_header(path: Union[str, Path]) -> WebPInfo:
+    """
+    Parse a WebP file's RIFF chunk headers (no pixel decoding).
+
+    Handles simple lossy ('VP8 '), simple lossless ('VP8L') and extended
+    ('VP8X') files; for extended files the chunks are walked until the first
+    image bitstream to find out whether it is lossless.
+
+    Raises:
+        ValueError: If the file is not a well-formed WebP
+    """
+    with open(path, 'rb') as f:
+        riff = f.read(12)
+        if len(riff) < 12 or riff[:4] != b'RIFF' or riff[8:12] != b'WEBP':
+            raise ValueError(f"{path}: not a WebP file")
+
+        width = height = None
+        has_alpha = animated = False
+
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                raise ValueError(f"{path}: no image data chunk")
+            fourcc, size = header[:4], struct.unpack('<I', header[4:])[0]
+            padded = size + (size & 1)
+
+            if fourcc == b'VP8X':
+                data = f.read(10)
+                flags = data[0]
+                has_alpha = bool(flags & 0x10)
+                animated = bool(flags & 0x02)
+                width = 1 + int.from_bytes(data[4:7], 'little')
+                height = 1 + int.from_bytes(data[7:10], 'little')
+                f.seek(padded - 10, os.SEEK_CUR)
+
+            elif fourcc == b'ANMF':
+                # Frame header (16 bytes) precedes the frame's own bitstream chunks
+                f.seek(16, os.SEEK_CUR)
+
+            elif fourcc == b'VP8L':
+                data = f.read(5)
+                if data[0] != 0x2f:
+                    raise ValueError(f"{path}: bad VP8L signature")
+                bits = int.from_bytes(data[1:5], 'little')
+                if width is None:
+                    width = (bits & 0x3FFF) + 1
+                    height = ((bits >> 14) & 0x3FFF) + 1
+                has_alpha = has_alpha or bool((bits >> 28) & 1)
+                return WebPInfo(width, height, True, has_alpha, animated)
+
+            elif fourcc == b'VP8 ':
+                data = f.read(10)
+                if data[3:6] != b'\x9d\x01\x2a':
+                    raise ValueError(f"{path}: bad VP8 start code")
+                if width is None:
+                    width = int.from_bytes(data[6:8], 'little') & 0x3FFF
+                    height = int.from_bytes(data[8:10], 'little') & 0x3FFF
+                return WebPInfo(width, height, False, has_alpha, animated)
+
+            else:
+                # ICCP, ALPH, ANIM, EXIF, XMP, unknown: skip the payload
+                f.seek(padded, os.SEEK_CUR)
+
+
+def is_lossless(path: Union[str, Path]) -> bool:
+    """True if the (first) image bitstream in a WebP file is VP8L"""
+    return read_webp_header(path).lossless
+
+
+# ---------------------------------------------------------------------------
+# libwebp via ctypes
+# ---------------------------------------------------------------------------
+
+# encode.h WEBP_ENCODER_ABI_VERSION for libwebp 1.2+; only the major byte has
+# to match the loaded library, so this works against any libwebp 1.x
+WEBP_ENCODER_ABI_VERSION = 0x020f
+WEBP_PRESET_DEFAULT = 0
+VP8_ENC_ERROR_USER_ABORT = 10
+
+
+class EncodeTimeout(TimeoutError):
+    """Raised when an encode exceeds its per-job timeout"""
+
+
+_ProgressHook = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_int, ctypes.c_void_p)
+
+
+class _WebPConfig(ctypes.Structure):
+    _fields_ = [(name, ctypes.c_float if name in ('quality', 'target_PSNR') else ctypes.c_int)
+                for name in (
+                    'lossless', 'quality', 'method', 'image_hint', 'target_size', 'target_PSNR',
+                    'segments', 'sns_strength', 'filter_strength', 'filter_sharpness',
+                    'filter_type', 'autofilter', 'alpha_compression', 'alpha_filtering',
+                    'alpha_quality', 'pass_', 'show_compressed', 'preprocessing', 'partitions',
+                    'partition_limit', 'emulate_jpeg_size', 'thread_level', 'low_memory',
+                    'near_lossless', 'exact', 'use_delta_palette', 'use_sharp_yuv',
+                    'qmin', 'qmax',
+                )]
+
+
+class _WebPPicture(ctypes.Structure):
+    _fields_ = [
+        ('use_argb', ctypes.c_int),
+        ('colorspace', ctypes.c_int),
+        ('width', ctypes.c_int),
+        ('height', ctypes.c_int),
+        ('y', ctypes.c_void_p), ('u', ctypes.c_void_p), ('v', ctypes.c_void_p),
+        ('y_stride', ctypes.c_int), ('uv_stride', ctypes.c_int),
+        ('a', ctypes.c_void_p), ('a_stride', ctypes.c_int),
+        ('pad1', ctypes.c_uint32 * 2),
+        ('argb', ctypes.c_void_p), ('argb_stride', ctypes.c_int),
+        ('pad2', ctypes.c_uint32 * 3),
+        ('writer', ctypes.c_void_p),
+        ('custom_ptr', ctypes.c_void_p),
+        ('extra_info_type', ctypes.c_int),
+        ('extra_info', ctypes.c_void_p),
+        ('stats', ctypes.c_void_p),
+        ('error_code', ctypes.c_int),
+        ('progress_hook', ctypes.c_void_p),
+        ('user_data', ctypes.c_void_p),
+        ('pad3', ctypes.c_uint32 * 3),
+        ('pad4', ctypes.c_void_p), ('pad5', ctypes.c_void_p),
+        ('pad6', ctypes.c_uint32 * 8),
+        ('memory_', ctypes.c_void_p), ('memory_argb_', ctypes.c_void_p),
+        ('pad7', ctypes.c_void_p * 2),
+    ]
+
+
+class _WebPMemoryWriter(ctypes.Structure):
+    _fields_ = [
+        ('mem', ctypes.POINTER(ctypes.c_uint8)),
+        ('size', ctypes.c_size_t),
+        ('max_size', ctypes.c_size_t),
+        ('pad', ctypes.c_uint32 * 1),
+    ]
+
+
+def _find_libwebp() -> Optional[str]:
+    candidates = []
+    if os.environ.get('WEBP_LIBRARY'):
+        candidates.append(os.environ['WEBP_LIBRARY'])
+
+    system_lib = ctypes.util.find_library('webp')
+    if system_lib:
+        candidates.append(system_lib)
+
+    # Copies bundled with Pillow wheels (Linux: pillow.libs, macOS: PIL/.dylibs)
+    pil_dir = Path(Image.__file__).parent
+    for pattern in ('../pillow.libs/libwebp-*.so*', '.dylibs/libwebp.*.dylib', '.dylibs/libwebp*.dylib'):
+        candidates.extend(sorted(glob.glob(str(pil_dir / pattern))))
+
+    for candidate in candidates:
+        try:
+            ctypes.CDLL(candidate)
+            return candidate
+        except OSError:
+            continue
+    return None
+
+
+_lib = None
+_lib_loaded = False
+_lib_lock = threading.Lock()
+
+
+def _libwebp():
+    """Load and prototype libwebp once; None if unavailable"""
+    global _lib, _lib_loaded
+    if _lib_loaded:
+        return _lib
+    # Encode workers race here on first use
+    with _lib_lock:
+        if not _lib_loaded:
+            _lib = _load_libwebp()
+            _lib_loaded = True
+    return _lib
+
+
+def _load_libwebp():
+    path = _find_libwebp()
+    if not path:
+        return None
+
+    try:
+        lib = ctypes.CDLL(path)
+        lib.WebPConfigInitInternal.argtypes = [ctypes.POINTER(_WebPConfig), ctypes.c_int,
+                                               ctypes.c_float, ctypes.c_int]
+        lib.WebPValidateConfig.argtypes = [ctypes.POINTER(_WebPConfig)]
+        lib.WebPPictureInitInternal.argtypes = [ctypes.POINTER(_WebPPicture), ctypes.c_int]
+        for name in ('WebPPictureImportRGBA', 'WebPPictureImportRGB'):
+            getattr(lib, name).argtypes = [ctypes.POINTER(_WebPPicture), ctypes.c_char_p, ctypes.c_int]
+        lib.WebPEncode.argtypes = [ctypes.POINTER(_WebPConfig), ctypes.POINTER(_WebPPicture)]
+        lib.WebPPictureFree.argtypes = [ctypes.POINTER(_WebPPicture)]
+        lib.WebPPictureFree.restype = None
+        lib.WebPMemoryWriterInit.argtypes = [ctypes.POINTER(_WebPMemoryWriter)]
+        lib.WebPMemoryWriterInit.restype = None
+        lib.WebPMemoryWriterClear.argtypes = [ctypes.POINTER(_WebPMemoryWriter)]
+        lib.WebPMemoryWriterClear.restype = None
+    except AttributeError:
+        return None
+
+    return lib
+
+
+def backend_name() -> str:
+    """'libwebp' when the full-featured encoder is available, else 'pillow'"""
+    return 'libwebp' if _libwebp() is not None else 'pillow'
+
+
+def _encode_libwebp(lib, img: Image.Image, options: dict) -> bytes:
+    config = _WebPConfig()
+    if not lib.WebPConfigInitInternal(ctypes.byref(config), WEBP_PRESET_DEFAULT,
+                                      float(options['quality']), WEBP_ENCODER_ABI_VERSION):
+        raise RuntimeError("libwebp: encoder ABI mismatch")
+
+    config.lossless = 1 if options['lossless'] else 0
+    config.quality = float(options['quality'])
+    config.method = int(options['method'])
+    config.autofilter = 1 if options['autofilter'] else 0
+    config.thread_level = 1 if options['multithread'] else 0
+    config.use_sharp_yuv = 1 if options['sharp_yuv'] else 0
+    if options['alpha_quality'] is not None:
+        config.alpha_quality = int(options['alpha_quality'])
+    if options['preprocessing'] is not None:
+        config.preprocessing = int(options['preprocessing'])
+    if options['near_lossless'] is not None:
+        config.near_lossless = int(options['near_lossless'])
+    if not lib.WebPValidateConfig(ctypes.byref(config)):
+        raise ValueError(f"libwebp: invalid encoder options {options}")
+
+    has_alpha = 'A' in img.getbands() or 'transparency' in img.info
+    img = img.convert('RGBA' if has_alpha else 'RGB')
+    pixels = img.tobytes()
+
+    picture = _WebPPicture()
+    if not lib.WebPPictureInitInternal(ctypes.byref(picture), WEBP_ENCODER_ABI_VERSION):
+        raise RuntimeError("libwebp: picture ABI mismatch")
+    picture.use_argb = 1
+    picture.width, picture.height = img.size
+
+    # Abort from libwebp's progress callback once the deadline has passed
+    deadline = options['deadline']
+    hook = None
+    if deadline is not None:
+        hook = _ProgressHook(lambda percent, pic: 0 if time.monotonic() > deadline else 1)
+        picture.progress_hook = ctypes.cast(hook, ctypes.c_void_p).value
+
+    writer = _WebPMemoryWriter()
+    lib.WebPMemoryWriterInit(ctypes.byref(writer))
+    picture.writer = ctypes.cast(lib.WebPMemoryWrite, ctypes.c_void_p).value
+    picture.custom_ptr = ctypes.cast(ctypes.byref(writer), ctypes.c_void_p).value
+
+    try:
+        if has_alpha:
+            ok = lib.WebPPictureImportRGBA(ctypes.byref(picture), pixels, img.size[0] * 4)
+        else:
+            ok = lib.WebPPictureImportRGB(ctypes.byref(picture), pixels, img.size[0] * 3)
+        if not ok:
+            raise MemoryError("libwebp: could not import picture")
+
+        if not lib.WebPEncode(ctypes.byref(config), ctypes.byref(picture)):
+            if picture.error_code == VP8_ENC_ERROR_USER_ABORT:
+                raise EncodeTimeout(f"encode exceeded {options['timeout']}s")
+            raise RuntimeError(f"libwebp: encoding failed (error {picture.error_code})")
+
+        return ctypes.string_at(writer.mem, writer.size)
+    finally:
+        lib.WebPPictureFree(ctypes.byref(picture))
+        lib.WebPMemoryWriterClear(ctypes.byref(writer))
+
+
+_warned_pillow_fallback = False
+
+
+def _encode_pillow(img: Image.Image, options: dict) -> bytes:
+    global _warned_pillow_fallback
+    ignored = [name for name in ('near_lossless', 'preprocessing')
+               if options[name] is not None] + (['sharp_yuv'] if options['sharp_yuv'] else [])
+    if ignored and not _warned_pillow_fallback:
+        print(f"⚠️  libwebp not found - Pillow encoder ignores: {', '.join(ignored)}")
+        _warned_pillow_fallback = True
+
+    buffer = io.BytesIO()
+    save_options = {
+        'quality': options['quality'],
+        'method': options['method'],
+        'lossless': options['lossless'],
+    }
+    if options['alpha_quality'] is not None:
+        save_options['alpha_quality'] = options['alpha_quality']
+    img.save(buffer, 'WEBP', **save_options)
+    return buffer.getvalue()
+
+
+def encode_webp(
+    img: Image.Image,
+    quality: float = 75,
+    method: int = 4,
+    lossless: bool = False,
+    near_lossless: Optional[int] = None,
+    alpha_quality: Optional[int] = None,
+    preprocessing: Optional[int] = None,
+    sharp_yuv: bool = False,
+    autofilter: bool = False,
+    multithread: bool = True,
+    timeout: Optional[float] = None
+) -> bytes:
+    """
+    Encode an image to WebP in-process.
+
+    Options mirror cwebp. As with cwebp, near_lossless implies lossless.
+
+    Args:
+        img: Image to encode (any mode; alpha is kept when present)
+        quality: -q (0-100; compression effort in lossless mode)
+        method: -m (0=fast, 6=slowest/smallest)
+        lossless: -lossless
+        near_lossless: -near_lossless level (0-100, 100=off)
+        alpha_quality: -alpha_q (0-100)
+        preprocessing: -pre (e.g. 2 = pseudo-random dithering, 4 = smooth segment map)
+        sharp_yuv: -sharp_yuv (sharper RGB->YUV conversion)
+        autofilter: -af (auto-adjust filter strength)
+        multithread: -mt
+        timeout: Abort the encode after this many seconds (libwebp backend only)
+
+    Returns:
+        Encoded WebP bytes
+
+    Raises:
+        EncodeTimeout: If the timeout expired
+    """
+    options = {
+        'quality': quality,
+        'method': method,
+        'lossless': lossless or near_lossless is not None,
+        'near_lossless': near_lossless,
+        'alpha_quality': alpha_quality,
+        'preprocessing': preprocessing,
+        'sharp_yuv': sharp_yuv,
+        'autofilter': autofilter,
+        'multithread': multithread,
+        'timeout': timeout,
+        'deadline': time.monotonic() + timeout if timeout else None,
+    }
+
+    lib = _libwebp()
+    if lib is not None:
+        return _encode_libwebp(lib, img, options)
+    return _encode_pillow(img, options)
+
+
+def encode_webp_file(input_path: Union[str, Path], output_path: Union[str, Path], **options) -> int:
+    """
+    Decode an image file and write it as WebP (atomic temp-file rename).
+
+    Args:
+        input_path: Source image (PNG, WebP, ...)
+        output_path: Destination .webp path
+        **options: encode_webp() options
+
+    Returns:
+        Size of the written file in bytes
+    """
+    with Image.open(input_path) as img:
+        img.load()
+        data = encode_webp(img, **options)
+
+    output_path = Path(output_path)
+    fd, temp_name = tempfile.mkstemp(dir=output_path.parent, prefix=f".{output_path.name}.",
+                                     suffix=".part")
+    try:
+        os.chmod(temp_name, 0o644)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(temp_name, output_path)
+    except BaseException:
+        if os.path.exists(temp_name):
+            os.unlink(temp_name)
+        raise
+    return len(data)
+
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+
+def map_largest_first(
+    work: Callable[[T], R],
+    items: Iterable[T],
+    size_of: Callable[[T], int],
+    max_workers: Optional[int] = None
+) -> Iterator[Tuple[T, Union[R, Exception]]]:
+    """
+    Run work(item) for every item on a thread pool, largest items first.
+
+    All jobs are queued up front in descending size order so the long encodes
+    start early and the pool drains evenly, but results are yielded in input
+    order so console output reads the same as a serial loop.
+
+    Args:
+        work: Per-item job (exceptions are yielded, not raised)
+        items: Jobs in reporting order
+        size_of: Scheduling weight, e.g. file size in bytes
+        max_workers: Pool size (default: all CPU cores)
+
+    Yields:
+        (item, result or the exception it raised)
+    """
+    items = list(items)
+    with ThreadPoolExecutor(max_workers=max_workers or os.cpu_count() or 1,
+                            thread_name_prefix="webp") as executor:
+        futures = {}
+        for index in sorted(range(len(items)), key=lambda i: size_of(items[i]), reverse=True):
+            futures[index] = executor.submit(work, items[index])
+
+        for index, item in enumerate(items):
+            try:
+                yield item, futures[index].result()
+            except Exception as e:
+                yield item, e